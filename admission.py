@@ -0,0 +1,238 @@
+"""Per-user admission control and fair queuing for generations
+
+Every generation asks the process-wide `AdmissionController` for a slot:
+
+1. A user may have at most `max_in_flight_per_user` generations running or
+   queued; more are rejected at once.
+2. Each user has a token bucket (`rate_per_minute`, `burst`); an empty bucket
+   rejects the request with the time until the next token.
+3. Admitted requests take one of `slots` generation slots. When all are busy
+   they wait in a per-user queue, and freed slots go to users round-robin, so
+   one user queueing many requests cannot delay everybody else's. A request
+   waits at most `queue_timeout` seconds, and at most `max_queued` wait at once.
+
+Rejections raise `AdmissionRejected` carrying a Retry-After in seconds. State
+is per process; with several gunicorn workers each enforces its own limits.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from observability.metrics import (
+    ADMISSION_QUEUE_WAIT, ADMISSION_REJECTED, GENERATIONS_IN_FLIGHT, GENERATIONS_QUEUED, GENERATIONS_REJECTED
+)
+
+# Idle buckets are dropped once this many users are tracked
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    """A generation was not admitted; `status` is 429 (user over limit) or 503 (server busy)"""
+
+    def __init__(self, reason: str, retry_after: float, message: str):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+        self.status = 503 if reason in ("queue_full", "queue_timeout") else 429
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def is_full(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class _Waiter:
+    __slots__ = ("user_id", "event", "granted")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """Generation slots shared fairly between users (see module docstring)"""
+
+    def __init__(self, slots: int, max_in_flight_per_user: int = 2, rate_per_minute: float = 6,
+                 burst: float = 3, queue_timeout: float = 10, max_queued: int = 4):
+        self.slots = slots
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+
+        self._lock = threading.Lock()
+        self._free = slots
+        self._in_flight: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._turns: Deque[str] = deque()
+        self._queued = 0
+        # Running average generation time, used for Retry-After hints
+        self._avg_duration = 5.0
+
+    @classmethod
+    def from_env(cls, threads: int, reserved: int = 4) -> "AdmissionController":
+        """Settings from EDUBOT_* variables; queued requests hold a thread too, so
+        by default slots + queue leave `reserved` of the worker's threads free"""
+        max_queued = int(os.getenv("EDUBOT_MAX_QUEUED", "4"))
+        return cls(
+            slots=int(os.getenv("EDUBOT_GENERATION_SLOTS", max(threads - reserved - max_queued, 1))),
+            max_in_flight_per_user=int(os.getenv("EDUBOT_USER_MAX_IN_FLIGHT", "2")),
+            rate_per_minute=float(os.getenv("EDUBOT_USER_RATE_PER_MINUTE", "6")),
+            burst=float(os.getenv("EDUBOT_USER_BURST", "3")),
+            queue_timeout=float(os.getenv("EDUBOT_QUEUE_TIMEOUT", "10")),
+            max_queued=max_queued
+        )
+
+    @contextmanager
+    def admitted(self, user_id: str) -> Iterator[None]:
+        """Hold a generation slot for `user_id` for the duration of the block"""
+        self.acquire(user_id)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - start)
+
+    def acquire(self, user_id: str):
+        """Take a slot, queueing fairly if none is free; raises AdmissionRejected"""
+        with self._lock:
+            if self._in_flight.get(user_id, 0) >= self.max_in_flight_per_user:
+                self._reject("in_flight", self._avg_duration,
+                             "Too many plans in progress for this user, please wait for them to finish")
+            wait = self._bucket(user_id).take()
+            if wait:
+                self._reject("rate", wait, "Too many generation requests, please slow down")
+
+            if self._free > 0 and not self._turns:
+                self._free -= 1
+                self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+                GENERATIONS_IN_FLIGHT.inc()
+                return
+            if self._queued >= self.max_queued:
+                GENERATIONS_REJECTED.inc()
+                self._reject("queue_full", self._avg_duration,
+                             "Server is busy generating other plans, please retry shortly")
+
+            waiter = _Waiter(user_id)
+            if user_id not in self._queues:
+                self._queues[user_id] = deque()
+                self._turns.append(user_id)
+            self._queues[user_id].append(waiter)
+            self._queued += 1
+            self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+            GENERATIONS_QUEUED.inc()
+
+        queued_at = time.monotonic()
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            ADMISSION_QUEUE_WAIT.observe(time.monotonic() - queued_at)
+            if waiter.granted:
+                return
+            # Timed out: leave the queue (the waiter was never handed a slot)
+            self._remove_waiter(waiter)
+            self._in_flight[user_id] -= 1
+            if not self._in_flight[user_id]:
+                del self._in_flight[user_id]
+            GENERATIONS_REJECTED.inc()
+            self._reject("queue_timeout", self._avg_duration,
+                         "Server is busy generating other plans, please retry shortly")
+
+    def acquire_extra(self, user_id: str, count: int) -> int:
+        """Take up to `count` more slots for a user who already holds one, without
+        waiting; returns how many were granted (within the per-user limit)"""
+        with self._lock:
+            granted = 0
+            while (granted < count and self._free > 0 and not self._turns
+                   and self._in_flight.get(user_id, 0) < self.max_in_flight_per_user):
+                self._free -= 1
+                self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+                GENERATIONS_IN_FLIGHT.inc()
+                granted += 1
+            return granted
+
+    def release(self, user_id: str, duration: Optional[float] = None):
+        """Return a slot; it goes straight to the next user in round-robin order"""
+        with self._lock:
+            if duration is not None:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            self._in_flight[user_id] = self._in_flight.get(user_id, 1) - 1
+            if self._in_flight[user_id] <= 0:
+                del self._in_flight[user_id]
+            GENERATIONS_IN_FLIGHT.dec()
+
+            if not self._turns:
+                self._free += 1
+                return
+            next_user = self._turns.popleft()
+            waiter = self._queues[next_user].popleft()
+            if self._queues[next_user]:
+                self._turns.append(next_user)
+            else:
+                del self._queues[next_user]
+            self._queued -= 1
+            GENERATIONS_QUEUED.dec()
+            GENERATIONS_IN_FLIGHT.inc()
+            waiter.granted = True
+            waiter.event.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "free": self._free,
+                "queued": self._queued,
+                "users_in_flight": len(self._in_flight)
+            }
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_USERS:
+                # A full bucket is the same as a fresh one, so it can be forgotten
+                for idle in [user for user, b in self._buckets.items() if b.is_full()]:
+                    del self._buckets[idle]
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _remove_waiter(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.user_id)
+        if queue is None:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        GENERATIONS_QUEUED.dec()
+        if not queue:
+            del self._queues[waiter.user_id]
+            self._turns.remove(waiter.user_id)
+
+    @staticmethod
+    def _reject(reason: str, retry_after: float, message: str):
+        ADMISSION_REJECTED.labels(reason).inc()
+        raise AdmissionRejected(reason, retry_after, message)
@@ -0,0 +1,105 @@
+"""Non-interactive batch generation from a CSV or JSONL file of syllabi
+
+Each row needs syllabus, days and difficulty; optional columns are id (used
+for output file names, default: row number) and user_id. Results go to an
+output directory:
+
+    <out>/<id>.json      session id, plan, notes and resources of the row
+    <out>/<id>.md        the plan as Markdown
+    <out>/manifest.jsonl one line per finished row, appended as rows complete
+
+Rows already recorded as "ok" in the manifest are skipped, so an interrupted
+run picks up where it stopped when started again with the same arguments.
+"""
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from exporters import iter_markdown
+from plan_model import StudyPlan
+from storage_layout import safe_user_dirname
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def read_batch_file(path: str) -> List[Dict[str, Any]]:
+    """Rows of a .csv or .jsonl file, each with an `id`
+
+    Raises ValueError for a JSONL line that isn't an object, and for ids that
+    would share output files (ids are sanitized for file names, so "a/b" and
+    "a_b" collide, as do ids differing only in case on some filesystems).
+    """
+    rows = []
+    outputs: Dict[str, str] = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for number, record in enumerate(records, start=1):
+            if not isinstance(record, dict):
+                raise ValueError(f"Row {number}: expected an object, got {type(record).__name__}")
+            row = {key.strip(): value for key, value in record.items() if key}
+            row["id"] = str(row.get("id") or f"row-{number}")
+            output = safe_user_dirname(row["id"]).lower()
+            if output in outputs:
+                raise ValueError(f"Row {number}: id {row['id']!r} clashes with {outputs[output]!r} "
+                                 f"(both are written as {safe_user_dirname(row['id'])}.json)")
+            outputs[output] = row["id"]
+            rows.append(row)
+    return rows
+
+
+def load_completed(out_dir: str) -> Set[str]:
+    """Ids of rows finished successfully by earlier runs"""
+    completed = set()
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return completed
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut off by an interrupted run; that row is redone
+                continue
+            if entry.get("status") == "ok":
+                completed.add(entry["id"])
+    return completed
+
+
+def _write_outputs(out_dir: str, result: Dict[str, Any]) -> str:
+    name = safe_user_dirname(result["id"])
+    plan = StudyPlan.from_dicts(result.pop("study_plan"))
+    with open(os.path.join(out_dir, f"{name}.md"), 'w', encoding='utf-8') as f:
+        f.writelines(iter_markdown(plan))
+    output = {**result, "study_plan": plan.to_dicts()}
+    with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    return name
+
+
+def run_batch(orchestrator, rows: List[Dict[str, Any]], out_dir: str, workers: int,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Generate every row through `orchestrator.process_batch`; returns the batch summary"""
+    os.makedirs(out_dir, exist_ok=True)
+    summary: Dict[str, Any] = {}
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'a', encoding='utf-8') as manifest:
+        for result in orchestrator.process_batch(rows, max_workers=workers, include_content=True):
+            if "summary" in result:
+                summary = result["summary"]
+                continue
+            result["id"] = rows[result["index"]]["id"]
+            entry = {"id": result["id"], "status": result["status"]}
+            if result["status"] == "ok":
+                entry["session_id"] = result["session_id"]
+                entry["output"] = _write_outputs(out_dir, result)
+            else:
+                entry["error"] = result.get("error")
+            # One line per row, flushed so an interrupted run keeps its progress
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+            if on_result:
+                on_result(entry)
+    return summary
@@ -0,0 +1,107 @@
+"""Synthetic data generators sized like production data"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+WORDS = (
+    "gradient descent regression matrix vector probability entropy kernel "
+    "protein enzyme mitosis osmosis velocity momentum torque voltage "
+    "recursion pointer index join schema transaction theorem proof limit"
+).split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def make_plan(days: int, sessions_per_day: int = 4, seed: int = 0) -> List[Dict[str, Any]]:
+    """A parsed study plan with `days * sessions_per_day` sessions"""
+    rng = random.Random(seed)
+    plan = []
+    for day in range(1, days + 1):
+        for slot in range(sessions_per_day):
+            start = 9 + slot * 2
+            plan.append({
+                "day": day,
+                "time_slot": f"{start}:00 AM - {start + 1}:30 AM",
+                "topic": f"{_sentence(rng, 3)} ({day}.{slot + 1})",
+                "description": _sentence(rng, 18),
+                "activities": [_sentence(rng, 6) for _ in range(3)],
+                "expected_outcome": _sentence(rng, 12)
+            })
+    return plan
+
+
+def make_plan_text(days: int, sessions_per_day: int = 4, fenced: bool = True, seed: int = 0) -> str:
+    """Raw model output for a plan, optionally wrapped in a ```json fence"""
+    text = json.dumps(make_plan(days, sessions_per_day, seed), indent=2)
+    return f"```json\n{text}\n```" if fenced else text
+
+
+def make_markdown(kilobytes: int, seed: int = 0) -> str:
+    """Notes/resources-style markdown of roughly the given size"""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    section = 1
+    while size < kilobytes * 1024:
+        block = (
+            f"## Section {section}: {_sentence(rng, 3)}\n\n"
+            f"### Key Concepts\n"
+            f"- **{rng.choice(WORDS)}**: {_sentence(rng, 14)}\n"
+            f"  - {_sentence(rng, 10)}\n"
+            f"  - {_sentence(rng, 10)}\n"
+            f"- [{_sentence(rng, 3)}](https://example.com/{section}) - {_sentence(rng, 8)}\n\n"
+            f"```\ny = {rng.randint(1, 9)}x + {rng.randint(1, 9)}\n```\n\n"
+        )
+        parts.append(block)
+        size += len(block)
+        section += 1
+    return "".join(parts)
+
+
+def populate_sessions(session_manager, users: int, sessions_per_user: int, days: int = 14) -> List[str]:
+    """Create sessions with realistic content; returns all session ids"""
+    session_ids = []
+    notes = make_markdown(12)
+    resources = make_markdown(6, seed=1)
+    plan = make_plan(days)
+    start = datetime(2025, 1, 1)
+    for user in range(users):
+        user_id = f"bench{user}"
+        for index in range(sessions_per_user):
+            created = start + timedelta(minutes=user * sessions_per_user + index)
+            session_id = f"{user_id}_{created.strftime('%Y%m%d_%H%M%S')}"
+            session_manager._save_session(session_id, {
+                "session_id": session_id,
+                "user_id": user_id,
+                "created_at": created.isoformat(),
+                "progress": {plan[i]["topic"]: {"completed": True} for i in range(index % 5)},
+                "study_plan": plan,
+                "study_plan_raw": json.dumps(plan),
+                "notes": notes,
+                "resources": resources,
+                "syllabus": "Benchmark syllabus",
+                "days": days,
+                "difficulty": "medium"
+            })
+            session_ids.append(session_id)
+    return session_ids
+
+
+def populate_memory(memory_bank, users: int, preferences_per_user: int):
+    """Record preferences for many users (one batched write per user)"""
+    memory_bank.add_learning_preferences([
+        (f"bench{user}", {"difficulty": "medium", "topic": f"Topic {i}"})
+        for user in range(users) for i in range(preferences_per_user)
+    ])
+
+
+def populate_notes(notes_tool, users: int, notes_per_user: int):
+    """Save notes for many users; content is shared so the blob store dedupes it"""
+    content = make_markdown(8)
+    for user in range(users):
+        for index in range(notes_per_user):
+            notes_tool.save_notes(f"Topic {index}", content, f"bench{user}")
@@ -0,0 +1,114 @@
+"""Link verification benchmark against local stand-in HTTP servers
+
+Starts `--hosts` local servers that answer every request after `--delay`
+seconds (paths under /missing/ answer 404) and verifies `--links` links
+spread across them, three ways: one blocking request per link (the old
+`verify_url` loop), `LinkVerifier.verify_many` (concurrent, pooled), and
+`verify_many` again (served from the TTL cache).
+
+Usage (from the repository root):
+    python -m benchmarks.link_check
+    python -m benchmarks.link_check --links 48 --hosts 12 --delay 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_servers(count: int, delay: float) -> List[ThreadingHTTPServer]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _answer(self, with_body: bool):
+            time.sleep(delay)
+            status = 404 if self.path.startswith("/missing/") else 200
+            body = b"ok"
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if with_body:
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self._answer(with_body=False)
+
+        def do_GET(self):
+            self._answer(with_body=True)
+
+        def log_message(self, *args):
+            pass
+
+    servers = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def make_links(servers: List[ThreadingHTTPServer], count: int) -> List[str]:
+    links = []
+    for index in range(count):
+        port = servers[index % len(servers)].server_address[1]
+        path = f"/missing/{index}" if index % 10 == 9 else f"/resource/{index}"
+        links.append(f"http://127.0.0.1:{port}{path}")
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk link verification")
+    parser.add_argument("--links", type=int, default=48, help="Links to verify")
+    parser.add_argument("--hosts", type=int, default=12, help="Local stand-in hosts to spread them over")
+    parser.add_argument("--delay", type=float, default=0.2, help="Server response time in seconds")
+    parser.add_argument("--per-host", type=int, default=4, help="Concurrent checks per host")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_ROOT)
+    from tools.search_tool import LinkVerifier
+
+    servers = start_servers(args.hosts, args.delay)
+    links = make_links(servers, args.links)
+    print(f"{args.links} links on {args.hosts} hosts, {args.delay * 1000:.0f} ms per response\n")
+
+    start = time.perf_counter()
+    sequential = {}
+    for url in links:
+        try:
+            sequential[url] = requests.head(url, timeout=5).status_code == 200
+        except requests.RequestException:
+            sequential[url] = False
+    sequential_time = time.perf_counter() - start
+
+    # The stand-in servers are on loopback, which production checks refuse
+    verifier = LinkVerifier(max_workers=args.links, per_host=args.per_host, timeout=5, allow_private=True)
+    start = time.perf_counter()
+    results = verifier.verify_many(links)
+    bulk_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verifier.verify_many(links)
+    cached_time = time.perf_counter() - start
+
+    mismatches = [url for url in links if bool(results[url]["ok"]) != sequential[url]]
+    broken = sum(1 for result in results.values() if not result["ok"])
+    print(f"{'sequential (one request per link)':<38}{sequential_time:>9.3f}s")
+    print(f"{'verify_many (concurrent, pooled)':<38}{bulk_time:>9.3f}s  {sequential_time / bulk_time:5.1f}x")
+    print(f"{'verify_many (cached)':<38}{cached_time:>9.4f}s")
+    print(f"\nbroken links: {broken}, disagreements with sequential: {len(mismatches)}")
+
+    for server in servers:
+        server.shutdown()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
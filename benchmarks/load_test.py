@@ -0,0 +1,313 @@
+"""End-to-end load test for the web app
+
+Runs `web_app.app` in-process (threaded server, offline fake Gemini with
+configurable latency, throwaway storage directory) or against an already
+running server, drives a realistic mix of traffic from N concurrent virtual
+users and writes a JSON report with per-endpoint throughput, latency
+percentiles and errors.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --users 10,100 --duration 30 --llm-latency 2
+    python -m benchmarks.load_test --users 1000 --compare benchmarks/results/<previous>.json
+    python -m benchmarks.load_test --target http://localhost:5000 --users 50
+
+Each virtual user generates a plan, then loops over weighted actions
+(`--mix`) until the duration elapses: marking/unmarking topics, reopening the
+session, listing sessions and, occasionally, generating a new plan.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+DEFAULT_MIX = "generate=1,progress=6,session=3,list=2"
+SYLLABI = [
+    "Linear Regression, Logistic Regression, Decision Trees",
+    "Cell Biology, Genetics, Evolution",
+    "Newtonian Mechanics, Thermodynamics, Waves",
+    "SQL Basics, Joins, Indexing, Transactions",
+    "Organic Chemistry: Alkanes, Alkenes, Alcohols",
+]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class Recorder:
+    """Thread-safe collection of per-endpoint request samples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, duration: float, status: str):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(duration)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        all_samples = []
+        total_errors = 0
+        for endpoint, samples in sorted(self.samples.items()):
+            statuses = self.statuses.get(endpoint, {})
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            total_errors += errors
+            all_samples.extend(samples)
+            endpoints[endpoint] = self._stats(samples, elapsed, errors, statuses)
+        return {
+            "endpoints": endpoints,
+            "overall": self._stats(all_samples, elapsed, total_errors, {})
+        }
+
+    @staticmethod
+    def _stats(samples: List[float], elapsed: float, errors: int, statuses: Dict[str, int]) -> Dict[str, Any]:
+        count = len(samples)
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(samples) / count * 1000, 1) if count else 0.0,
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p90_ms": round(percentile(samples, 90) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1) if samples else 0.0,
+            "statuses": dict(sorted(statuses.items()))
+        }
+
+
+class VirtualUser:
+    """One simulated student working through the app"""
+
+    def __init__(self, index: int, base_url: str, recorder: Recorder, weights: Dict[str, int],
+                 days: int, timeout: float):
+        self.user_id = f"loadtest{index}"
+        self.base_url = base_url
+        self.recorder = recorder
+        self.weights = weights
+        self.days = days
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.rng = random.Random(index)
+        self.session_id: Optional[str] = None
+        self.topics: List[str] = []
+        self.completed = set()
+
+    def run(self, deadline: float):
+        self.generate()
+        actions = list(self.weights)
+        weights = [self.weights[a] for a in actions]
+        while time.time() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            if action != "generate" and self.session_id is None:
+                action = "generate"
+            getattr(self, action)()
+
+    def _request(self, endpoint: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = str(response.status_code)
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - start, status)
+        return response
+
+    def generate(self):
+        response = self._request("POST /generate", "POST", "/generate", json={
+            "syllabus": self.rng.choice(SYLLABI),
+            "days": self.days,
+            "difficulty": self.rng.choice(DIFFICULTIES),
+            "user_id": self.user_id
+        })
+        if response is not None and response.ok:
+            data = response.json()
+            self.session_id = data.get("session_id")
+            self.topics = [s.get("topic") for s in data.get("study_plan", []) if s.get("topic")]
+            self.completed = set()
+        else:
+            # Back off like a real client would after a rejected request
+            time.sleep(float(response.headers.get("Retry-After", 1)) if response is not None else 1)
+
+    def progress(self):
+        if not self.topics:
+            return self.session()
+        topic = self.rng.choice(self.topics)
+        action = "uncomplete" if topic in self.completed else "complete"
+        response = self._request("POST /progress/<id>", "POST", f"/progress/{self.session_id}", json={
+            "topic": topic, "user_id": self.user_id, "action": action
+        })
+        if response is not None and response.ok:
+            (self.completed.discard if action == "uncomplete" else self.completed.add)(topic)
+
+    def session(self):
+        self._request("GET /session/<id>", "GET", f"/session/{self.session_id}",
+                      params={"user_id": self.user_id})
+
+    def list(self):
+        self._request("GET /sessions/list/<user_id>", "GET", f"/sessions/list/{self.user_id}")
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("generate", "progress", "session", "list"):
+            raise ValueError(f"Unknown action in --mix: {name}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def start_local_server(llm_latency: float, llm_jitter: float) -> Tuple[str, Any]:
+    """Run web_app in a background thread with the fake LLM and temporary storage"""
+    os.environ["EDUBOT_LLM_BACKEND"] = "fake"
+    os.environ["EDUBOT_FAKE_LATENCY"] = str(llm_latency)
+    os.environ["EDUBOT_FAKE_JITTER"] = str(llm_jitter)
+    # The fake resources link to example.com; don't check them over the network
+    os.environ["EDUBOT_LINK_CHECK"] = "0"
+
+    # Sessions, notes, blobs and logs are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="edubot-loadtest-")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    from werkzeug.serving import make_server
+    import web_app
+
+    server = make_server("127.0.0.1", 0, web_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def run_level(base_url: str, users: int, duration: float, weights: Dict[str, int],
+              days: int, timeout: float, ramp_up: float) -> Dict[str, Any]:
+    recorder = Recorder()
+    start = time.time()
+    deadline = start + ramp_up + duration
+
+    threads = []
+    for index in range(users):
+        user = VirtualUser(index, base_url, recorder, weights, days, timeout)
+        thread = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+        threads.append(thread)
+        thread.start()
+        if ramp_up:
+            time.sleep(ramp_up / users)
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.time() - start
+    result = recorder.summary(elapsed)
+    result["users"] = users
+    result["elapsed_s"] = round(elapsed, 2)
+    return result
+
+
+def print_level(level: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"\n=== {level['users']} concurrent users ({level['elapsed_s']}s) ===")
+    header = f"{'endpoint':<30}{'reqs':>8}{'err%':>7}{'rps':>9}{'p50 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'Δp50':>9}{'Δp99':>9}{'Δrps':>9}"
+    print(header)
+
+    rows = list(level["endpoints"].items()) + [("overall", level["overall"])]
+    for name, stats in rows:
+        line = (f"{name:<30}{stats['requests']:>8}{stats['error_rate'] * 100:>6.1f}%"
+                f"{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+        previous = (baseline or {}).get("endpoints", {}).get(name) if name != "overall" else (baseline or {}).get("overall")
+        if previous:
+            line += "".join(
+                f"{_delta(stats[key], previous.get(key)):>9}"
+                for key in ("p50_ms", "p99_ms", "throughput_rps")
+            )
+        print(line)
+
+
+def _delta(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the EduBot web app")
+    parser.add_argument("--users", default="10,100", help="Comma-separated concurrency levels (default: 10,100)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of steady traffic per level")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which users start")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--days", type=int, default=7, help="Days per generated plan")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Fake Gemini latency per call, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=1.0, help="Extra random fake latency, seconds")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request, seconds")
+    parser.add_argument("--target", help="Base URL of a running server instead of the in-process app")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    levels = [int(level) for level in args.users.split(",") if level.strip()]
+    # Resolved before the in-process server switches to its temporary directory
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    ))
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = {level["users"]: level for level in json.load(f)["levels"]}
+
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        base_url, _ = start_local_server(args.llm_latency, args.llm_jitter)
+
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "config": {
+            "target": args.target or "in-process",
+            "duration_s": args.duration,
+            "ramp_up_s": args.ramp_up,
+            "mix": weights,
+            "days": args.days,
+            "llm_latency_s": args.llm_latency,
+            "llm_jitter_s": args.llm_jitter
+        },
+        "levels": []
+    }
+
+    for users in levels:
+        level = run_level(base_url, users, args.duration, weights, args.days, args.timeout, args.ramp_up)
+        report["levels"].append(level)
+        print_level(level, (baseline or {}).get(users))
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Micro-benchmarks for per-request hot paths, with regression thresholds
+
+Each case times one function on synthetic data of a realistic size and
+compares the median against `benchmarks/baselines/micro.json`. A case that is
+slower than its baseline by more than the threshold fails the run (exit 1).
+
+Usage (from the repository root):
+    python -m benchmarks.micro                     # compare against baselines
+    python -m benchmarks.micro --filter session    # only matching cases
+    python -m benchmarks.micro --save-baseline     # record new baselines
+    python -m benchmarks.micro --threshold 0.5     # allow 50% slowdown
+
+Baselines are machine specific: record them on the machine that runs the
+comparison (e.g. the CI runner) after an intentional performance change.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks import data
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baselines", "micro.json")
+DEFAULT_THRESHOLD = 0.25
+
+# name -> setup function returning the zero-argument callable to time
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _formatter():
+    from ui.formatters import StudyPlanFormatter
+    return StudyPlanFormatter
+
+
+for _days in (1, 30, 180):
+    def _setup_parse(days=_days):
+        text = data.make_plan_text(days)
+        formatter = _formatter()
+        return lambda: formatter.parse_study_plan(text)
+    case(f"parse_study_plan[{_days}d]")(_setup_parse)
+
+
+for _kb in (2, 20):
+    def _setup_markdown(kb=_kb):
+        os.environ.setdefault("EDUBOT_LLM_BACKEND", "fake")
+        from web_app import clean_and_format_markdown
+        text = data.make_markdown(kb)
+        return lambda: clean_and_format_markdown(text)
+    case(f"clean_and_format_markdown[{_kb}kb]")(_setup_markdown)
+
+
+def _session_store(users: int = 200, sessions_per_user: int = 10):
+    from session_manager import SessionManager
+    manager = SessionManager(session_dir="bench_sessions")
+    if not hasattr(_session_store, "ids"):
+        _session_store.ids = data.populate_sessions(manager, users, sessions_per_user)
+    return manager, _session_store.ids
+
+
+@case("session_manager.load_session[metadata, 2000 sessions]")
+def _setup_load_metadata():
+    manager, ids = _session_store()
+    session_id = ids[len(ids) // 2]
+    return lambda: manager.load_session(session_id).get("progress")
+
+
+@case("session_manager.load_session[full, 2000 sessions]")
+def _setup_load_full():
+    manager, ids = _session_store()
+    session_id = ids[len(ids) // 2]
+    return lambda: manager.load_session(session_id).to_dict()
+
+
+@case("session_manager.load_session[plan lookup, 2000 sessions]")
+def _setup_load_plan():
+    manager, ids = _session_store()
+    session_id = ids[len(ids) // 2]
+    return lambda: manager.load_session(session_id).plan.find_topic("Topic 3")
+
+
+@case("session_manager.update_session[progress, 2000 sessions]")
+def _setup_update():
+    manager, ids = _session_store()
+    session_id = ids[len(ids) // 3]
+    return lambda: manager.update_session(session_id, {"progress": {"Topic": {"completed": True}}})
+
+
+@case("session_manager.list_sessions[10 of 2000 sessions]")
+def _setup_list():
+    manager, _ = _session_store()
+    return lambda: manager.list_sessions("bench7")
+
+
+@case("memory_bank.add_learning_preference[1000 users x 20]")
+def _setup_memory():
+    from memory import MemoryBank
+    bank = MemoryBank(memory_dir="bench_memory")
+    data.populate_memory(bank, users=1000, preferences_per_user=20)
+    return lambda: bank.add_learning_preference("bench500", {"difficulty": "hard", "topic": "Bench"})
+
+
+@case("memory_bank.get_user_profile[1000 users x 20]")
+def _setup_profile():
+    from memory import MemoryBank
+    bank = MemoryBank(memory_dir="bench_profile")
+    data.populate_memory(bank, users=1000, preferences_per_user=20)
+    return lambda: bank.get_user_profile("bench500").summary()
+
+
+@case("notes_tool.load_notes[20 of 4000 notes]")
+def _setup_notes():
+    from tools.notes_tool import NotesTool
+    tool = NotesTool(notes_dir="bench_notes")
+    data.populate_notes(tool, users=200, notes_per_user=20)
+    return lambda: tool.load_notes("bench42")
+
+
+def measure(func: Callable[[], object], min_time: float, repeats: int) -> Tuple[float, float]:
+    """Median and best per-call seconds over `repeats` timed batches"""
+    func()  # warm up caches and lazy imports
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeats or calls >= 1_000_000:
+            break
+        calls *= 2
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        samples.append((time.perf_counter() - start) / calls)
+    return statistics.median(samples), min(samples)
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run EduBot micro-benchmarks")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown before failing (default: {DEFAULT_THRESHOLD} = 25%%)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Approximate seconds spent per case")
+    parser.add_argument("--repeats", type=int, default=7, help="Timed batches per case")
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, 'r') as f:
+            baselines = json.load(f)
+
+    # Storage benchmarks write relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="edubot-micro-"))
+
+    results = {}
+    regressions: List[str] = []
+    print(f"{'case':<58}{'median':>12}{'baseline':>12}{'change':>9}")
+    for name, setup in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        median, best = measure(setup(), args.min_time, args.repeats)
+        results[name] = {"median_s": median, "best_s": best}
+
+        baseline = baselines.get(name, {}).get("median_s")
+        change = ""
+        status = ""
+        if baseline:
+            ratio = median / baseline - 1
+            change = f"{ratio * 100:+.0f}%"
+            if ratio > args.threshold:
+                status = "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:<58}{_format_time(median):>12}"
+              f"{_format_time(baseline) if baseline else 'n/a':>12}{change:>9}{status}")
+
+    if args.save_baseline:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {baseline_path}")
+        return
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed more than {args.threshold:.0%}:")
+        for name in regressions:
+            print(f"  - {name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Cold-start benchmark for the web and CLI entry points
+
+Each target runs in a fresh interpreter (in a throwaway directory, offline
+fake Gemini unless `--backend gemini`) and the wall time from process start
+to exit is measured, so interpreter start-up and every import are included:
+
+    web       import web_app (what a gunicorn worker does before serving)
+    healthz   import web_app and answer GET /healthz
+    cli       import main
+
+The medians are compared against `benchmarks/baselines/startup.json` like the
+micro-benchmarks; a target slower than its baseline by more than the
+threshold fails the run (exit 1). `--profile` lists the slowest direct
+imports of each target, from `python -X importtime`.
+
+Usage (from the repository root):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --profile --top 15
+    python -m benchmarks.startup --save-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baselines", "startup.json")
+DEFAULT_THRESHOLD = 0.25
+
+# name -> (entry module, code run in the fresh interpreter)
+TARGETS = {
+    "web": ("web_app", "import web_app"),
+    "healthz": ("web_app", "import web_app; web_app.app.test_client().get('/healthz')"),
+    "cli": ("main", "import main"),
+}
+
+
+def _environment(backend: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    env["EDUBOT_LLM_BACKEND"] = backend
+    env["EDUBOT_LINK_CHECK"] = "0"
+    env["EDUBOT_LOG_STDOUT"] = "0"
+    # init_gemini needs a key; no request is made with it
+    env.setdefault("GOOGLE_API_KEY", "startup-benchmark")
+    return env
+
+
+def run_once(code: str, env: Dict[str, str], workdir: str, importtime: bool = False) -> Tuple[float, str]:
+    """Wall time of one fresh interpreter running `code`, plus its stderr"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+
+def slowest_imports(importtime_output: str, module: str, top: int) -> List[Tuple[str, float]]:
+    """Direct imports of `module` by cumulative seconds
+
+    `-X importtime` prints a module after everything it imports, children one
+    level deeper, so the direct imports are the depth-1 lines right before it.
+    """
+    children = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if name.strip() == module:
+                return sorted(children, key=lambda item: item[1], reverse=True)[:top]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EduBot start-up time")
+    parser.add_argument("--filter", help="Only run targets whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=7, help="Fresh interpreters per target")
+    parser.add_argument("--backend", choices=["fake", "gemini"], default="fake",
+                        help="LLM backend to start with (the gemini SDK loads on the first request, so not here)")
+    parser.add_argument("--profile", action="store_true", help="Show the slowest imports of each target")
+    parser.add_argument("--top", type=int, default=10, help="Imports listed by --profile")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown relative to the baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline_path = os.path.abspath(args.baseline)
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, 'r') as f:
+            baselines = json.load(f)
+
+    env = _environment(args.backend)
+    names = [name for name in TARGETS if not args.filter or args.filter in name]
+    results = {}
+    regressions = []
+    print(f"{'target':<24}{'median':>10}{'min':>10}{'baseline':>10}{'change':>9}")
+    with tempfile.TemporaryDirectory(prefix="edubot-startup-") as workdir:
+        for name in names:
+            key = f"{name}[{args.backend}]"
+            # One untimed run warms the OS file cache and writes .pyc files
+            module, code = TARGETS[name]
+            run_once(code, env, workdir)
+            times = [run_once(code, env, workdir)[0] for _ in range(args.repeat)]
+            median = statistics.median(times)
+            results[key] = {"median_s": median, "min_s": min(times)}
+
+            baseline = baselines.get(key, {}).get("median_s")
+            change = ""
+            status = ""
+            if baseline:
+                ratio = median / baseline - 1
+                change = f"{ratio:+.0%}"
+                if ratio > args.threshold:
+                    regressions.append(key)
+                    status = "  REGRESSION"
+            print(f"{key:<24}{median * 1000:>8.0f}ms{min(times) * 1000:>8.0f}ms"
+                  f"{f'{baseline * 1000:.0f}ms' if baseline else 'n/a':>10}{change:>9}{status}")
+
+            if args.profile:
+                _, output = run_once(code, env, workdir, importtime=True)
+                for child, seconds in slowest_imports(output, module, args.top):
+                    print(f"    {child:<40}{seconds * 1000:>8.1f}ms")
+
+    if args.save_baseline:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {baseline_path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} target(s) slower than baseline by more than {args.threshold:.0%}: "
+              + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
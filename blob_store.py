@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_process_lock = threading.RLock()
+
+
+class BlobStore:
+    """Content-addressed, reference-counted store for generated content
+
+    Blobs are keyed by the SHA-256 of their bytes, so identical notes, resources
+    or plans are written to disk once no matter how many sessions reference them.
+    Each blob carries a small reference count; `gc()` removes blobs nobody uses.
+    """
+
+    def __init__(self, blob_dir="blobs"):
+        self.blob_dir = blob_dir
+        os.makedirs(blob_dir, exist_ok=True)
+        self._lock_path = os.path.join(blob_dir, ".lock")
+
+    def put(self, content: Union[str, bytes]) -> str:
+        """Store content (if new) and take a reference to it"""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._locked():
+            path = self._blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            self._write_refcount(digest, self._read_refcount(digest) + 1)
+
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Read a blob's content"""
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            raise KeyError(f"Blob {digest} not found")
+        with open(path, 'rb') as f:
+            return f.read().decode("utf-8")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._blob_path(digest))
+
+    def incref(self, digest: str):
+        """Take an additional reference to an existing blob"""
+        with self._locked():
+            if not self.exists(digest):
+                raise KeyError(f"Blob {digest} not found")
+            self._write_refcount(digest, self._read_refcount(digest) + 1)
+
+    def decref(self, digest: str):
+        """Release a reference; the blob is removed by the next gc() at zero"""
+        with self._locked():
+            self._write_refcount(digest, max(self._read_refcount(digest) - 1, 0))
+
+    def refcount(self, digest: str) -> int:
+        return self._read_refcount(digest)
+
+    def gc(self) -> int:
+        """Delete unreferenced blobs, returning how many were removed"""
+        removed = 0
+        with self._locked():
+            for digest in list(self._iter_digests()):
+                if self._read_refcount(digest) > 0:
+                    continue
+                for path in (self._blob_path(digest), self._refs_path(digest)):
+                    if os.path.exists(path):
+                        os.remove(path)
+                removed += 1
+        return removed
+
+    def _iter_digests(self) -> Iterator[str]:
+        for shard in os.listdir(self.blob_dir):
+            shard_dir = os.path.join(self.blob_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for filename in os.listdir(shard_dir):
+                if filename.endswith(".blob"):
+                    yield filename[:-len(".blob")]
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.blob")
+
+    def _refs_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.refs")
+
+    def _read_refcount(self, digest: str) -> int:
+        try:
+            with open(self._refs_path(digest), 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_refcount(self, digest: str, count: int):
+        path = self._refs_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(count))
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self):
+        """Serialize refcount updates across threads and gunicorn workers"""
+        with _process_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,88 @@
+import gzip
+import os
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent as-is; compressing them costs more than it saves
+MIN_COMPRESS_SIZE = int(os.getenv("EDUBOT_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+# Static files rarely change, so their compressed bytes are kept per version
+_static_cache: Dict[Tuple[str, str, str], bytes] = {}
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_compression(app, min_size: int = MIN_COMPRESS_SIZE):
+    """Compress text responses (JSON, HTML, CSS, JS) with brotli or gzip"""
+
+    @app.after_request
+    def compress_response(response):
+        from flask import request
+
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        # Generated streams are left alone; static files (send_file) are read in full
+        is_static = request.endpoint == "static" and response.direct_passthrough
+        if response.is_streamed and not is_static:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        cache_key = (request.path, response.get_etag()[0] or "", encoding) if is_static else None
+        if cache_key and cache_key in _static_cache:
+            compressed = _static_cache[cache_key]
+            if hasattr(response.response, "close"):
+                response.response.close()
+        else:
+            # send_file responses stream from disk; read them so they can be compressed
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            compressed = _compress(data, encoding)
+            if cache_key:
+                _static_cache[cache_key] = compressed
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        # A weak validator stays valid across encodings of the same content
+        etag, is_weak = response.get_etag()
+        if etag and not is_weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
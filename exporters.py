@@ -0,0 +1,232 @@
+"""Streaming plan exporters: Markdown, iCalendar (.ics) and CSV
+
+Every exporter is a generator that yields the document in chunks of roughly
+CHUNK_SIZE characters, one plan session at a time, so even a 180-day plan is
+exported in constant memory and can be sent as a chunked HTTP response.
+"""
+import csv
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from plan_model import PlanSession, StudyPlan
+
+CHUNK_SIZE = 16 * 1024
+
+# Format (also the file extension) -> mimetype
+EXPORT_FORMATS = {
+    "md": "text/markdown; charset=utf-8",
+    "ics": "text/calendar; charset=utf-8",
+    "csv": "text/csv; charset=utf-8"
+}
+
+# A slot is "<clock> <separator> <clock>"; each clock must touch the separator
+_RANGE_SEPARATOR = re.compile(r"-|\u2013|\u2014|\bto\b", re.IGNORECASE)
+_CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?\s*([AaPp]\.?[Mm]\.?)?"
+_CLOCK_BEFORE = re.compile(r"(?<![\d:.])" + _CLOCK + r"\s*$")
+_CLOCK_AFTER = re.compile(r"\s*" + _CLOCK + r"(?![\d:])")
+
+
+def _batched(parts: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Join small pieces into chunks of about `size` characters"""
+    buffer: List[str] = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+# Markdown
+
+def _markdown_parts(plan: StudyPlan) -> Iterator[str]:
+    yield "# 📚 Your Study Plan\n\n"
+    for day_num, sessions in plan.by_day():
+        yield f"## Day {day_num}\n\n"
+        for session in sessions:
+            yield f"### {session.time_slot} - {session.topic}\n\n"
+            if session.description:
+                yield f"*{session.description}*\n\n"
+            if session.activities:
+                yield "**Activities:**\n"
+                for activity in session.activities:
+                    yield f"- {activity}\n"
+                yield "\n"
+            if session.expected_outcome:
+                yield f"**Expected Outcome:** {session.expected_outcome}\n\n"
+            yield "---\n\n"
+
+
+def iter_markdown(plan: StudyPlan) -> Iterator[str]:
+    return _batched(_markdown_parts(plan))
+
+
+# CSV
+
+class _Line:
+    """File-like target that hands back what csv.writer wrote for one row"""
+
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text: str):
+        self.value = text
+
+
+def _csv_parts(plan: StudyPlan) -> Iterator[str]:
+    line = _Line()
+    writer = csv.writer(line)
+    writer.writerow(["day", "time_slot", "start", "end", "topic", "description", "activities", "expected_outcome"])
+    yield line.value
+    for day_num, sessions in plan.by_day():
+        for session in sessions:
+            times = parse_time_slot(session.time_slot)
+            start, end = (t.strftime("%H:%M") for t in times) if times else ("", "")
+            writer.writerow([
+                day_num, session.time_slot, start, end, session.topic, session.description,
+                "; ".join(str(activity) for activity in session.activities), session.expected_outcome
+            ])
+            yield line.value
+
+
+def iter_csv(plan: StudyPlan) -> Iterator[str]:
+    return _batched(_csv_parts(plan))
+
+
+# iCalendar
+
+def _meridiem(match: re.Match) -> Optional[str]:
+    return (match.group(3) or "").replace(".", "").upper() or None
+
+
+def _clock(match: re.Match, default_meridiem: Optional[str]) -> Optional[time]:
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = _meridiem(match) or default_meridiem
+    if minute > 59 or hour > 23 or (meridiem and not 1 <= hour <= 12):
+        return None
+    if meridiem == "PM" and hour != 12:
+        hour += 12
+    elif meridiem == "AM" and hour == 12:
+        hour = 0
+    return time(hour, minute)
+
+
+def _split_slot(time_slot: str) -> Optional[Tuple[re.Match, re.Match]]:
+    """The clocks either side of the first range separator that has one on each side"""
+    for separator in _RANGE_SEPARATOR.finditer(time_slot):
+        start = _CLOCK_BEFORE.search(time_slot, 0, separator.start())
+        end = _CLOCK_AFTER.match(time_slot, separator.end())
+        if start and end:
+            return start, end
+    return None
+
+
+def parse_time_slot(time_slot: str) -> Optional[Tuple[time, time]]:
+    """Start and end times of a slot like "9:00 AM - 10:30 AM" or "14:00-15:30"
+
+    Text before the start clock is ignored ("Session 1: 9:00 AM - 10:30 AM").
+    A meridiem given only on one side applies to both ("9:00 - 11:00 AM"),
+    unless that puts the end first, as in "11:30 - 1:00 PM" (11:30 AM).
+    Returns None when the slot cannot be read.
+    """
+    if not isinstance(time_slot, str):
+        return None
+    clocks = _split_slot(time_slot)
+    if clocks is None:
+        return None
+    first, second = clocks
+    start_meridiem, end_meridiem = _meridiem(first), _meridiem(second)
+    start = _clock(first, end_meridiem)
+    end = _clock(second, start_meridiem)
+    if start is None or end is None:
+        return None
+    if end <= start:
+        if start_meridiem is None and end_meridiem == "PM":
+            start = _clock(first, "AM")
+        elif end_meridiem is None and start_meridiem == "AM":
+            end = _clock(second, "PM")
+        if start is None or end is None or end <= start:
+            return None
+    return start, end
+
+
+def _ics_escape(text: str) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_line(line: str) -> str:
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_event(session: PlanSession, index: int, uid_prefix: str, start_date: date, stamp: str) -> Iterator[str]:
+    day_offset = session.day - 1 if isinstance(session.day, int) and session.day >= 1 else 0
+    event_date = start_date + timedelta(days=day_offset)
+    times = parse_time_slot(session.time_slot)
+
+    description = session.description or ""
+    if session.activities:
+        description += "\n\nActivities:\n" + "\n".join(f"- {activity}" for activity in session.activities)
+    if session.expected_outcome:
+        description += f"\n\nExpected outcome: {session.expected_outcome}"
+
+    yield "BEGIN:VEVENT\r\n"
+    yield _ics_line(f"UID:{uid_prefix}-{index}@edubot")
+    yield f"DTSTAMP:{stamp}\r\n"
+    if times:
+        yield f"DTSTART:{datetime.combine(event_date, times[0]).strftime('%Y%m%dT%H%M%S')}\r\n"
+        yield f"DTEND:{datetime.combine(event_date, times[1]).strftime('%Y%m%dT%H%M%S')}\r\n"
+    else:
+        # Unreadable slot: keep the session as an all-day entry on its day
+        yield f"DTSTART;VALUE=DATE:{event_date.strftime('%Y%m%d')}\r\n"
+        yield f"DTEND;VALUE=DATE:{(event_date + timedelta(days=1)).strftime('%Y%m%d')}\r\n"
+    yield _ics_line(f"SUMMARY:{_ics_escape(session.topic)}")
+    if description:
+        yield _ics_line(f"DESCRIPTION:{_ics_escape(description.strip())}")
+    yield "END:VEVENT\r\n"
+
+
+def _ics_parts(plan: StudyPlan, start_date: date, uid_prefix: str) -> Iterator[str]:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//EduBot AI//Study Plan//EN\r\nCALSCALE:GREGORIAN\r\n"
+    yield "X-WR-CALNAME:Study Plan\r\n"
+    index = 0
+    for _, sessions in plan.by_day():
+        for session in sessions:
+            index += 1
+            yield from _ics_event(session, index, uid_prefix, start_date, stamp)
+    yield "END:VCALENDAR\r\n"
+
+
+def iter_ics(plan: StudyPlan, start_date: Optional[date] = None, uid_prefix: str = "plan") -> Iterator[str]:
+    """Calendar events in floating local time, day 1 on `start_date` (default: today)"""
+    return _batched(_ics_parts(plan, start_date or date.today(), uid_prefix))
+
+
+def iter_export(plan: StudyPlan, export_format: str, start_date: Optional[date] = None,
+                uid_prefix: str = "plan") -> Iterator[str]:
+    """Chunks of `plan` in one of EXPORT_FORMATS"""
+    if export_format == "md":
+        return iter_markdown(plan)
+    if export_format == "csv":
+        return iter_csv(plan)
+    if export_format == "ics":
+        return iter_ics(plan, start_date, uid_prefix)
+    raise ValueError(f"Unknown export format: {export_format}")
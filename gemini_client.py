@@ -1,23 +1,234 @@
-import google.generativeai as genai
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from observability.metrics import ERRORS, LLM_LATENCY, LLM_PROMPT_SIZE, LLM_RESPONSE_SIZE
+from usage import estimate_tokens, usage_tracker
 
 class GeminiClient:
     def __init__(self, api_key):
+        # The SDK takes a long time to import; only load it when Gemini is actually used
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel("models/gemini-2.5-flash")
 
-    def ask(self, prompt):
-        response = self.model.generate_content(prompt)
-        return response.text
+    def ask(self, prompt, response_schema=None):
+        return self.ask_with_usage(prompt, response_schema)[0]
+
+    @staticmethod
+    def _generation_config(response_schema):
+        """Constrain the response to JSON matching `response_schema` (if given)"""
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": response_schema}
+
+    def ask_with_usage(self, prompt, response_schema=None):
+        """Response text plus token counts (from usage metadata when the API reports it)"""
+        response = self.model.generate_content(prompt, generation_config=self._generation_config(response_schema))
+        text = response.text
+        metadata = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(metadata, "prompt_token_count", None)
+        response_tokens = getattr(metadata, "candidates_token_count", None)
+        return text, {
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+            "response_tokens": response_tokens if response_tokens is not None else estimate_tokens(text)
+        }
+
+    def ask_stream(self, prompt, response_schema=None):
+        """Yield response text chunks as they arrive; returns the token usage"""
+        response = self.model.generate_content(
+            prompt, stream=True, generation_config=self._generation_config(response_schema)
+        )
+        response_chars = 0
+        for chunk in response:
+            text = chunk.text
+            response_chars += len(text)
+            yield text
+        metadata = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(metadata, "prompt_token_count", None)
+        response_tokens = getattr(metadata, "candidates_token_count", None)
+        return {
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+            "response_tokens": response_tokens if response_tokens is not None else (response_chars + 3) // 4
+        }
+
+class FakeGeminiClient:
+    """Offline stand-in for Gemini used for load tests and local development
+
+    Answers each agent's prompt with plausibly sized, well-formed content after
+    a configurable delay, so the rest of the system behaves as in production.
+    """
+
+    SESSIONS_PER_DAY = 4
+    STREAM_CHUNK_CHARS = 512
+
+    def __init__(self, latency=1.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    def ask(self, prompt, response_schema=None):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        return self._respond(prompt)
+
+    def ask_with_usage(self, prompt, response_schema=None):
+        text = self.ask(prompt)
+        return text, {"prompt_tokens": estimate_tokens(prompt), "response_tokens": estimate_tokens(text)}
+
+    def ask_stream(self, prompt, response_schema=None):
+        """Yield the response in chunks, spreading the latency across them"""
+        text = self._respond(prompt)
+        chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)]
+        delay = (self.latency + random.uniform(0, self.jitter)) / max(len(chunks), 1)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+        return {"prompt_tokens": estimate_tokens(prompt), "response_tokens": estimate_tokens(text)}
+
+    def _respond(self, prompt):
+        if "academic planning agent" in prompt:
+            return self._plan(prompt)
+        if "resource-curation agent" in prompt:
+            return self._resources(prompt)
+        return self._notes(prompt)
+
+    def _plan(self, prompt):
+        match = re.search(r"Total study days:\s*(\d+)", prompt)
+        days = int(match.group(1)) if match else 3
+        first_day, last_day = 1, days
+        match = re.search(r"Days to generate:\s*(\d+)\s*-\s*(\d+)", prompt)
+        if match:
+            first_day, last_day = int(match.group(1)), int(match.group(2))
+        plan = []
+        for day in range(first_day, last_day + 1):
+            for slot in range(self.SESSIONS_PER_DAY):
+                start = 9 + slot * 2
+                plan.append({
+                    "day": day,
+                    "time_slot": f"{self._clock(start)} - {self._clock(start + 1.5)}",
+                    "topic": f"Day {day} Topic {slot + 1}",
+                    "description": "Core ideas, worked examples and common pitfalls for this topic.",
+                    "activities": ["Read the summary notes", "Work through three practice problems"],
+                    "expected_outcome": "Able to explain the topic and solve standard exercises"
+                })
+        return json.dumps(plan, indent=2)
 
-# global reference
+    @staticmethod
+    def _clock(hour):
+        whole = int(hour)
+        minutes = "30" if hour - whole else "00"
+        suffix = "AM" if whole < 12 else "PM"
+        return f"{(whole - 1) % 12 + 1}:{minutes} {suffix}"
+
+    @staticmethod
+    def _notes(prompt):
+        sections = []
+        for index in range(1, 9):
+            sections.append(
+                f"### Key Concept {index}\n"
+                f"- **Term {index}**: A concise, exam-focused definition of the idea.\n"
+                f"  - Why it matters and where it appears in practice\n"
+                f"  - A common mistake to avoid\n"
+            )
+        return "## Study Notes\n\n" + "\n".join(sections)
+
+    @staticmethod
+    def _resources(prompt):
+        # One section per requested topic, or five numbered ones
+        match = re.search(r"TOPICS[^\n]*\n((?:- .*\n?)+)", prompt)
+        names = [line[2:].strip() for line in match.group(1).splitlines()] if match else [
+            f"Topic {index}" for index in range(1, 6)]
+        sections = []
+        for index, name in enumerate(names, start=1):
+            sections.append(
+                f"## {name}\n\n"
+                f"### Video Resources\n"
+                f"- [Lecture {index}](https://example.com/video/{index}) - Introductory lecture\n\n"
+                f"### Reading Materials\n"
+                f"- [Guide {index}](https://example.com/guide/{index}) - Beginner friendly guide\n"
+            )
+        return "\n".join(sections)
+
+# global reference, set by init_gemini (the real client is created on first use)
 gemini = None
+_gemini_api_key = None
+_client_lock = threading.Lock()
 
-def init_gemini(api_key):
-    global gemini
-    gemini = GeminiClient(api_key)
+# Process-wide cap on concurrent Gemini calls (EDUBOT_LLM_CONCURRENCY); every
+# call, interactive, batch or repair, waits here for a slot
+_llm_slots = threading.BoundedSemaphore(max(int(os.getenv("EDUBOT_LLM_CONCURRENCY", "32")), 1))
+
+@contextmanager
+def _llm_slot():
+    """Hold one of the process's Gemini call slots"""
+    with _llm_slots:
+        yield
+
+def llm_backend():
+    """Configured LLM backend: "gemini" (default) or "fake" for offline runs"""
+    return os.getenv("EDUBOT_LLM_BACKEND", "gemini").lower()
 
-def ask_gemini(prompt):
+def init_gemini(api_key, backend=None):
+    """Configure the client; the Gemini SDK itself is only loaded by the first call"""
+    global gemini, _gemini_api_key
+    if (backend or llm_backend()) == "fake":
+        gemini = FakeGeminiClient(
+            latency=float(os.getenv("EDUBOT_FAKE_LATENCY", "1.0")),
+            jitter=float(os.getenv("EDUBOT_FAKE_JITTER", "0.0"))
+        )
+    else:
+        gemini = None
+        _gemini_api_key = api_key
+
+def _client():
+    """The configured client, creating the Gemini one on first use"""
     global gemini
     if gemini is None:
-        raise RuntimeError("Gemini not initialized. Call init_gemini(api_key) first.")
-    return gemini.ask(prompt)
+        with _client_lock:
+            if gemini is None:
+                if _gemini_api_key is None:
+                    raise RuntimeError("Gemini not initialized. Call init_gemini(api_key) first.")
+                gemini = GeminiClient(_gemini_api_key)
+    return gemini
+
+def ask_gemini(prompt, agent="unknown", response_schema=None):
+    client = _client()
+
+    LLM_PROMPT_SIZE.labels(agent).observe(len(prompt))
+    try:
+        with _llm_slot(), LLM_LATENCY.labels(agent).time():
+            response, usage = client.ask_with_usage(prompt, response_schema)
+    except Exception:
+        ERRORS.labels(agent).inc()
+        raise
+    LLM_RESPONSE_SIZE.labels(agent).observe(len(response or ""))
+    usage_tracker.record(agent, usage["prompt_tokens"], usage["response_tokens"])
+    return response
+
+def ask_gemini_stream(prompt, agent="unknown", response_schema=None):
+    """Like ask_gemini, but yields the response in chunks as Gemini produces them"""
+    client = _client()
+
+    LLM_PROMPT_SIZE.labels(agent).observe(len(prompt))
+    with _llm_slot():
+        start = time.perf_counter()
+        response_chars = 0
+        stream = client.ask_stream(prompt, response_schema)
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as stop:
+                usage = stop.value
+                break
+            except Exception:
+                ERRORS.labels(agent).inc()
+                raise
+            response_chars += len(chunk)
+            yield chunk
+
+    LLM_LATENCY.labels(agent).observe(time.perf_counter() - start)
+    LLM_RESPONSE_SIZE.labels(agent).observe(response_chars)
+    usage_tracker.record(agent, usage["prompt_tokens"], usage["response_tokens"])
@@ -0,0 +1,268 @@
+"""Precomputed catalog of popular generations
+
+Most term-start traffic asks for the same few hundred course syllabi. This
+job mines stored sessions for the most requested (syllabus, days,
+difficulty) combinations, generates their plan, notes and resources
+off-peak, and installs them as cache entries that `Orchestrator.process`
+serves without calling Gemini. Entry content lives in the shared blob store,
+so a cached plan copied into a session is not stored twice.
+
+Usage:
+    python generation_cache.py --top 300 --min-count 2 --workers 8
+    python generation_cache.py --dry-run
+"""
+import argparse
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from blob_store import BlobStore
+from observability.metrics import GENERATION_CACHE
+from plan_model import StudyPlan
+from session_manager import SessionManager
+from usage import usage_scope
+
+
+def normalize_syllabus(syllabus: str) -> str:
+    """Whitespace- and case-insensitive form used to match identical syllabi"""
+    return " ".join(str(syllabus).split()).lower()
+
+
+def content_key(syllabus: str, days: Any, difficulty: str) -> Optional[Tuple[str, int, str]]:
+    """Identity of a plan request, or None if it cannot be matched (non-numeric days)"""
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return None
+    return normalize_syllabus(syllabus), days, str(difficulty).strip().lower()
+
+
+class GenerationCache:
+    """Cache entries of full generations keyed by (syllabus, days, difficulty)
+
+    Entries are small JSON records under ``<cache_dir>/<shard>/<key>.json``
+    pointing at blobs; each entry holds a reference on its blobs so retention
+    never collects them. Entries older than `max_age_days` are ignored, and
+    `purge_expired` deletes them and drops their blob references.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, blob_store: Optional[BlobStore] = None,
+                 max_age_days: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv("EDUBOT_CATALOG_DIR", "catalog")
+        self.blob_store = blob_store or BlobStore()
+        self.max_age_days = (max_age_days if max_age_days is not None
+                             else int(os.getenv("EDUBOT_CATALOG_MAX_AGE_DAYS", "120")))
+
+    def get(self, syllabus: str, days: Any, difficulty: str) -> Optional[Dict[str, Any]]:
+        """Cached plan text, StudyPlan, notes and resources, or None on a miss"""
+        key = content_key(syllabus, days, difficulty)
+        entry = self._read_entry(key) if key else None
+        if entry is None or self._expired(entry):
+            GENERATION_CACHE.labels("miss").inc()
+            return None
+        try:
+            blobs = entry["blobs"]
+            result = {
+                "study_plan_raw": self.blob_store.get(blobs["study_plan_raw"]),
+                "plan": StudyPlan.coerce(json.loads(self.blob_store.get(blobs["study_plan"]))),
+                "notes": self.blob_store.get(blobs["notes"]),
+                "resources": self.blob_store.get(blobs["resources"])
+            }
+        except (KeyError, ValueError) as e:
+            print(f"Error reading catalog entry for {syllabus[:50]}: {e}")
+            GENERATION_CACHE.labels("miss").inc()
+            return None
+        GENERATION_CACHE.labels("hit").inc()
+        return result
+
+    def put(self, syllabus: str, days: Any, difficulty: str, plan_text: str,
+            plan: StudyPlan, notes: str, resources: str):
+        """Install (or replace) the entry for a request"""
+        key = content_key(syllabus, days, difficulty)
+        if key is None:
+            return
+        # Same encoding as session blobs, so sessions copied from the catalog share them
+        blobs = {
+            "study_plan": self.blob_store.put(json.dumps(StudyPlan.coerce(plan).to_compact())),
+            "study_plan_raw": self.blob_store.put(plan_text),
+            "notes": self.blob_store.put(notes),
+            "resources": self.blob_store.put(resources)
+        }
+        previous = self._read_entry(key)
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "syllabus": syllabus,
+                "days": key[1],
+                "difficulty": difficulty,
+                "created_at": datetime.now().isoformat(),
+                "blobs": blobs
+            }, f)
+        os.replace(tmp_path, path)
+        if previous:
+            for digest in previous.get("blobs", {}).values():
+                self.blob_store.decref(digest)
+
+    def has_fresh(self, syllabus: str, days: Any, difficulty: str) -> bool:
+        key = content_key(syllabus, days, difficulty)
+        entry = self._read_entry(key) if key else None
+        return entry is not None and not self._expired(entry)
+
+    def purge_expired(self, dry_run: bool = False) -> int:
+        """Delete expired (or unreadable) entries and release their blobs; returns how many"""
+        removed = 0
+        if not os.path.isdir(self.cache_dir):
+            return removed
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for filename in os.listdir(shard_dir):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(shard_dir, filename)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    entry = {}
+                if not self._expired(entry):
+                    continue
+                removed += 1
+                if dry_run:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                for digest in entry.get("blobs", {}).values():
+                    self.blob_store.decref(digest)
+        return removed
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        try:
+            created = datetime.fromisoformat(entry.get("created_at", ""))
+        except ValueError:
+            return True
+        return datetime.now() - created > timedelta(days=self.max_age_days)
+
+    def _entry_path(self, key: Tuple[str, int, str]) -> str:
+        digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def _read_entry(self, key: Tuple[str, int, str]) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def popular_requests(session_manager: SessionManager, top: int = 300,
+                     min_count: int = 2) -> List[Tuple[Dict[str, Any], int]]:
+    """The most frequently requested (syllabus, days, difficulty) across stored sessions
+
+    Returns [(request, count)] most frequent first; each request is the first
+    spelling seen of that syllabus.
+    """
+    counts: Counter = Counter()
+    examples: Dict[Tuple[str, int, str], Dict[str, Any]] = {}
+    for user_id in session_manager.iter_user_ids():
+        for session in session_manager.list_sessions(user_id):
+            syllabus = session.get("syllabus")
+            if not syllabus or not session.get("difficulty"):
+                continue
+            key = content_key(syllabus, session.get("days"), session["difficulty"])
+            if key is None:
+                continue
+            counts[key] += 1
+            examples.setdefault(key, {"syllabus": syllabus, "days": key[1], "difficulty": session["difficulty"]})
+    return [(examples[key], count) for key, count in counts.most_common(top) if count >= min_count]
+
+
+def precompute(orchestrator, requests: List[Dict[str, Any]], cache: GenerationCache,
+               workers: int = 4) -> Dict[str, int]:
+    """Generate and install cache entries; notes/resources are generated once per syllabus"""
+    stats = {"generated": 0, "failed": 0}
+    tasks: Dict[Any, concurrent.futures.Future] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(key, func, *args):
+            if key not in tasks:
+                tasks[key] = executor.submit(contextvars.copy_context().run, func, *args)
+            return tasks[key]
+
+        jobs = []
+        for request in requests:
+            syllabus, days, difficulty = request["syllabus"], request["days"], request["difficulty"]
+            syllabus_key = normalize_syllabus(syllabus)
+            jobs.append((request, (
+                submit(("plan",) + content_key(syllabus, days, difficulty),
+                       orchestrator._generate_plan, syllabus, days, difficulty),
+                submit(("notes", syllabus_key), orchestrator._generate_notes, syllabus),
+                submit(("resources", syllabus_key), orchestrator._generate_resources, syllabus)
+            )))
+
+        for request, (plan_future, notes_future, resources_future) in jobs:
+            try:
+                plan_text, plan = plan_future.result()
+                cache.put(request["syllabus"], request["days"], request["difficulty"],
+                          plan_text, plan, notes_future.result(), resources_future.result())
+                stats["generated"] += 1
+            except Exception as e:
+                print(f"Error precomputing {request['syllabus'][:50]}: {e}")
+                stats["failed"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the most requested plans into the catalog cache")
+    parser.add_argument("--top", type=int, default=300, help="Number of most frequent requests to consider")
+    parser.add_argument("--min-count", type=int, default=2, help="Only requests seen at least N times")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel agent calls")
+    parser.add_argument("--refresh", action="store_true", help="Regenerate entries that are still fresh")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be precomputed without generating")
+    args = parser.parse_args()
+
+    # Imported here: the orchestrator itself reads from this cache
+    from gemini_client import init_gemini, llm_backend
+    from orchestrator import Orchestrator
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and llm_backend() != "fake":
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+    init_gemini(api_key)
+
+    orchestrator = Orchestrator(api_key, user_id="catalog")
+    cache = GenerationCache(blob_store=orchestrator.blob_store)
+    popular = popular_requests(orchestrator.session_manager, args.top, args.min_count)
+    todo = [request for request, _ in popular
+            if args.refresh or not cache.has_fresh(request["syllabus"], request["days"], request["difficulty"])]
+
+    prefix = "[dry run] " if args.dry_run else ""
+    print(f"{prefix}expired entries removed: {cache.purge_expired(dry_run=args.dry_run)}")
+    print(f"{prefix}popular requests: {len(popular)}")
+    print(f"{prefix}already cached: {len(popular) - len(todo)}")
+    if args.dry_run:
+        for request, count in popular:
+            print(f"  {count:5d}  {request['days']:3d} days  {request['difficulty']:<8}  {request['syllabus'][:60]}")
+        return
+
+    # Precomputation spend is accounted to the "catalog" user
+    with usage_scope("catalog"):
+        stats = precompute(orchestrator, todo, cache, args.workers)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Gunicorn configuration for the EduBot web app
+
+Generation requests spend almost all of their time waiting on Gemini, so each
+worker process runs a thread pool (``gthread``) instead of serving one request
+at a time. A single process can then hold many in-flight generations while
+short endpoints (/progress, /session, /sessions/list) keep getting threads.
+
+Every setting can be overridden with an environment variable:
+
+    WEB_CONCURRENCY            worker processes (default: 2)
+    GUNICORN_THREADS           threads per worker (default: 32)
+    GUNICORN_WORKER_CLASS      "gthread" (default), or "gevent" if gevent is installed
+    GUNICORN_TIMEOUT           seconds before a silent worker is restarted (default: 180)
+    GUNICORN_KEEPALIVE         keep-alive seconds for idle client connections (default: 5)
+    GUNICORN_MAX_REQUESTS      recycle a worker after N requests, 0 disables (default: 1000)
+    EDUBOT_GENERATION_SLOTS    concurrent /generate calls per worker (default: threads - 8),
+                               read by web_app.py
+    EDUBOT_MAX_QUEUED          /generate calls per worker waiting for a slot (default: 4);
+                               the remaining 4 threads stay free for short endpoints
+    EDUBOT_USER_MAX_IN_FLIGHT  running + queued generations per user (default: 2)
+    EDUBOT_USER_RATE_PER_MINUTE, EDUBOT_USER_BURST
+                               per-user token bucket for generations (default: 6/min, burst 3)
+    EDUBOT_QUEUE_TIMEOUT       seconds a queued generation waits before a 503 (default: 10)
+    EDUBOT_LLM_CONCURRENCY     concurrent Gemini calls per worker, across all requests
+                               (default: 32), read by gemini_client.py
+    EDUBOT_METRICS_DIR         where workers share metrics snapshots for /metrics
+                               (default: <tmp>/edubot-metrics, cleared at server start)
+
+With the defaults, 2 workers hold 48 concurrent generations plus 8 queued — a
+classroom-sized burst — while 8 threads stay reserved for short requests.
+Admission (admission.py) is per worker, so per-user limits apply per process.
+"""
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# A full generation can take 30s+; the default 30s timeout would kill it
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+# Each worker writes its metrics here so /metrics can aggregate all of them
+os.environ.setdefault("EDUBOT_METRICS_DIR", os.path.join(tempfile.gettempdir(), "edubot-metrics"))
+
+
+def on_starting(server):
+    """Start every server with empty metrics (counters restart at zero)"""
+    metrics_dir = os.environ["EDUBOT_METRICS_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's counters but stop reporting its gauges"""
+    from observability.metrics import registry
+    registry.mark_process_dead(worker.pid)
@@ -1,20 +1,72 @@
+import argparse
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-from gemini_client import init_gemini
+from batch_runner import load_completed, read_batch_file, run_batch
+from gemini_client import init_gemini, llm_backend
 from orchestrator import Orchestrator
+from observability.logger import new_request_id
+from observability.profiler import profiled
 from ui.cli_interface import CLIInterface
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="EduBot AI study planner")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="generate plans for every row of a CSV/JSONL file (syllabus, days, difficulty, "
+                             "optional id and user_id) without prompting")
+    parser.add_argument("--out", default="batch_output",
+                        help="output directory for --batch; rows already done there are skipped (default: batch_output)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="parallel agent calls for --batch (default: 4)")
+    parser.add_argument("--user-id", default="student",
+                        help="user for rows without a user_id (default: student)")
+    return parser.parse_args()
+
+def run_batch_mode(args, api_key, ui):
+    """Generate a whole file of syllabi with a progress bar; resumable"""
+    try:
+        rows = read_batch_file(args.batch)
+    except ValueError as e:
+        ui.console.print(f"[red]Invalid batch file {args.batch}: {e}[/red]")
+        return
+    completed = load_completed(args.out)
+    pending = [row for row in rows if row["id"] not in completed]
+    skipped = len(rows) - len(pending)
+    if skipped:
+        ui.console.print(f"[cyan]Skipping {skipped} rows already generated in {args.out}[/cyan]")
+    
+    system = Orchestrator(api_key, user_id=args.user_id)
+    summary = {}
+    with ui.batch_progress() as progress:
+        task = progress.add_task("Generating plans", total=len(pending))
+        
+        def on_result(entry):
+            if entry["status"] != "ok":
+                progress.console.print(f"[red]✗ {entry['id']}: {entry.get('error')}[/red]")
+            progress.advance(task)
+        
+        if pending:
+            summary = run_batch(system, pending, args.out, args.workers, on_result)
+    
+    ui.display_batch_summary(summary, skipped, args.out)
+
 def main():
+    args = parse_args()
+    
     # Initialize
     api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
+    if not api_key and llm_backend() != "fake":
         raise ValueError("GOOGLE_API_KEY not found in environment variables.")
     
     init_gemini(api_key)
+    request_id = new_request_id()
     ui = CLIInterface()
     
+    if args.batch:
+        run_batch_mode(args, api_key, ui)
+        return
+    
     # Show welcome screen
     ui.show_welcome()
     
@@ -31,10 +83,17 @@ def main():
     ui.console.print("\n[bold green]🔄 Generating your personalized study plan...[/bold green]")
     
     try:
-        result = system.process(syllabus, days, difficulty)
+        # EDUBOT_PROFILE=1 captures a cProfile of the generation step
+        with profiled("cli_generate", request_id, enabled=os.getenv("EDUBOT_PROFILE") == "1"):
+            result = system.process(
+                syllabus, days, difficulty,
+                on_plan_session=lambda s: ui.console.print(
+                    f"  [dim]📅 Day {s.get('day', '?')}: {s.get('topic', 'Untitled')}[/dim]"
+                )
+            )
         
         # Display results with new formatting
-        ui.display_study_plan(result["study_plan"])
+        ui.display_study_plan(result["study_plan"], result["plan"])
         ui.display_notes(result["notes"])
         ui.display_resources(result["resources"])
         ui.display_session_info(result["session_id"], result["notes_file"])
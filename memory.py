@@ -1,58 +1,332 @@
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from resource_store import normalize_topic, split_topics
+from storage_layout import user_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Guards the module caches below; each user's files have their own lock
+_memory_lock = threading.RLock()
+_user_locks: Dict[str, threading.Lock] = {}
+
+# Profile snapshots served from memory: {snapshot path: ((mtime_ns, size), profile dict)}
+_profiles: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+MAX_CACHED_PROFILES = 10000
+# The old single memory file, loaded once per process to migrate users from
+_legacy: Dict[str, Dict[str, Any]] = {}
+
+RECENT_TOPICS = 10
+# Weight of the newest gap between completions in the velocity average
+VELOCITY_ALPHA = 0.3
+
+
+def _counts_max(counts: Dict[str, int]) -> Optional[str]:
+    return max(counts, key=counts.get) if counts else None
+
+
+class UserProfile:
+    """Running summary of a user's learning history, updated in O(1) per event"""
+
+    def __init__(self):
+        self.plans = 0
+        self.difficulty_counts: Dict[str, int] = {}
+        self.days_counts: Dict[str, int] = {}
+        self.topic_counts: Dict[str, int] = {}
+        self.recent_topics = deque(maxlen=RECENT_TOPICS)
+        self.completions = 0
+        self.last_completed_at: Optional[str] = None
+        # Exponentially weighted average of seconds between completions
+        self.completion_gap: Optional[float] = None
+
+    def record_plan(self, difficulty: Optional[str], syllabus: Optional[str], days: Any = None):
+        self.plans += 1
+        if difficulty:
+            key = str(difficulty).lower()
+            self.difficulty_counts[key] = self.difficulty_counts.get(key, 0) + 1
+        if days:
+            key = str(days)
+            self.days_counts[key] = self.days_counts.get(key, 0) + 1
+        for topic in split_topics(syllabus or ""):
+            key = normalize_topic(topic)
+            self.topic_counts[key] = self.topic_counts.get(key, 0) + 1
+
+    def record_completion(self, topic: str, completed_at: Optional[str] = None):
+        completed_at = completed_at or datetime.now().isoformat()
+        if self.last_completed_at:
+            try:
+                gap = (datetime.fromisoformat(completed_at)
+                       - datetime.fromisoformat(self.last_completed_at)).total_seconds()
+            except ValueError:
+                gap = None
+            if gap is not None and gap >= 0:
+                self.completion_gap = gap if self.completion_gap is None else (
+                    VELOCITY_ALPHA * gap + (1 - VELOCITY_ALPHA) * self.completion_gap)
+        self.completions += 1
+        self.last_completed_at = completed_at
+        self.recent_topics.append(topic)
+
+    def preferred_difficulty(self) -> Optional[str]:
+        return _counts_max(self.difficulty_counts)
+
+    def typical_days(self) -> Optional[int]:
+        days = _counts_max(self.days_counts)
+        return int(days) if days and days.isdigit() else None
+
+    def top_topics(self, limit: int = 5) -> List[str]:
+        return sorted(self.topic_counts, key=self.topic_counts.get, reverse=True)[:limit]
+
+    def completion_velocity(self) -> Optional[float]:
+        """Topics completed per day, from the recent gaps between completions"""
+        if not self.completion_gap:
+            return None
+        return round(86400 / self.completion_gap, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "plans": self.plans,
+            "difficulty_counts": self.difficulty_counts,
+            "days_counts": self.days_counts,
+            "topic_counts": self.topic_counts,
+            "recent_topics": list(self.recent_topics),
+            "completions": self.completions,
+            "last_completed_at": self.last_completed_at,
+            "completion_gap": self.completion_gap
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """What personalization uses, in a response-friendly form"""
+        return {
+            "plans": self.plans,
+            "preferred_difficulty": self.preferred_difficulty(),
+            "typical_days": self.typical_days(),
+            "difficulty_histogram": dict(self.difficulty_counts),
+            "top_topics": self.top_topics(),
+            "recent_topics": list(self.recent_topics),
+            "completions": self.completions,
+            "completion_velocity_per_day": self.completion_velocity()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserProfile":
+        profile = cls()
+        profile.plans = data.get("plans", 0)
+        profile.difficulty_counts = dict(data.get("difficulty_counts", {}))
+        profile.days_counts = dict(data.get("days_counts", {}))
+        profile.topic_counts = dict(data.get("topic_counts", {}))
+        profile.recent_topics.extend(data.get("recent_topics", []))
+        profile.completions = data.get("completions", 0)
+        profile.last_completed_at = data.get("last_completed_at")
+        profile.completion_gap = data.get("completion_gap")
+        return profile
+
+    @classmethod
+    def from_history(cls, history: Dict[str, Any]) -> "UserProfile":
+        """Stored profile, or one replayed from the raw history of older records"""
+        if "profile" in history:
+            return cls.from_dict(history["profile"])
+        profile = cls()
+        for preference in history.get("preferences", []):
+            profile.record_plan(preference.get("difficulty"), preference.get("topic"), preference.get("days"))
+        for completed in history.get("completed_topics", []):
+            completed_at = completed.get("completed_at")
+            if not isinstance(completed_at, str) or not completed_at[:1].isdigit():
+                completed_at = None  # older records stored a placeholder
+            profile.completions += 1
+            profile.recent_topics.append(completed.get("topic"))
+            profile.last_completed_at = completed_at or profile.last_completed_at
+        return profile
 
 class MemoryBank:
-    """Long-term memory for user preferences and learning patterns"""
-    
-    def __init__(self, memory_file="sessions/memory_bank.json"):
-        self.memory_file = memory_file
-        self._ensure_memory_file()
+    """Long-term memory for user preferences and learning patterns
+
+    Each user has two files in their session directory
+    (``<memory_dir>/users/<shard>/<user>/``): an append-only event log
+    (``memory-<id>.jsonl``) and a small snapshot of their running profile
+    (``memory-<id>.json``). An event appends one line and rewrites the
+    snapshot, so its cost doesn't grow with anyone's history. Both files are
+    locked across gunicorn workers, and one user's writes never invalidate
+    another user's cached profile. Users still in the old single
+    ``memory_bank.json`` are moved over on their first new event.
+    """
     
-    def _ensure_memory_file(self):
-        """Create memory file if it doesn't exist"""
-        os.makedirs(os.path.dirname(self.memory_file), exist_ok=True)
-        if not os.path.exists(self.memory_file):
-            with open(self.memory_file, 'w') as f:
-                json.dump({}, f)
+    def __init__(self, memory_dir: Optional[str] = None, legacy_file: Optional[str] = None):
+        self.memory_dir = memory_dir or "sessions"
+        self.legacy_file = legacy_file or os.path.join(self.memory_dir, "memory_bank.json")
     
     def add_learning_preference(self, user_id: str, preference: Dict[str, Any]):
         """Store user learning preferences"""
-        memory = self._load_memory()
-        
-        if user_id not in memory:
-            memory[user_id] = {
-                "preferences": [],
-                "completed_topics": [],
-                "difficulty_history": []
-            }
-        
-        memory[user_id]["preferences"].append(preference)
-        self._save_memory(memory)
+        self.add_learning_preferences([(user_id, preference)])
+    
+    def add_learning_preferences(self, preferences: List[Tuple[str, Dict[str, Any]]]):
+        """Store many (user_id, preference) pairs; one write per user"""
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for user_id, preference in preferences:
+            by_user.setdefault(user_id, []).append(preference)
+        for user_id, user_preferences in by_user.items():
+            with self._locked(user_id) as events:
+                profile = self._current_profile(user_id, events)
+                for preference in user_preferences:
+                    events.write(json.dumps({"preference": preference}) + "\n")
+                    profile.record_plan(preference.get("difficulty"), preference.get("topic"), preference.get("days"))
+                self._save_profile(user_id, profile)
     
     def get_user_history(self, user_id: str) -> Dict[str, Any]:
         """Retrieve user's learning history"""
-        memory = self._load_memory()
-        return memory.get(user_id, {})
+        history: Dict[str, Any] = {"preferences": [], "completed_topics": [], "difficulty_history": []}
+        try:
+            with open(self._events_path(user_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut off by a crash
+                    if "preference" in event:
+                        history["preferences"].append(event["preference"])
+                    elif "completed" in event:
+                        history["completed_topics"].append(event["completed"])
+        except FileNotFoundError:
+            return self._legacy_history(user_id)
+        history["profile"] = self.get_user_profile(user_id).to_dict()
+        return history
     
     def add_completed_topic(self, user_id: str, topic: str, performance: str):
         """Track completed topics"""
-        memory = self._load_memory()
+        with self._locked(user_id) as events:
+            profile = self._current_profile(user_id, events)
+            completed_at = datetime.now().isoformat()
+            events.write(json.dumps({"completed": {
+                "topic": topic,
+                "performance": performance,
+                "completed_at": completed_at
+            }}) + "\n")
+            profile.record_completion(topic, completed_at)
+            self._save_profile(user_id, profile)
+    
+    def get_user_profile(self, user_id: str) -> UserProfile:
+        """A copy of the user's running profile
         
-        if user_id not in memory:
-            memory[user_id] = {"completed_topics": []}
+        Served from memory; the snapshot is only re-read when it changed on disk.
+        """
+        path = self._profile_path(user_id)
+        stamp = _file_stamp(path)
+        with _memory_lock:
+            cached = _profiles.get(path)
+            if cached is not None and cached[0] == stamp:
+                return UserProfile.from_dict(cached[1])
+        if stamp is None:
+            # No events yet in this layout: derive from the old shared file, if any
+            return UserProfile.from_history(self._legacy_history(user_id))
+        data = self._read_profile(path)
+        with _memory_lock:
+            _cache_profile(path, stamp, data)
+        return UserProfile.from_dict(data)
+    
+    def _current_profile(self, user_id: str, events) -> UserProfile:
+        """Profile to update for an event (caller holds the user's lock)
         
-        memory[user_id]["completed_topics"].append({
-            "topic": topic,
-            "performance": performance,
-            "completed_at": json.dumps({"time": "now"})  # simplified
-        })
-        self._save_memory(memory)
-    
-    def _load_memory(self) -> Dict[str, Any]:
-        with open(self.memory_file, 'r') as f:
-            return json.load(f)
-    
-    def _save_memory(self, memory: Dict[str, Any]):
-        with open(self.memory_file, 'w') as f:
-            json.dump(memory, f, indent=2)
\ No newline at end of file
+        A user without events in this layout is migrated from the old file first.
+        """
+        if events.tell() == 0:
+            history = self._legacy_history(user_id)
+            for preference in history.get("preferences", []):
+                events.write(json.dumps({"preference": preference}) + "\n")
+            for completed in history.get("completed_topics", []):
+                events.write(json.dumps({"completed": completed}) + "\n")
+            return UserProfile.from_history(history)
+        path = self._profile_path(user_id)
+        return UserProfile.from_dict(self._read_profile(path))
+    
+    def _save_profile(self, user_id: str, profile: UserProfile):
+        # Write-then-rename so concurrent readers never see a half-written file
+        path = self._profile_path(user_id)
+        data = profile.to_dict()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"user_id": user_id, "profile": data}, f)
+        os.replace(tmp_path, path)
+        with _memory_lock:
+            _cache_profile(path, _file_stamp(path), data)
+    
+    @staticmethod
+    def _read_profile(path: str) -> Dict[str, Any]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("profile", {})
+        except (OSError, ValueError):
+            return {}
+    
+    @contextmanager
+    def _locked(self, user_id: str) -> Iterator[Any]:
+        """The user's event log opened for appending, locked across threads and workers"""
+        path = self._events_path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _user_lock(path), open(path, 'a', encoding='utf-8') as events:
+            if fcntl is not None:
+                fcntl.flock(events, fcntl.LOCK_EX)
+            try:
+                yield events
+                events.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(events, fcntl.LOCK_UN)
+    
+    def _file_prefix(self, user_id: str) -> str:
+        # Distinct users can share a sanitized directory name; the hash keeps their files apart
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(user_dir(self.memory_dir, user_id), f"memory-{digest}")
+    
+    def _events_path(self, user_id: str) -> str:
+        return f"{self._file_prefix(user_id)}.jsonl"
+    
+    def _profile_path(self, user_id: str) -> str:
+        return f"{self._file_prefix(user_id)}.json"
+    
+    def _legacy_history(self, user_id: str) -> Dict[str, Any]:
+        """The user's record in the old single memory file (read once per process)"""
+        with _memory_lock:
+            if self.legacy_file not in _legacy:
+                try:
+                    with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                        _legacy[self.legacy_file] = json.load(f)
+                except (OSError, ValueError):
+                    _legacy[self.legacy_file] = {}
+            return _legacy[self.legacy_file].get(user_id, {})
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cache_profile(path: str, stamp: Optional[Tuple[int, int]], data: Dict[str, Any]):
+    """Remember a snapshot (caller holds _memory_lock)"""
+    if stamp is None:
+        return
+    if len(_profiles) >= MAX_CACHED_PROFILES:
+        _profiles.clear()
+    _profiles[path] = (stamp, data)
+
+
+def _user_lock(path: str) -> threading.Lock:
+    with _memory_lock:
+        lock = _user_locks.get(path)
+        if lock is None:
+            if len(_user_locks) >= MAX_CACHED_PROFILES:
+                # Only idle locks can be dropped safely
+                for key in [key for key, value in _user_locks.items() if not value.locked()]:
+                    del _user_locks[key]
+            lock = _user_locks[path] = threading.Lock()
+        return lock
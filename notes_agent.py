@@ -38,4 +38,34 @@ Example Structure:
 
 Return output in proper markdown format (no code fences, just markdown).
 """
-        return ask_gemini(prompt)
\ No newline at end of file
+        return ask_gemini(prompt, agent="NotesAgent")
+
+    def generate_topic_notes(self, topic, syllabus=None, plan_session=None):
+        """Detailed notes for a single plan topic, in the context of its course"""
+        context = ""
+        if syllabus:
+            context += f"Course syllabus: {syllabus}\n"
+        if plan_session is not None:
+            if plan_session.description:
+                context += f"Session focus: {plan_session.description}\n"
+            if plan_session.expected_outcome:
+                context += f"Expected outcome: {plan_session.expected_outcome}\n"
+        prompt = f"""
+You are an academic tutor writing deep-dive study notes.
+
+TASK:
+Write detailed, exam-focused notes in MARKDOWN format that cover ONLY the topic below in depth.
+
+Topic: {topic}
+{context}
+FORMATTING RULES:
+- Use proper markdown headers (##, ###)
+- Explain each key concept step by step, with a worked example where it helps
+- Use **bold** for key terms
+- Include formulas if relevant (use code blocks for equations)
+- End with a short "### Common Mistakes" and "### Quick Self-Check" section
+- Do NOT cover other topics of the course
+
+Return output in proper markdown format (no code fences, just markdown).
+"""
+        return ask_gemini(prompt, agent="NotesAgent")
@@ -1,41 +1,240 @@
-import logging
+import atexit
+import contextvars
 import json
-from datetime import datetime
-from typing import Any, Dict
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+LOGGER_NAME = "StudyPlannerAgent"
+
+# Long input strings (e.g. a pasted syllabus) are cut to this many characters
+MAX_FIELD_CHARS = 200
+QUEUE_SIZE = 10000
+# Caller-supplied ids end up in log records, response headers and file names
+_REQUEST_ID = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_configured_pid: Optional[int] = None
+_dropped_records = 0
+
+
+def new_request_id(request_id: Optional[str] = None) -> str:
+    """Set (or generate) the request id attached to every record on this context
+
+    A supplied id is only kept if it is 1-64 letters, digits or dashes.
+    """
+    if not request_id or not _REQUEST_ID.fullmatch(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+def _summarize(value: Any) -> Any:
+    """Keep records small: truncate long strings, summarize large containers"""
+    if isinstance(value, str) and len(value) > MAX_FIELD_CHARS:
+        return {"preview": value[:MAX_FIELD_CHARS], "chars": len(value)}
+    if isinstance(value, dict):
+        return {key: _summarize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and len(value) > 20:
+        return {"items": len(value)}
+    return value
+
+
+class _RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id (runs on the calling thread)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the background writer without formatting them here
+
+    The stock QueueHandler formats on the calling thread; deferring that (and
+    the size/summary work in `JsonLinesFormatter`) keeps request threads free.
+    A full queue drops the record instead of blocking the request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global _dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped_records += 1
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line, built on the background writer thread"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "event": getattr(record, "event", None),
+            "agent": getattr(record, "agent", None),
+            "message": record.getMessage()
+        }
+
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(_summarize(fields))
+        outputs = getattr(record, "outputs", None)
+        if outputs is not None:
+            entry["outputs_size"] = len(str(outputs))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if _dropped_records:
+            entry["dropped_records"] = _dropped_records
+
+        return json.dumps({k: v for k, v in entry.items() if v is not None}, default=str)
+
+
+def process_log_file(log_file: str, pid: Optional[int] = None) -> str:
+    """This process's own log file: `logs/agent_activity.log` -> `logs/agent_activity.<pid>.log`
+
+    Gunicorn workers each write (and rotate) their own file; a shared file
+    rotated independently by every worker loses records.
+    """
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.{pid or os.getpid()}{ext}"
+
+
+def _prune_old_logs(log_file: str):
+    """Delete log files of exited processes untouched for EDUBOT_LOG_RETENTION_DAYS"""
+    max_age = float(os.getenv("EDUBOT_LOG_RETENTION_DAYS", "7")) * 86400
+    root, ext = os.path.splitext(os.path.basename(log_file))
+    pattern = re.compile(re.escape(root) + r"\.(\d+)" + re.escape(ext) + r"(\.\d+)?")
+    directory = os.path.dirname(log_file) or "."
+    now = datetime.now().timestamp()
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if not match or int(match.group(1)) == os.getpid():
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) < max_age or _process_alive(int(match.group(1))):
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _configure(log_file: str) -> logging.Logger:
+    """Install the queue handler and background writer once per process
+
+    A forked child gets its own file and writer thread (threads don't survive fork).
+    """
+    global _listener, _queue_handler, _configured_pid
+    logger = logging.getLogger(LOGGER_NAME)
+
+    with _setup_lock:
+        if _listener is not None and _configured_pid == os.getpid():
+            return logger
+        if _queue_handler is not None:
+            logger.removeHandler(_queue_handler)
+
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        _prune_old_logs(log_file)
+        formatter = JsonLinesFormatter()
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            process_log_file(log_file),
+            maxBytes=int(os.getenv("EDUBOT_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("EDUBOT_LOG_BACKUPS", "5")),
+            encoding="utf-8"
+        )
+        handlers = [file_handler]
+        if os.getenv("EDUBOT_LOG_STDOUT", "1") != "0":
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        _queue_handler = _DeferredQueueHandler(log_queue)
+        _queue_handler.addFilter(_RequestContextFilter())
+
+        logger.setLevel(os.getenv("EDUBOT_LOG_LEVEL", "INFO").upper())
+        logger.addHandler(_queue_handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _configured_pid = os.getpid()
+        atexit.register(_listener.stop)
+
+    return logger
+
 
 class AgentLogger:
-    """Logging system for agent activities"""
-    
+    """Logging system for agent activities
+
+    Records are structured JSON lines written by a background thread to a
+    size-rotated file per process (`agent_activity.<pid>.log`). Configure with
+    EDUBOT_LOG_LEVEL, EDUBOT_LOG_MAX_BYTES, EDUBOT_LOG_BACKUPS,
+    EDUBOT_LOG_RETENTION_DAYS, EDUBOT_LOG_STDOUT and EDUBOT_LOG_SAMPLE_RATE
+    (fraction of high-volume metric events that are kept).
+    """
+
     def __init__(self, log_file="logs/agent_activity.log"):
         self.log_file = log_file
+        self.sample_rate = float(os.getenv("EDUBOT_LOG_SAMPLE_RATE", "1.0"))
         self._setup_logger()
-    
+
     def _setup_logger(self):
-        import os
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger("StudyPlannerAgent")
-    
+        self.logger = _configure(self.log_file)
+
+    def _log(self, level: int, event: str, agent: Optional[str], message: str,
+             fields: Optional[Dict[str, Any]] = None, **extra: Any):
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, message, extra={"event": event, "agent": agent, "fields": fields, **extra})
+
     def log_agent_start(self, agent_name: str, inputs: Dict[str, Any]):
         """Log when an agent starts processing"""
-        self.logger.info(f"[START] {agent_name} | Inputs: {json.dumps(inputs)}")
-    
+        # Shallow copy only; truncation happens on the writer thread
+        self._log(logging.INFO, "agent_start", agent_name, f"[START] {agent_name}", {"inputs": dict(inputs)})
+
     def log_agent_complete(self, agent_name: str, outputs: Dict[str, Any]):
         """Log when an agent completes"""
-        self.logger.info(f"[COMPLETE] {agent_name} | Outputs size: {len(str(outputs))}")
-    
+        self._log(logging.INFO, "agent_complete", agent_name, f"[COMPLETE] {agent_name}",
+                  {"outputs": dict(outputs)}, outputs=outputs)
+
     def log_error(self, agent_name: str, error: Exception):
         """Log errors"""
-        self.logger.error(f"[ERROR] {agent_name} | {str(error)}")
-    
-    def log_metric(self, metric_name: str, value: Any):
-        """Log performance metrics"""
-        self.logger.info(f"[METRIC] {metric_name}: {value}")
\ No newline at end of file
+        self._log(logging.ERROR, "agent_error", agent_name, f"[ERROR] {agent_name} | {str(error)}",
+                  {"error_type": type(error).__name__})
+
+    def log_metric(self, metric_name: str, value: Any, sample_rate: Optional[float] = None):
+        """Log performance metrics (sampled; see EDUBOT_LOG_SAMPLE_RATE)"""
+        rate = self.sample_rate if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+        self._log(logging.INFO, "metric", None, f"[METRIC] {metric_name}",
+                  {"metric": metric_name, "value": value, "sample_rate": rate})
@@ -0,0 +1,340 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans cache hits through full LLM round-trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Characters of prompt/response text
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+FLUSH_INTERVAL = 1.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: Any) -> "_Child":
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return _Child(self, tuple(str(v) for v in values))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = {json.dumps(list(key)): self._copy(value) for key, value in self._values.items()}
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": samples
+        }
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value
+
+
+class _Child:
+    """A metric bound to one set of label values"""
+
+    def __init__(self, metric: _Metric, key: Tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount: float = 1):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value: float):
+        self._metric._set(self._key, value)
+
+    def observe(self, value: float):
+        self._metric._observe(self._key, value)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+
+class Gauge(_Metric):
+    """Current value; summed across live worker processes when merged"""
+
+    type = "gauge"
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+    def dec(self, amount: float = 1):
+        self._inc((), -amount)
+
+    def set(self, value: float):
+        self._set((), value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _observe(self, key, value):
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        with _Child(self, ()).time():
+            yield
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+    @staticmethod
+    def _copy(value):
+        return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+
+
+class MetricsRegistry:
+    """In-process metrics, exported in Prometheus text format
+
+    With several gunicorn workers each process periodically writes a snapshot
+    to ``EDUBOT_METRICS_DIR``; `render()` merges every snapshot so any worker
+    can answer /metrics for the whole server. Counters and histograms are
+    summed across processes (including exited ones); gauges only count live
+    processes.
+    """
+
+    def __init__(self, metrics_dir: Optional[str] = None):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.metrics_dir = metrics_dir if metrics_dir is not None else os.getenv("EDUBOT_METRICS_DIR")
+        self._last_flush = 0.0
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def flush(self, force: bool = False):
+        """Write this process's snapshot for other workers (throttled)"""
+        if not self.metrics_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"pid": os.getpid(), "live": True, "metrics": self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def mark_process_dead(self, pid: int):
+        """Keep an exited worker's counters but drop its gauges"""
+        if not self.metrics_dir:
+            return
+        path = os.path.join(self.metrics_dir, f"metrics-{pid}.json")
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        data["live"] = False
+        for metric in data["metrics"].values():
+            if metric["type"] == "gauge":
+                metric["samples"] = {}
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        if not self.metrics_dir:
+            return [self.snapshot()]
+
+        self.flush(force=True)
+        snapshots = []
+        for filename in os.listdir(self.metrics_dir):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.metrics_dir, filename), 'r') as f:
+                    snapshots.append(json.load(f)["metrics"])
+            except (OSError, ValueError, KeyError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """All metrics, merged across processes, in Prometheus text format"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for snapshot in self._collect():
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, {**metric, "samples": {}})
+                for key, value in metric["samples"].items():
+                    if metric["type"] == "histogram":
+                        current = target["samples"].get(key)
+                        if current is None:
+                            target["samples"][key] = {"buckets": list(value["buckets"]),
+                                                      "sum": value["sum"], "count": value["count"]}
+                        else:
+                            current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                            current["sum"] += value["sum"]
+                            current["count"] += value["count"]
+                    else:
+                        target["samples"][key] = target["samples"].get(key, 0) + value
+
+        lines = []
+        for name in sorted(merged):
+            metric = merged[name]
+            labelnames = metric["labelnames"]
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key in sorted(metric["samples"]):
+                values = json.loads(key)
+                sample = metric["samples"][key]
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(sample)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"], sample["buckets"]):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {sample['count']}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(sample['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, values)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Web
+HTTP_REQUESTS = registry.counter(
+    "edubot_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_LATENCY = registry.histogram(
+    "edubot_http_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "edubot_http_requests_in_flight", "Requests currently being handled", ("route",))
+GENERATIONS_IN_FLIGHT = registry.gauge(
+    "edubot_generations_in_flight", "Plan generations currently holding a generation slot")
+GENERATIONS_REJECTED = registry.counter(
+    "edubot_generations_rejected_total", "Generations rejected because all slots were busy")
+GENERATIONS_QUEUED = registry.gauge(
+    "edubot_generations_queued", "Generations waiting for a slot")
+ADMISSION_REJECTED = registry.counter(
+    "edubot_admission_rejected_total", "Generations refused by admission control by reason", ("reason",))
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "edubot_admission_queue_wait_seconds", "Time generations spent queued for a slot")
+
+# LLM
+LLM_LATENCY = registry.histogram(
+    "edubot_llm_request_duration_seconds", "Gemini call latency by agent", ("agent",))
+LLM_PROMPT_SIZE = registry.histogram(
+    "edubot_llm_prompt_chars", "Prompt size in characters by agent", ("agent",), SIZE_BUCKETS)
+LLM_RESPONSE_SIZE = registry.histogram(
+    "edubot_llm_response_chars", "Response size in characters by agent", ("agent",), SIZE_BUCKETS)
+LLM_TOKENS = registry.counter(
+    "edubot_llm_tokens_total", "Tokens by agent and kind (prompt/response)", ("agent", "kind"))
+LLM_COST = registry.counter(
+    "edubot_llm_cost_usd_total", "Estimated Gemini spend in USD by agent", ("agent",))
+BUDGET_REJECTED = registry.counter(
+    "edubot_budget_rejected_total", "Generations rejected because the user's token budget was used up")
+
+# Storage
+SESSION_STORE_LATENCY = registry.histogram(
+    "edubot_session_store_duration_seconds", "Session store latency by operation", ("operation",))
+RESOURCE_STORE = registry.counter(
+    "edubot_resource_store_total", "Per-topic resource lookups by result (hit/miss/stale/joined)", ("result",))
+TOPIC_NOTES = registry.counter(
+    "edubot_topic_notes_total", "Topic deep-dive notes by outcome (hit/miss/joined/prefetch)", ("result",))
+GENERATION_CACHE = registry.counter(
+    "edubot_generation_cache_total", "Catalog cache lookups by result (hit/miss)", ("result",))
+
+# Errors
+ERRORS = registry.counter(
+    "edubot_errors_total", "Errors by component", ("component",))
@@ -0,0 +1,141 @@
+"""On-demand cProfile capture for single requests
+
+A request is profiled when either:
+
+* it carries ``X-Profile: <token>`` matching ``EDUBOT_PROFILE_TOKEN`` (the header
+  is ignored while no token is configured), or
+* it is picked by ``EDUBOT_PROFILE_SAMPLE_RATE`` (fraction of requests, default 0).
+
+The CLI profiles its generation step when ``EDUBOT_PROFILE=1``. Profiles are
+written to ``EDUBOT_PROFILE_DIR`` (default: profiles/) as
+``<timestamp>_<request id>_<name>.prof``. Only one profile runs per process at a
+time; a request that would start a second one simply runs unprofiled.
+
+cProfile follows the thread that started it, so for /generate the profile shows
+the request thread (parsing, rendering, storage, waiting on agents); the agent
+threads themselves are covered by the tracer and LLM metrics.
+
+Summarize a capture with::
+
+    python -m observability.profiler                # list captured profiles
+    python -m observability.profiler latest         # top functions of the newest
+    python -m observability.profiler <file> --sort tottime --limit 40
+"""
+import argparse
+import cProfile
+import glob
+import os
+import pstats
+import random
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+PROFILE_HEADER = "X-Profile"
+
+_active = threading.Lock()
+
+
+def profile_dir() -> str:
+    return os.getenv("EDUBOT_PROFILE_DIR", "profiles")
+
+
+def should_profile(header_value: Optional[str] = None) -> bool:
+    """Decide whether the current request should be profiled"""
+    token = os.getenv("EDUBOT_PROFILE_TOKEN")
+    if token and header_value == token:
+        return True
+    rate = float(os.getenv("EDUBOT_PROFILE_SAMPLE_RATE", "0"))
+    return rate > 0 and random.random() < rate
+
+
+def _safe_part(value: Optional[str], default: str) -> str:
+    """A file-name fragment with nothing but letters, digits and dashes"""
+    return re.sub(r"[^A-Za-z0-9]+", "-", value or "").strip("-")[:64] or default
+
+
+def _profile_path(name: str, request_id: Optional[str]) -> str:
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    # The request id may come from a client header, so it is cleaned like the name
+    return os.path.join(profile_dir(),
+                        f"{stamp}_{_safe_part(request_id, 'none')}_{_safe_part(name, 'request')}.prof")
+
+
+class RequestProfile:
+    """A running cProfile capture that is written to disk when stopped"""
+
+    def __init__(self, name: str, request_id: Optional[str] = None):
+        self.path = _profile_path(name, request_id)
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop(self) -> str:
+        try:
+            self._profiler.disable()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._profiler.dump_stats(self.path)
+        finally:
+            _active.release()
+        return self.path
+
+
+def start_profile(name: str, request_id: Optional[str] = None) -> Optional[RequestProfile]:
+    """Start profiling, or return None if another profile is already running"""
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        return RequestProfile(name, request_id)
+    except Exception:
+        _active.release()
+        raise
+
+
+@contextmanager
+def profiled(name: str, request_id: Optional[str] = None, enabled: bool = True) -> Iterator[Optional[RequestProfile]]:
+    """Profile a block when enabled; yields the profile (or None)"""
+    profile = start_profile(name, request_id) if enabled else None
+    try:
+        yield profile
+    finally:
+        if profile is not None:
+            path = profile.stop()
+            print(f"Profile written to {path}")
+
+
+def summarize(path: str, sort: str = "cumulative", limit: int = 30):
+    """Print the top functions of a saved profile"""
+    stats = pstats.Stats(path)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or summarize captured request profiles")
+    parser.add_argument("profile", nargs="?", help="profile file, or 'latest'")
+    parser.add_argument("--dir", default=profile_dir(), help="profile directory")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls, ...)")
+    parser.add_argument("--limit", type=int, default=30, help="number of functions to show")
+    args = parser.parse_args()
+
+    profiles = sorted(glob.glob(os.path.join(args.dir, "*.prof")))
+    if not args.profile:
+        if not profiles:
+            print(f"No profiles in {args.dir}")
+        for path in profiles:
+            print(f"{os.path.getsize(path):>10}  {os.path.basename(path)}")
+        return
+
+    if args.profile == "latest":
+        if not profiles:
+            parser.error(f"no profiles in {args.dir}")
+        path = profiles[-1]
+    else:
+        path = args.profile if os.path.exists(args.profile) else os.path.join(args.dir, args.profile)
+
+    print(f"Profile: {path}")
+    summarize(path, args.sort, args.limit)
+
+
+if __name__ == "__main__":
+    main()
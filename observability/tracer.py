@@ -1,50 +1,138 @@
+import os
+import random
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 class AgentTracer:
-    """Trace agent execution times and flow"""
-    
-    def __init__(self):
-        self.traces = []
-    
+    """Trace agent execution times and flow
+
+    Memory stays flat regardless of uptime: finished traces go into a fixed-size
+    ring buffer, normal traces are sampled, and slow or failed traces are always
+    kept in a separate outlier buffer so they are never crowded out. Per-agent
+    aggregates are updated incrementally as traces finish.
+    """
+
+    def __init__(self, capacity: int = 500, sample_rate: float = 1.0,
+                 slow_threshold: float = 10.0, outlier_capacity: int = 100):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.traces = deque(maxlen=capacity)
+        self.outliers = deque(maxlen=outlier_capacity)
+        self.aggregates: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
     def trace_agent(self, agent_name: str):
         """Decorator to trace agent execution"""
         def decorator(func: Callable):
             @wraps(func)
             def wrapper(*args, **kwargs):
-                start_time = time.time()
-                
-                trace_data = {
-                    "agent": agent_name,
-                    "function": func.__name__,
-                    "start_time": start_time,
-                    "status": "running"
-                }
-                
-                try:
-                    result = func(*args, **kwargs)
-                    trace_data["status"] = "success"
-                    trace_data["end_time"] = time.time()
-                    trace_data["duration"] = trace_data["end_time"] - start_time
-                    return result
-                except Exception as e:
-                    trace_data["status"] = "failed"
-                    trace_data["error"] = str(e)
-                    trace_data["end_time"] = time.time()
-                    trace_data["duration"] = trace_data["end_time"] - start_time
-                    raise
-                finally:
-                    self.traces.append(trace_data)
-            
+                with self.span(agent_name, func.__name__):
+                    return func(*args, **kwargs)
+
             return wrapper
         return decorator
-    
+
+    @contextmanager
+    def span(self, agent_name: str, function: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Trace a block; yields the trace dict, which holds the duration on exit"""
+        start_time = time.time()
+        trace_data = {
+            "agent": agent_name,
+            "function": function,
+            "start_time": start_time,
+            "status": "running",
+            **attributes
+        }
+
+        try:
+            yield trace_data
+            trace_data["status"] = "success"
+        except Exception as e:
+            trace_data["status"] = "failed"
+            trace_data["error"] = str(e)
+            raise
+        finally:
+            trace_data["end_time"] = time.time()
+            trace_data["duration"] = trace_data["end_time"] - start_time
+            self.record(trace_data)
+
+    def record(self, trace_data: Dict[str, Any]):
+        """Add a finished trace: update aggregates, then keep it if sampled"""
+        duration = trace_data.get("duration", 0.0)
+        failed = trace_data.get("status") == "failed"
+        is_outlier = failed or duration >= self.slow_threshold
+
+        with self._lock:
+            self._update_aggregate(trace_data.get("agent", "unknown"), duration, failed)
+            # Tail sampling: the keep/drop decision is made once the outcome is known
+            if is_outlier:
+                self.outliers.append(trace_data)
+            elif self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+                self.traces.append(trace_data)
+
+    def _update_aggregate(self, agent: str, duration: float, failed: bool):
+        stats = self.aggregates.get(agent)
+        if stats is None:
+            stats = self.aggregates[agent] = {
+                "count": 0, "errors": 0, "total_duration": 0.0,
+                "min_duration": duration, "max_duration": duration, "ewma_duration": duration
+            }
+        stats["count"] += 1
+        stats["errors"] += int(failed)
+        stats["total_duration"] += duration
+        stats["min_duration"] = min(stats["min_duration"], duration)
+        stats["max_duration"] = max(stats["max_duration"], duration)
+        # Recent-weighted average; reacts to regressions without storing history
+        stats["ewma_duration"] += 0.1 * (duration - stats["ewma_duration"])
+
+    def get_aggregates(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                agent: {**stats, "mean_duration": stats["total_duration"] / stats["count"]}
+                for agent, stats in self.aggregates.items()
+            }
+
+    def get_slowest(self, limit: int = 20, agent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Slowest retained traces, outliers included"""
+        with self._lock:
+            candidates = list(self.outliers) + list(self.traces)
+        if agent:
+            candidates = [t for t in candidates if t.get("agent") == agent]
+        return sorted(candidates, key=lambda t: t.get("duration", 0.0), reverse=True)[:limit]
+
     def get_trace_summary(self):
         """Get summary of all traces"""
-        total_duration = sum(t.get("duration", 0) for t in self.traces)
+        aggregates = self.get_aggregates()
+        with self._lock:
+            traces = list(self.traces)
+            outliers = list(self.outliers)
         return {
-            "total_traces": len(self.traces),
-            "total_duration": total_duration,
-            "traces": self.traces
-        }
\ No newline at end of file
+            "total_traces": sum(stats["count"] for stats in aggregates.values()),
+            "total_duration": sum(stats["total_duration"] for stats in aggregates.values()),
+            "aggregates": aggregates,
+            "traces": traces,
+            "outliers": outliers
+        }
+
+
+# Process-wide tracer shared by every Orchestrator and request
+_tracer: Optional[AgentTracer] = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> AgentTracer:
+    """Shared tracer, configured from EDUBOT_TRACE_* environment variables"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = AgentTracer(
+                capacity=int(os.getenv("EDUBOT_TRACE_CAPACITY", "500")),
+                sample_rate=float(os.getenv("EDUBOT_TRACE_SAMPLE_RATE", "0.1")),
+                slow_threshold=float(os.getenv("EDUBOT_TRACE_SLOW_SECONDS", "10")),
+                outlier_capacity=int(os.getenv("EDUBOT_TRACE_OUTLIER_CAPACITY", "100"))
+            )
+        return _tracer
@@ -1,37 +1,72 @@
 from study_plan_agent import StudyPlanAgent
 from notes_agent import NotesAgent
 from resource_agent import ResourceAgent
+from resource_store import ResourceStore
 from session_manager import SessionManager
 from memory import MemoryBank
+from blob_store import BlobStore
+from generation_cache import GenerationCache, content_key, normalize_syllabus
+from topic_notes import TopicNotesCache, upcoming_topics
+from plan_model import StudyPlan
+from plan_parser import StreamingPlanParser
 from tools.search_tool import SearchTool
 from tools.notes_tool import NotesTool
-from observability.logger import AgentLogger
-from observability.tracer import AgentTracer
+from observability.logger import AgentLogger, request_id_var
+from usage import usage_scope, usage_tracker
+from admission import AdmissionRejected
+from observability.tracer import get_tracer
 import concurrent.futures
+import contextvars
+import json
+import os
 from datetime import datetime
 
+def _completed(result):
+    """A finished future holding a catalog result, shaped like a `_traced` one"""
+    future = concurrent.futures.Future()
+    future.set_result((result, {"status": "cached", "duration": 0.0}))
+    return future
+
 class Orchestrator:
     def __init__(self, api_key, user_id="default_user"):
+        # Session & Memory (sessions, saved notes and caches share one content store)
+        self.blob_store = BlobStore()
+        self.session_manager = SessionManager(blob_store=self.blob_store)
+        self.memory_bank = MemoryBank()
+        self.generation_cache = GenerationCache(blob_store=self.blob_store)
+        self.topic_notes = TopicNotesCache(blob_store=self.blob_store)
+        self.user_id = user_id
+        
         # Agents
         self.plan_agent = StudyPlanAgent(api_key)
         self.notes_agent = NotesAgent(api_key)
-        self.resource_agent = ResourceAgent(api_key)
-        
-        # Session & Memory
-        self.session_manager = SessionManager()
-        self.memory_bank = MemoryBank()
-        self.user_id = user_id
+        self.resource_agent = ResourceAgent(api_key, store=ResourceStore(blob_store=self.blob_store))
         
         # Tools
         self.search_tool = SearchTool()
-        self.notes_tool = NotesTool()
+        self.notes_tool = NotesTool(blob_store=self.blob_store)
         
         # Observability
         self.logger = AgentLogger()
-        self.tracer = AgentTracer()
+        self.tracer = get_tracer()
+    
+    def personalize(self, days=None, difficulty=None):
+        """Fill in days/difficulty the user left out from their learning profile"""
+        if days and difficulty:
+            return days, difficulty
+        profile = self.memory_bank.get_user_profile(self.user_id)
+        return days or profile.typical_days(), difficulty or profile.preferred_difficulty()
     
-    def process(self, syllabus, days, difficulty, session_id=None):
-        """Enhanced processing with PARALLEL agent execution"""
+    def process(self, syllabus, days, difficulty, session_id=None, on_plan_session=None):
+        """Enhanced processing with PARALLEL agent execution
+        
+        `on_plan_session`, if given, is called with each plan session as soon as
+        it has been streamed and parsed (from a worker thread). Missing days or
+        difficulty default to what the user usually picks.
+        """
+        days, difficulty = self.personalize(days, difficulty)
+        if not days or not difficulty:
+            raise ValueError("days and difficulty are required for a user without history")
         
         if session_id is None:
             session_id = self.session_manager.create_session(self.user_id)
@@ -42,57 +77,45 @@ class Orchestrator:
                 "mode": "parallel"
             })
         
+        # Popular syllabi are precomputed off-peak (generation_cache.py)
+        cached = self.generation_cache.get(syllabus, days, difficulty)
+        if cached is not None:
+            return self._serve_cached(session_id, syllabus, days, difficulty, cached, on_plan_session)
+        
         print(f"Starting parallel execution for: {syllabus[:50]}...")
         start_time = datetime.now()
         
         try:
-            # Execute all 3 agents in parallel
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                # Submit all tasks at once
-                future_plan = executor.submit(self._generate_plan, syllabus, days, difficulty)
-                future_notes = executor.submit(self._generate_notes, syllabus)
-                future_resources = executor.submit(self._generate_resources, syllabus)
+            # Token usage of every agent call is attributed to this user and session
+            with usage_scope(self.user_id, session_id) as usage, \
+                    concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+                # Worker threads don't inherit context variables (request id, usage
+                # scope), so each task runs in its own copy of the caller's context
+                future_plan = executor.submit(contextvars.copy_context().run, self._traced,
+                                              "StudyPlanAgent", self._generate_plan, syllabus, days, difficulty,
+                                              on_plan_session)
+                future_notes = executor.submit(contextvars.copy_context().run, self._traced,
+                                               "NotesAgent", self._generate_notes, syllabus)
+                future_resources = executor.submit(contextvars.copy_context().run, self._traced,
+                                                   "ResourceAgent", self._generate_resources, syllabus)
                 
                 # Wait for all to complete
-                plan = future_plan.result()
-                notes = future_notes.result()
-                resources = future_resources.result()
+                (plan, study_plan), plan_trace = future_plan.result()
+                notes, notes_trace = future_notes.result()
+                resources, resources_trace = future_resources.result()
         except Exception as e:
             print(f"Error in parallel execution: {e}")
+            self.logger.log_error("Orchestrator", e)
             raise
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         print(f"✓ Parallel execution completed in {duration:.2f}s")
         
-        # Parse study plan to store as structured data
-        from ui.formatters import StudyPlanFormatter
-        formatter = StudyPlanFormatter()
-        parsed_plan = formatter.parse_study_plan(plan)
-        
-        # Save to session
-        self.session_manager.update_session(session_id, {
-            "study_plan": parsed_plan,
-            "study_plan_raw": plan,
-            "notes": notes,
-            "resources": resources,
-            "syllabus": syllabus,
-            "days": days,
-            "difficulty": difficulty
-        })
-        
-        # Save notes to file
-        notes_file = self.notes_tool.save_notes(
-            topic=syllabus,
-            content=notes,
-            user_id=self.user_id
-        )
+        notes_file = self._save_result(session_id, self.user_id, syllabus, days, difficulty,
+                                       plan, study_plan, notes, resources, usage.snapshot())
         
-        # Update memory bank
-        self.memory_bank.add_learning_preference(self.user_id, {
-            "difficulty": difficulty,
-            "topic": syllabus
-        })
+        self._remember(session_id, syllabus, days, difficulty)
         
         # Log completion
         self.logger.log_agent_complete("Orchestrator", {
@@ -104,27 +127,242 @@ class Orchestrator:
         return {
             "session_id": session_id,
             "study_plan": plan,
+            "plan": study_plan,
             "notes": notes,
             "resources": resources,
             "notes_file": notes_file,
+            "usage": usage.snapshot(),
             "trace_summary": {
                 "total_duration": duration,
                 "execution_mode": "parallel",
                 "traces": [
-                    {"agent": "StudyPlanAgent", "status": "success", "duration": duration/3},
-                    {"agent": "NotesAgent", "status": "success", "duration": duration/3},
-                    {"agent": "ResourceAgent", "status": "success", "duration": duration/3}
+                    {"agent": trace["agent"], "status": trace["status"], "duration": trace["duration"]}
+                    for trace in (plan_trace, notes_trace, resources_trace)
                 ]
             }
         }
     
-    def _generate_plan(self, syllabus, days, difficulty):
-        """Generate study plan with tracing"""
+    def _serve_cached(self, session_id, syllabus, days, difficulty, cached, on_plan_session=None):
+        """Complete a request from a catalog entry without calling any agent"""
+        start_time = datetime.now()
+        study_plan = cached["plan"]
+        if on_plan_session:
+            for plan_session in study_plan:
+                on_plan_session(plan_session.to_dict())
+        
+        notes_file = self._save_result(session_id, self.user_id, syllabus, days, difficulty,
+                                       cached["study_plan_raw"], study_plan, cached["notes"],
+                                       cached["resources"], {})
+        self._remember(session_id, syllabus, days, difficulty)
+        
+        duration = (datetime.now() - start_time).total_seconds()
+        self.logger.log_agent_complete("Orchestrator", {
+            "session_id": session_id,
+            "notes_saved": notes_file,
+            "duration": duration,
+            "mode": "catalog"
+        })
+        
+        return {
+            "session_id": session_id,
+            "study_plan": cached["study_plan_raw"],
+            "plan": study_plan,
+            "notes": cached["notes"],
+            "resources": cached["resources"],
+            "notes_file": notes_file,
+            "usage": {},
+            "trace_summary": {
+                "total_duration": duration,
+                "execution_mode": "catalog",
+                "traces": [
+                    {"agent": agent, "status": "cached", "duration": 0.0}
+                    for agent in ("StudyPlanAgent", "NotesAgent", "ResourceAgent")
+                ]
+            }
+        }
+    
+    def process_batch(self, items, max_workers=None, include_content=False):
+        """Generate plans for many students or courses, yielding each item's result as it completes
+        
+        `items` are dicts with syllabus, days, difficulty and optionally user_id
+        (default: this orchestrator's user) and id (echoed back). Items asking
+        for the same content share one generation: a plan per distinct
+        (syllabus, days, difficulty) and notes/resources per distinct syllabus.
+        `max_workers` (EDUBOT_BATCH_CONCURRENCY) is how many of the batch's
+        agent calls are started at once; the Gemini calls themselves share the
+        process-wide EDUBOT_LLM_CONCURRENCY limit with every other request.
+        The owner's daily budget is checked before every generation; once it
+        is used up the remaining items fail and the summary has "stopped".
+        Every item still gets its own session under its own user.
+        """
+        max_workers = max_workers or int(os.getenv("EDUBOT_BATCH_CONCURRENCY", "8"))
+        start_time = datetime.now()
+        self.logger.log_agent_start("Orchestrator", {"mode": "batch", "items": len(items)})
+        
+        tasks = {}
+        pending = []
+        preferences = []
+        stats = {"items": len(items), "succeeded": 0, "failed": 0, "distinct_plans": 0, "distinct_syllabi": 0,
+                 "cached": 0}
+        
+        # Token usage of shared generations is attributed to the batch owner
+        with usage_scope(self.user_id), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def submit(key, agent_name, func, *args):
+                if key not in tasks:
+                    tasks[key] = executor.submit(contextvars.copy_context().run, self._budgeted, agent_name, func, *args)
+                return tasks[key]
+            
+            for index, item in enumerate(items):
+                try:
+                    syllabus, days, difficulty = item["syllabus"], int(item["days"]), item["difficulty"]
+                    if not syllabus or not difficulty or days < 1:
+                        raise ValueError("syllabus, days and difficulty are required")
+                except (KeyError, TypeError, ValueError) as e:
+                    stats["failed"] += 1
+                    yield {"index": index, "id": item.get("id") if isinstance(item, dict) else None,
+                           "status": "error", "error": f"Invalid item: {e}"}
+                    continue
+                
+                syllabus_key = normalize_syllabus(syllabus)
+                plan_key = ("plan",) + content_key(syllabus, days, difficulty)
+                deduplicated = plan_key in tasks
+                if not deduplicated:
+                    cached = self.generation_cache.get(syllabus, days, difficulty)
+                    if cached is not None:
+                        stats["cached"] += 1
+                        tasks[plan_key] = _completed((cached["study_plan_raw"], cached["plan"]))
+                        tasks.setdefault(("notes", syllabus_key), _completed(cached["notes"]))
+                        tasks.setdefault(("resources", syllabus_key), _completed(cached["resources"]))
+                futures = (
+                    submit(plan_key, "StudyPlanAgent", self._generate_plan, syllabus, days, difficulty),
+                    submit(("notes", syllabus_key), "NotesAgent", self._generate_notes, syllabus),
+                    submit(("resources", syllabus_key), "ResourceAgent", self._generate_resources, syllabus)
+                )
+                pending.append((index, item, syllabus, days, difficulty, deduplicated, futures))
+            
+            stats["distinct_plans"] = sum(1 for key in tasks if key[0] == "plan")
+            stats["distinct_syllabi"] = sum(1 for key in tasks if key[0] == "notes")
+            
+            # Finish items in the order their content becomes ready
+            for finished in concurrent.futures.as_completed(list(tasks.values())):
+                ready = [entry for entry in pending if all(f.done() for f in entry[6])]
+                pending = [entry for entry in pending if not all(f.done() for f in entry[6])]
+                for index, item, syllabus, days, difficulty, deduplicated, futures in ready:
+                    user_id = item.get("user_id") or self.user_id
+                    result = {"index": index, "id": item.get("id"), "user_id": user_id, "deduplicated": deduplicated}
+                    try:
+                        (plan, study_plan), _ = futures[0].result()
+                        notes, _ = futures[1].result()
+                        resources, _ = futures[2].result()
+                        session_id = self.session_manager.create_session(user_id)
+                        result["notes_file"] = self._save_result(session_id, user_id, syllabus, days, difficulty,
+                                                                 plan, study_plan, notes, resources)
+                        result.update({"status": "ok", "session_id": session_id, "total_topics": len(study_plan)})
+                        if include_content:
+                            result.update({"study_plan": study_plan.to_dicts(), "notes": notes, "resources": resources})
+                        preferences.append((user_id, {"difficulty": difficulty, "topic": syllabus, "days": days}))
+                        stats["succeeded"] += 1
+                    except Exception as e:
+                        self.logger.log_error("Orchestrator", e)
+                        result.update({"status": "error", "error": str(e)})
+                        stats["failed"] += 1
+                    yield result
+        
+        if any(isinstance(future.exception(), AdmissionRejected) for future in tasks.values()):
+            stats["stopped"] = "budget"
+        
+        # One memory bank write for the whole batch
+        if preferences:
+            self.memory_bank.add_learning_preferences(preferences)
+        
+        stats["duration"] = (datetime.now() - start_time).total_seconds()
+        self.logger.log_agent_complete("Orchestrator", {"mode": "batch", **stats})
+        yield {"summary": stats}
+    
+    def _budgeted(self, agent_name, func, *args):
+        """Run a batch generation unless the owner's daily budget ran out meanwhile"""
+        retry_after = usage_tracker.check_budget(self.user_id)
+        if retry_after is not None:
+            raise AdmissionRejected("budget", retry_after, "Daily token budget used up, please try again tomorrow")
+        return self._traced(agent_name, func, *args)
+    
+    def _remember(self, session_id, syllabus, days, difficulty):
+        """Update the user's memory and warm what they'll likely open next"""
+        self.memory_bank.add_learning_preference(self.user_id, {
+            "difficulty": difficulty,
+            "topic": syllabus,
+            "days": days
+        })
+        # Users who work through their topics get the first day's deep-dives ready
+        if self.memory_bank.get_user_profile(self.user_id).completions:
+            self.prefetch_topic_notes(session_id)
+    
+    def _save_result(self, session_id, user_id, syllabus, days, difficulty,
+                     plan, study_plan, notes, resources, usage=None):
+        """Store a generation in the session and the user's saved notes; returns the notes file"""
+        updates = {
+            "study_plan": study_plan,
+            "study_plan_raw": plan,
+            "notes": notes,
+            "resources": resources,
+            "syllabus": syllabus,
+            "days": days,
+            "difficulty": difficulty
+        }
+        if usage is not None:
+            updates["usage"] = usage
+        # The parsed plan is stored once, in compact form; identical content
+        # across sessions is shared by the blob store
+        self.session_manager.update_session(session_id, updates)
+        
+        return self.notes_tool.save_notes(
+            topic=syllabus,
+            content=notes,
+            user_id=user_id
+        )
+    
+    def _traced(self, agent_name, func, *args):
+        """Run one agent step under the shared tracer; returns (result, trace)"""
+        with self.tracer.span(agent_name, func.__name__, request_id=request_id_var.get()) as trace:
+            result = func(*args)
+        return result, trace
+    
+    def _generate_plan(self, syllabus, days, difficulty, on_plan_session=None):
+        """Generate study plan with tracing; returns (raw text, StudyPlan)
+        
+        The response is streamed and parsed as it arrives, so sessions are
+        available early and a truncated response still keeps every complete one.
+        """
         try:
             print(f"  [StudyPlanAgent] Starting...")
-            result = self.plan_agent.create_plan(syllabus, days, difficulty)
+            chunks = []
+            parser = StreamingPlanParser()
+            for chunk in self.plan_agent.create_plan_stream(syllabus, days, difficulty):
+                chunks.append(chunk)
+                for plan_session in parser.feed(chunk):
+                    if on_plan_session is not None:
+                        on_plan_session(plan_session)
+            parser.close()
+            plan_text, sessions = "".join(chunks), parser.sessions
+            if parser.truncated:
+                print(f"  [StudyPlanAgent] Response truncated, kept {len(sessions)} complete sessions")
+                # The last day may have lost sessions after the cut; regenerate it too
+                last_day = max((s.get("day") for s in sessions if isinstance(s.get("day"), int)), default=None)
+                sessions = [s for s in sessions if s.get("day") != last_day]
+            
+            # Re-request only the days that are missing or fail the schema
+            repaired, missing = self.plan_agent.complete_plan(syllabus, days, difficulty, sessions)
+            if repaired != sessions:
+                for plan_session in repaired:
+                    if on_plan_session is not None and plan_session not in sessions:
+                        on_plan_session(plan_session)
+                sessions = repaired
+                plan_text = json.dumps(sessions, indent=2)
+            if missing:
+                print(f"  [StudyPlanAgent] Days still missing: {', '.join(f'{a}-{b}' for a, b in missing)}")
             print(f"  [StudyPlanAgent] ✓ Complete")
-            return result
+            return plan_text, StudyPlan.from_dicts(sessions)
         except Exception as e:
             print(f"  [StudyPlanAgent] ✗ Error: {e}")
             raise
@@ -146,6 +384,8 @@ class Orchestrator:
             print(f"  [ResourceAgent] Starting...")
             result = self.resource_agent.fetch_resources(syllabus)
             print(f"  [ResourceAgent] ✓ Complete")
+            # Links are checked off the request path; results are served from cache
+            self.search_tool.verify_resources_in_background(result)
             return result
         except Exception as e:
             print(f"  [ResourceAgent] ✗ Error: {e}")
@@ -155,4 +395,49 @@ class Orchestrator:
         """Mark a topic as complete"""
         self.session_manager.mark_topic_complete(session_id, topic)
         self.memory_bank.add_completed_topic(self.user_id, topic, "completed")
-        self.logger.log_metric("topic_completed", topic)
\ No newline at end of file
+        self.logger.log_metric("topic_completed", topic)
+        # What the student studies next is now known; warm its notes
+        self.prefetch_topic_notes(session_id)
+    
+    def get_topic_notes(self, session_id: str, topic: str, guard=None):
+        """Deep-dive notes for one plan topic: (notes, served_from_cache)
+        
+        Generated on first request and cached per course topic. Returns None
+        if the topic is not part of the session's plan. `guard`, if given, is a
+        context manager factory entered only around an actual generation (e.g.
+        budget and admission checks), so cache hits never pay for it.
+        """
+        record = self.session_manager.load_session(session_id)
+        plan_session = record.plan.find_topic(topic)
+        if plan_session is None:
+            return None
+        syllabus = record.get("syllabus", "")
+        
+        def generate():
+            if guard is None:
+                return self.notes_agent.generate_topic_notes(topic, syllabus, plan_session)
+            with guard():
+                return self.notes_agent.generate_topic_notes(topic, syllabus, plan_session)
+        
+        with usage_scope(self.user_id, session_id):
+            return self.topic_notes.get_or_generate(syllabus, topic, generate)
+    
+    def prefetch_topic_notes(self, session_id: str) -> int:
+        """Queue background generation of the next study day's topic notes"""
+        # Prefetching is a nicety; it never spends tokens of a user over budget
+        if usage_tracker.check_budget(self.user_id) is not None:
+            return 0
+        try:
+            record = self.session_manager.load_session(session_id)
+            plan = record.plan
+            syllabus = record.get("syllabus", "")
+            topics = upcoming_topics(plan, record.get("progress") or {})
+        except (OSError, ValueError) as e:
+            print(f"Error reading session {session_id} for prefetch: {e}")
+            return 0
+        
+        with usage_scope(self.user_id, session_id):
+            return self.topic_notes.prefetch(
+                syllabus, topics,
+                lambda topic: self.notes_agent.generate_topic_notes(topic, syllabus, plan.find_topic(topic))
+            )
\ No newline at end of file
@@ -0,0 +1,146 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from plan_parser import parse_plan
+
+# Column order of the compact stored form (extra keys, if any, follow as a dict)
+COMPACT_FIELDS = ("day", "time_slot", "topic", "description", "activities", "expected_outcome")
+COMPACT_VERSION = 1
+
+
+def _day_order(day: Any) -> Tuple[int, Any]:
+    # Integer days first, numerically; anything odd the model produced after them
+    return (0, day) if isinstance(day, int) else (1, str(day))
+
+
+class PlanSession:
+    """One study session of a plan"""
+
+    __slots__ = COMPACT_FIELDS + ("extra",)
+
+    def __init__(self, day: int = 1, time_slot: str = "N/A", topic: str = "Untitled Topic",
+                 description: str = "", activities: Optional[List[str]] = None,
+                 expected_outcome: str = "", extra: Optional[Dict[str, Any]] = None):
+        self.day = day
+        self.time_slot = time_slot
+        self.topic = topic
+        self.description = description
+        self.activities = activities or []
+        self.expected_outcome = expected_outcome
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PlanSession":
+        extra = {key: value for key, value in data.items() if key not in COMPACT_FIELDS}
+        return cls(
+            day=data.get("day", 1),
+            time_slot=data.get("time_slot", "N/A"),
+            topic=data.get("topic", "Untitled Topic"),
+            description=data.get("description", ""),
+            activities=data.get("activities") or [],
+            expected_outcome=data.get("expected_outcome", ""),
+            extra=extra or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in COMPACT_FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access for code written against the plain-dict plan"""
+        if key in COMPACT_FIELDS:
+            return getattr(self, key)
+        return (self.extra or {}).get(key, default)
+
+
+class StudyPlan:
+    """A parsed study plan with a day index and topic lookup built once
+
+    Stored in sessions in a compact row form (`to_compact`) instead of a list
+    of dicts that repeats every key for every session.
+    """
+
+    __slots__ = ("sessions", "_day_index", "_topic_index")
+
+    def __init__(self, sessions: List[PlanSession]):
+        self.sessions = sessions
+        self._day_index: Dict[Any, List[int]] = {}
+        self._topic_index: Dict[str, int] = {}
+        for index, session in enumerate(sessions):
+            day = session.day if isinstance(session.day, (int, str)) else str(session.day)
+            self._day_index.setdefault(day, []).append(index)
+            if isinstance(session.topic, str):
+                self._topic_index.setdefault(session.topic, index)
+
+    @classmethod
+    def from_dicts(cls, sessions: List[Dict[str, Any]]) -> "StudyPlan":
+        return cls([PlanSession.from_dict(session) for session in sessions if isinstance(session, dict)])
+
+    @classmethod
+    def from_text(cls, plan_text: str) -> "StudyPlan":
+        return cls.from_dicts(parse_plan(plan_text))
+
+    @classmethod
+    def from_compact(cls, data: Dict[str, Any]) -> "StudyPlan":
+        sessions = []
+        width = len(COMPACT_FIELDS)
+        for row in data.get("rows", []):
+            extra = row[width] if len(row) > width else None
+            sessions.append(PlanSession(*row[:width], extra=extra))
+        return cls(sessions)
+
+    @classmethod
+    def coerce(cls, value: Union["StudyPlan", List[Dict[str, Any]], Dict[str, Any], str, None]) -> "StudyPlan":
+        """Build a plan from any stored or in-memory form (compact, dicts or raw text)"""
+        if isinstance(value, StudyPlan):
+            return value
+        if isinstance(value, dict) and "rows" in value:
+            return cls.from_compact(value)
+        if isinstance(value, list):
+            return cls.from_dicts(value)
+        if isinstance(value, str):
+            return cls.from_text(value)
+        return cls([])
+
+    def to_compact(self) -> Dict[str, Any]:
+        rows = []
+        for session in self.sessions:
+            row = [getattr(session, field) for field in COMPACT_FIELDS]
+            if session.extra:
+                row.append(session.extra)
+            rows.append(row)
+        return {"v": COMPACT_VERSION, "rows": rows}
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [session.to_dict() for session in self.sessions]
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __iter__(self) -> Iterator[PlanSession]:
+        return iter(self.sessions)
+
+    def __bool__(self) -> bool:
+        return bool(self.sessions)
+
+    @property
+    def total_topics(self) -> int:
+        return len(self.sessions)
+
+    def days(self) -> List[Any]:
+        """Day numbers in order"""
+        return sorted(self._day_index, key=_day_order)
+
+    def sessions_for_day(self, day: Any) -> List[PlanSession]:
+        return [self.sessions[index] for index in self._day_index.get(day, [])]
+
+    def by_day(self) -> Iterator[Tuple[Any, List[PlanSession]]]:
+        """(day, sessions) pairs in day order"""
+        for day in self.days():
+            yield day, self.sessions_for_day(day)
+
+    def find_topic(self, topic: str) -> Optional[PlanSession]:
+        """The (first) session covering a topic, in O(1)"""
+        index = self._topic_index.get(topic)
+        return self.sessions[index] if index is not None else None
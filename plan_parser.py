@@ -0,0 +1,246 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Consumed text is dropped once this much has piled up between sessions
+_TRIM_THRESHOLD = 64 * 1024
+
+# Only these characters change parser state; everything between them is skipped
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+_ROOT_START = re.compile(r'[\[{]')
+_decoder = json.JSONDecoder()
+
+# Required fields of a plan session and their JSON types
+SESSION_FIELDS = {
+    "day": int,
+    "time_slot": str,
+    "topic": str,
+    "activities": list,
+    "expected_outcome": str
+}
+
+
+class StreamingPlanParser:
+    """Incremental parser for the study plan JSON returned by StudyPlanAgent
+
+    Feed it response chunks as they arrive; each plan session object is
+    returned as soon as its closing brace is seen. Leading code fences or prose,
+    trailing garbage after the plan, and a `{"plan": [...]}` wrapper are all
+    tolerated, as is bracketed prose before it (a root that holds no sessions is
+    skipped). If the response is cut off, every session that was complete is
+    kept and `truncated` is set.
+    """
+
+    def __init__(self):
+        self.sessions: List[Dict[str, Any]] = []
+        self.truncated = False
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        # One entry per open container: [kind, is_session_list]
+        self._stack: List[List[Any]] = []
+        self._root_start: Optional[int] = None
+        self._session_start: Optional[int] = None
+        self._in_string = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk; returns the sessions completed by it"""
+        if self.done or not chunk:
+            return []
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        stack = self._stack
+
+        i = self._pos
+        while True:
+            if self._in_string:
+                match = _STRING_END.search(buffer, i)
+                if match is None:
+                    i = len(buffer)
+                    break
+                i = match.start()
+                if buffer[i] == "\\":
+                    # Skip the escaped character (it may arrive in the next chunk)
+                    if i + 1 >= len(buffer):
+                        break
+                    i += 2
+                    continue
+                self._in_string = False
+                # A string directly inside the root object may be a key ("plan")
+                if len(stack) == 1 and stack[0][0] == "{":
+                    self._last_key = buffer[self._string_start + 1:i]
+                i += 1
+                continue
+
+            if not stack:
+                # Skip fences/prose until the plan starts
+                match = _ROOT_START.search(buffer, i)
+                if match is None:
+                    i = len(buffer)
+                    break
+                i = match.start()
+                self._root_start = i
+                stack.append([buffer[i], buffer[i] == "["])
+                i += 1
+                continue
+
+            match = _STRUCTURE.search(buffer, i)
+            if match is None:
+                i = len(buffer)
+                break
+            i = match.start()
+            char = buffer[i]
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "[{":
+                parent_is_session_list = stack[-1][1]
+                if char == "{" and parent_is_session_list and self._session_start is None:
+                    self._session_start = i
+                is_session_list = (char == "[" and len(stack) == 1 and stack[0][0] == "{"
+                                   and self._last_key == "plan")
+                stack.append([char, is_session_list])
+            else:
+                stack.pop()
+                if char == "}" and self._session_start is not None and stack and stack[-1][1]:
+                    session = self._decode(buffer[self._session_start:i + 1])
+                    self._session_start = None
+                    if isinstance(session, dict):
+                        self.sessions.append(session)
+                        completed.append(session)
+                if not stack:
+                    self._finish(buffer[self._root_start:i + 1])
+                    i += 1
+                    if self.done:
+                        break
+                    continue
+            i += 1
+
+        self._pos = i
+        self._trim()
+        return completed
+
+    def close(self):
+        """Signal end of input; anything still open was cut off"""
+        if not self.done:
+            self.done = True
+            self.truncated = self._root_start is not None
+
+    def _finish(self, root_text: str):
+        if not self.sessions:
+            # A root object without a "plan" list is a single session
+            root = self._decode(root_text)
+            if isinstance(root, dict) and "plan" not in root:
+                self.sessions.append(root)
+        if self.sessions:
+            self.done = True
+            return
+        # Brackets in leading prose ("Note [1]: ...") aren't the plan; keep looking
+        self._root_start = None
+        self._last_key = None
+
+    def _trim(self):
+        """Drop consumed text that no open session or root object still needs"""
+        if self._session_start is not None or self._pos < _TRIM_THRESHOLD:
+            return
+        if not any(is_session_list for _, is_session_list in self._stack):
+            return
+        self._buffer = self._buffer[self._pos:]
+        self._string_start -= self._pos
+        self._root_start = 0
+        self._pos = 0
+
+    @staticmethod
+    def _decode(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+
+def _normalize(plan_data: Any) -> Optional[List[Dict[str, Any]]]:
+    if isinstance(plan_data, dict):
+        plan_data = plan_data["plan"] if "plan" in plan_data else [plan_data]
+    if not isinstance(plan_data, list):
+        return None
+    return [session for session in plan_data if isinstance(session, dict)]
+
+
+def parse_plan(plan_text: str) -> List[Dict[str, Any]]:
+    """Parse a complete plan response, keeping every complete session"""
+    # Well-formed responses decode in one C-level pass; raw_decode ignores
+    # anything after the plan (closing fences, trailing remarks)
+    match = _ROOT_START.search(plan_text or "")
+    if match is not None:
+        try:
+            sessions = _normalize(_decoder.raw_decode(plan_text, match.start())[0])
+            if sessions:
+                return sessions
+        except json.JSONDecodeError:
+            pass
+
+    parser = StreamingPlanParser()
+    parser.feed(plan_text or "")
+    parser.close()
+    if parser.truncated:
+        print(f"Warning: study plan response was truncated, kept {len(parser.sessions)} complete sessions")
+    elif not parser.sessions and plan_text:
+        print("Error parsing JSON: no study plan sessions found")
+    return parser.sessions
+
+
+def session_errors(session: Dict[str, Any], days: Optional[int] = None) -> List[str]:
+    """Schema problems with one plan session (empty list if it is valid)"""
+    errors = []
+    for field, field_type in SESSION_FIELDS.items():
+        value = session.get(field)
+        if not isinstance(value, field_type) or isinstance(value, bool):
+            errors.append(f"{field}: expected {field_type.__name__}")
+        elif field_type in (str, list) and not value:
+            errors.append(f"{field}: empty")
+    if not errors:
+        if not all(isinstance(activity, str) for activity in session["activities"]):
+            errors.append("activities: expected a list of strings")
+        if session["day"] < 1 or (days is not None and session["day"] > days):
+            errors.append(f"day: {session['day']} outside 1..{days}")
+    return errors
+
+
+def _day_ranges(day_numbers: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for day in sorted(day_numbers):
+        if ranges and day == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def check_plan(sessions: List[Dict[str, Any]], days: int) -> Tuple[List[Dict[str, Any]], List[Tuple[int, int]]]:
+    """Split a plan into its valid days and the day ranges that must be regenerated
+
+    A day is kept only if it has sessions and all of them pass `session_errors`;
+    otherwise the whole day is dropped so it can be re-requested in one piece.
+    Returns (sessions of the valid days ordered by day, [(first_day, last_day), ...]).
+    """
+    by_day: Dict[int, List[Dict[str, Any]]] = {}
+    bad_days = set()
+    for session in sessions:
+        day = session.get("day")
+        if session_errors(session, days):
+            if isinstance(day, int) and 1 <= day <= days:
+                bad_days.add(day)
+            continue
+        by_day.setdefault(day, []).append(session)
+
+    valid = []
+    for day in range(1, days + 1):
+        if day in by_day and day not in bad_days:
+            valid.extend(by_day[day])
+    missing = [day for day in range(1, days + 1) if day not in by_day or day in bad_days]
+    return valid, _day_ranges(missing)
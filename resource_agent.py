@@ -1,13 +1,142 @@
+import concurrent.futures
+import re
+import threading
+
 from gemini_client import ask_gemini
+from observability.metrics import RESOURCE_STORE
+from resource_store import ResourceStore, normalize_topic, split_topics
+
+# Topic sections of the response start with a level-2 header
+_SECTION_START = re.compile(r"(?m)^(?=## )")
+# "Topic 3: " style numbering the model sometimes adds to headers
+_HEADER_NUMBERING = re.compile(r"^topic\s*\d+\s*[:.-]\s*")
+
+
+def _mentions(header, name):
+    """Whether `name` appears in `header` as whole words ("r" is not in "intro to statistics")"""
+    return re.search(rf"(?<!\w){re.escape(name)}(?!\w)", header) is not None
+
+
+def _split_sections(response, topics):
+    """Map each requested topic to its "## topic" section
+
+    Returns (sections, leftover text, guessed); `guessed` is set when headers
+    matched no topic and sections were assigned by position, which is fine to
+    show but not to store.
+    """
+    parts = [part.strip() for part in _SECTION_START.split(response or "") if part.strip()]
+    sections = [part for part in parts if part.startswith("## ")]
+
+    by_name = {normalize_topic(topic): topic for topic in topics}
+    matched = {}
+    leftover = []
+    for section in sections:
+        header = _HEADER_NUMBERING.sub("", normalize_topic(section.splitlines()[0][3:]))
+        topic = by_name.get(header)
+        if topic is None:
+            topic = next((t for name, t in by_name.items() if _mentions(header, name) and t not in matched), None)
+        if topic is not None and topic not in matched:
+            matched[topic] = section
+        else:
+            leftover.append(section)
+
+    # Headers the model renamed: with one section per topic, order decides
+    if not matched and len(sections) == len(topics):
+        return dict(zip(topics, sections)), "", True
+    if not matched:
+        return {}, "\n\n".join(parts), False
+    # An intro line ("Here are some resources...") is dropped with the sections
+    return matched, "\n\n".join(leftover), False
+
 
 class ResourceAgent:
-    def __init__(self, api_key=None):
+    # Topics being generated, shared by every agent in the process: {normalized topic: Future}
+    _inflight = {}
+    _inflight_lock = threading.Lock()
+
+    def __init__(self, api_key=None, store=None):
         self.api_key = api_key
+        self.store = store or ResourceStore()
 
     def fetch_resources(self, study_plan_text):
-        prompt = f"""
+        """Resources for every topic of a syllabus; only missing or stale topics hit Gemini"""
+        topics = split_topics(study_plan_text)
+        if not topics:
+            return ask_gemini(self._build_prompt(study_plan_text=study_plan_text), agent="ResourceAgent")
+
+        sections = self.store.get_many(topics)
+        missing = [topic for topic in topics if topic not in sections]
+        leftover = ""
+        if missing:
+            generated, leftover = self._generate_missing(missing)
+            sections.update(generated)
+
+        parts = [sections[topic] for topic in topics if topic in sections]
+        if leftover:
+            # Anything that couldn't be attributed to a topic is still shown, just not stored
+            parts.append(leftover)
+        return "\n\n".join(parts)
+
+    def _generate_missing(self, missing):
+        """Sections for uncached topics: this call generates the topics nobody
+        else is generating and waits for the rest (returns sections, leftover)"""
+        owned, joined = [], {}
+        with self._inflight_lock:
+            for topic in missing:
+                future = self._inflight.get(normalize_topic(topic))
+                if future is None:
+                    self._inflight[normalize_topic(topic)] = concurrent.futures.Future()
+                    owned.append(topic)
+                else:
+                    joined[topic] = future
+        if joined:
+            RESOURCE_STORE.labels("joined").inc(len(joined))
+
+        generated, leftover = {}, ""
+        if owned:
+            try:
+                # Stored sections are shared by every user, so the prompt names
+                # only the topics, never this user's syllabus text
+                response = ask_gemini(self._build_prompt(topics=owned), agent="ResourceAgent")
+                generated, leftover, guessed = _split_sections(response, owned)
+                if not guessed:
+                    for topic, section in generated.items():
+                        self.store.put(topic, section)
+            except Exception as e:
+                self._settle(owned, error=e)
+                raise
+            self._settle(owned, sections=generated)
+
+        for topic, future in joined.items():
+            section = future.result()
+            if section is not None:
+                generated[topic] = section
+        return generated, leftover
+
+    def _settle(self, topics, sections=None, error=None):
+        """Hand this call's results (or failure) to the requests waiting on its topics"""
+        with self._inflight_lock:
+            futures = [self._inflight.pop(normalize_topic(topic)) for topic in topics]
+        for topic, future in zip(topics, futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(sections.get(topic))
+
+    @staticmethod
+    def _build_prompt(study_plan_text=None, topics=None):
+        if topics:
+            topic_lines = "\n".join(f"- {topic}" for topic in topics)
+            scope = f"""TOPICS (one section each, header EXACTLY "## <topic as written below>"):
+{topic_lines}
+"""
+        else:
+            scope = f"""Study Plan:
+{study_plan_text}
+"""
+        return f"""
 You are a resource-curation agent.
-Given this study plan, produce 2–4 HIGH-QUALITY verified resources per topic in MARKDOWN format.
+Produce 2–4 HIGH-QUALITY verified resources per topic below in MARKDOWN format.
 
 Rules:
 - ONLY include real, verified resources (YouTube channels, official docs, high-quality blogs)
@@ -16,11 +145,9 @@ Rules:
 - Add a short 1-line description for each resource
 - Group by topic using headers
 
-Study Plan:
-{study_plan_text}
-
+{scope}
 Example Format:
-## Topic 1: Introduction to Machine Learning
+## Introduction to Machine Learning
 
 ### Video Resources
 - [Machine Learning Crash Course](https://youtube.com/watch?v=example) - Comprehensive introduction by Google
@@ -32,4 +159,3 @@ Example Format:
 
 Return in markdown format (no code fences).
 """
-        return ask_gemini(prompt)
\ No newline at end of file
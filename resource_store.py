@@ -0,0 +1,130 @@
+"""Global per-topic store of curated resources
+
+Good resources for "Linear Regression" don't depend on who asks, so
+ResourceAgent keeps one markdown section per normalized topic and only asks
+Gemini about topics that are missing or stale. Entries are small JSON
+records under ``<store_dir>/<shard>/<key>.json`` pointing at a blob in the
+shared store, with the time they were generated.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from blob_store import BlobStore
+from observability.metrics import RESOURCE_STORE
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_process_lock = threading.RLock()
+
+# Topics in a syllabus are separated by commas, semicolons or new lines
+_TOPIC_SEPARATOR = re.compile(r"[,;\n]+")
+# Leading list markers/numbering of a topic line ("- ", "1. ", "3) ")
+_TOPIC_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.split()).lower()
+
+
+def split_topics(syllabus: str) -> List[str]:
+    """Distinct topics of a syllabus, in order"""
+    topics = []
+    seen = set()
+    for part in _TOPIC_SEPARATOR.split(syllabus or ""):
+        topic = _TOPIC_PREFIX.sub("", part).strip()
+        key = normalize_topic(topic)
+        if topic and key not in seen:
+            seen.add(key)
+            topics.append(topic)
+    return topics
+
+
+class ResourceStore:
+    """Resource sections keyed by normalized topic, fresh for `max_age_days`"""
+
+    def __init__(self, store_dir: Optional[str] = None, blob_store: Optional[BlobStore] = None,
+                 max_age_days: Optional[int] = None):
+        self.store_dir = store_dir or os.getenv("EDUBOT_RESOURCE_STORE_DIR", "resource_store")
+        self.blob_store = blob_store or BlobStore()
+        self.max_age_days = (max_age_days if max_age_days is not None
+                             else int(os.getenv("EDUBOT_RESOURCE_MAX_AGE_DAYS", "30")))
+
+    def get(self, topic: str) -> Optional[str]:
+        """The topic's resource section, or None if missing or stale"""
+        entry = self._read_entry(topic)
+        if entry is None:
+            RESOURCE_STORE.labels("miss").inc()
+            return None
+        try:
+            created = datetime.fromisoformat(entry["created_at"])
+            if datetime.now() - created > timedelta(days=self.max_age_days):
+                RESOURCE_STORE.labels("stale").inc()
+                return None
+            content = self.blob_store.get(entry["content_hash"])
+        except (KeyError, ValueError):
+            RESOURCE_STORE.labels("miss").inc()
+            return None
+        RESOURCE_STORE.labels("hit").inc()
+        return content
+
+    def get_many(self, topics: List[str]) -> Dict[str, str]:
+        """Fresh sections of the topics that have one"""
+        found = {}
+        for topic in topics:
+            content = self.get(topic)
+            if content is not None:
+                found[topic] = content
+        return found
+
+    def put(self, topic: str, content: str):
+        """Store (or refresh) a topic's section"""
+        path = self._entry_path(topic)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content_hash = self.blob_store.put(content)
+        # Two refreshes of one topic must not both release the same old blob
+        with self._locked(path):
+            previous = self._read_entry(topic)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "topic": topic,
+                    "created_at": datetime.now().isoformat(),
+                    "content_hash": content_hash
+                }, f)
+            os.replace(tmp_path, path)
+            if previous and previous.get("content_hash"):
+                self.blob_store.decref(previous["content_hash"])
+
+    @contextmanager
+    def _locked(self, path: str) -> Iterator[None]:
+        """Serialize updates of one entry across threads and gunicorn workers"""
+        with _process_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entry_path(self, topic: str) -> str:
+        key = hashlib.sha256(normalize_topic(topic).encode("utf-8")).hexdigest()
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def _read_entry(self, topic: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._entry_path(topic), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
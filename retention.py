@@ -0,0 +1,139 @@
+"""Session retention and compaction job
+
+Archives sessions that fall outside the retention policy into per-user packed
+archives, archives old saved notes, and garbage-collects content blobs that are
+no longer referenced. Archived sessions stay readable through
+`SessionManager.load_session`.
+
+Usage:
+    python retention.py --max-age-days 180 --max-sessions-per-user 50 --inactive-days 90
+    python retention.py --dry-run
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from blob_store import BlobStore
+from generation_cache import GenerationCache
+from session_manager import SessionManager
+from tools.notes_tool import NotesTool
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+class RetentionPolicy:
+    """Which live sessions to keep; every limit is optional"""
+
+    def __init__(self, max_age_days: Optional[int] = None,
+                 max_sessions_per_user: Optional[int] = None,
+                 inactive_days: Optional[int] = None):
+        self.max_age_days = max_age_days
+        self.max_sessions_per_user = max_sessions_per_user
+        self.inactive_days = inactive_days
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """Build a policy from EDUBOT_RETENTION_* environment variables"""
+        return cls(
+            max_age_days=_optional_int("EDUBOT_RETENTION_MAX_AGE_DAYS"),
+            max_sessions_per_user=_optional_int("EDUBOT_RETENTION_MAX_SESSIONS_PER_USER"),
+            inactive_days=_optional_int("EDUBOT_RETENTION_INACTIVE_DAYS")
+        )
+
+    def select_for_archive(self, sessions: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[str]:
+        """Return ids of one user's sessions that should be archived"""
+        now = now or datetime.now()
+        expired = set()
+
+        # Newest first, by last activity
+        ordered = sorted(
+            sessions,
+            key=lambda s: s.get("last_updated") or s.get("created_at") or "",
+            reverse=True
+        )
+
+        for index, session in enumerate(ordered):
+            session_id = session.get("session_id")
+            created = _parse_time(session.get("created_at"))
+            last_active = _parse_time(session.get("last_updated")) or created
+
+            if self.max_sessions_per_user is not None and index >= self.max_sessions_per_user:
+                expired.add(session_id)
+            elif self.max_age_days is not None and created and now - created > timedelta(days=self.max_age_days):
+                expired.add(session_id)
+            elif self.inactive_days is not None and last_active and now - last_active > timedelta(days=self.inactive_days):
+                expired.add(session_id)
+
+        return [s.get("session_id") for s in ordered if s.get("session_id") in expired]
+
+
+def run_compaction(policy: RetentionPolicy,
+                   session_manager: Optional[SessionManager] = None,
+                   notes_tool: Optional[NotesTool] = None,
+                   dry_run: bool = False) -> Dict[str, int]:
+    """Apply the retention policy and return counts of what was archived/removed"""
+    blob_store = BlobStore()
+    session_manager = session_manager or SessionManager(blob_store=blob_store)
+    notes_tool = notes_tool or NotesTool(blob_store=blob_store)
+    now = datetime.now()
+
+    stats = {"users_scanned": 0, "sessions_archived": 0, "notes_archived": 0,
+             "catalog_entries_removed": 0, "blobs_removed": 0}
+
+    for user_id in list(session_manager.iter_user_ids()):
+        stats["users_scanned"] += 1
+        for session_id in policy.select_for_archive(session_manager.list_sessions(user_id), now):
+            if not dry_run:
+                session_manager.archive_session(session_id)
+            stats["sessions_archived"] += 1
+
+    if policy.max_age_days is not None and not dry_run:
+        stats["notes_archived"] = notes_tool.archive_notes(now - timedelta(days=policy.max_age_days))
+
+    # Expired catalog entries still hold references on their blobs
+    catalog = GenerationCache(blob_store=session_manager.blob_store)
+    stats["catalog_entries_removed"] = catalog.purge_expired(dry_run=dry_run)
+
+    if not dry_run:
+        stats["blobs_removed"] = session_manager.blob_store.gc()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old sessions and compact storage")
+    parser.add_argument("--max-age-days", type=int, help="Archive sessions created more than N days ago")
+    parser.add_argument("--max-sessions-per-user", type=int, help="Keep at most N live sessions per user")
+    parser.add_argument("--inactive-days", type=int, help="Archive sessions untouched for N days")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be archived without changing anything")
+    args = parser.parse_args()
+
+    env_policy = RetentionPolicy.from_env()
+    policy = RetentionPolicy(
+        max_age_days=args.max_age_days if args.max_age_days is not None else env_policy.max_age_days,
+        max_sessions_per_user=(
+            args.max_sessions_per_user if args.max_sessions_per_user is not None
+            else env_policy.max_sessions_per_user
+        ),
+        inactive_days=args.inactive_days if args.inactive_days is not None else env_policy.inactive_days
+    )
+
+    stats = run_compaction(policy, dry_run=args.dry_run)
+    prefix = "[dry run] " if args.dry_run else ""
+    for key, value in stats.items():
+        print(f"{prefix}{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
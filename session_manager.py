@@ -1,60 +1,406 @@
 import json
 import os
+import shutil
+import threading
+import warnings
+import zipfile
 from datetime import datetime
-from typing import Dict, Any, List
+from functools import wraps
+from typing import Dict, Any, Iterator, List, Optional
+
+from blob_store import BlobStore
+from observability.metrics import SESSION_STORE_LATENCY
+from plan_model import StudyPlan
+from storage_layout import (
+    SESSION_ID_PATTERN, iter_user_dirs, user_archive_path, user_dir, user_from_session_id
+)
+
+# Large generated content is kept out of the session record and loaded on demand
+BLOB_FIELDS = ("study_plan", "study_plan_raw", "notes", "resources")
+# Text blobs are stored verbatim so they dedupe with saved notes; these are JSON
+JSON_BLOB_FIELDS = ("study_plan",)
+
+
+def _timed(operation: str):
+    """Record the latency of a session store operation"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with SESSION_STORE_LATENCY.labels(operation).time():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SessionRecord:
+    """Session metadata with generated content loaded lazily on first access"""
+
+    def __init__(self, manager: "SessionManager", session_id: str, metadata: Dict[str, Any]):
+        self._manager = manager
+        self._session_id = session_id
+        self._metadata = metadata
+        self._blobs: Dict[str, Any] = {}
+        self._plan: Optional[StudyPlan] = None
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Small metadata/progress record, without any blob content"""
+        return self._metadata
+
+    @property
+    def plan(self) -> StudyPlan:
+        """The parsed study plan (decoded once per record)"""
+        if self._plan is None:
+            stored = self._metadata.get("study_plan")
+            if stored is None:
+                stored = self._load_blob("study_plan")
+            self._plan = StudyPlan.coerce(stored)
+        return self._plan
+
+    def _load_blob(self, field: str) -> Any:
+        if field not in self._blobs:
+            self._blobs[field] = self._manager._load_blob(self._session_id, self._metadata, field)
+        return self._blobs[field]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name == "study_plan" and name in self:
+            return self.plan.to_dicts()
+        if name in BLOB_FIELDS and name not in self._metadata:
+            return self._load_blob(name)
+        try:
+            return self._metadata[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "study_plan" and key in self:
+            # Callers of the dict API get the plain list-of-dicts plan
+            return self.plan.to_dicts()
+        if key in BLOB_FIELDS and key not in self._metadata:
+            if key not in self._manager._blob_fields(self._metadata):
+                raise KeyError(key)
+            return self._load_blob(key)
+        return self._metadata[key]
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._metadata:
+            return True
+        return key in BLOB_FIELDS and key in self._manager._blob_fields(self._metadata)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the full session, loading every blob"""
+        data = dict(self._metadata)
+        data.pop("blobs", None)
+        for field in self._manager._blob_fields(self._metadata):
+            if field not in data:
+                data[field] = self._load_blob(field)
+        if "study_plan" in data:
+            data["study_plan"] = self.plan.to_dicts()
+        return data
+
 
 class SessionManager:
-    """Manages user sessions and study progress"""
-    
-    def __init__(self, session_dir="sessions"):
+    """Manages user sessions and study progress
+
+    Live sessions are sharded per user under ``<session_dir>/users/<shard>/<user>/``
+    so listing a user's sessions never scans other users' files. Sessions retired
+    by the retention job are packed into ``<session_dir>/archive/<shard>/<user>.zip``
+    and remain readable through `load_session`.
+    """
+
+    LAYOUT_MARKER = ".layout-sharded"
+
+    def __init__(self, session_dir="sessions", blob_store: Optional[BlobStore] = None):
         self.session_dir = session_dir
+        self.blob_store = blob_store or BlobStore()
         os.makedirs(session_dir, exist_ok=True)
-    
+        self._migrate_flat_layout()
+
+    @_timed("create")
     def create_session(self, user_id: str) -> str:
         """Create a new study session"""
-        session_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        session_id = self._reserve_session_id(user_id)
         session_data = {
             "session_id": session_id,
             "user_id": user_id,
             "created_at": datetime.now().isoformat(),
-            "study_plan": None,
             "progress": {},
             "notes_history": [],
-            "refinements": []
+            "refinements": [],
+            "blobs": {}
         }
         self._save_session(session_id, session_data)
         return session_id
-    
-    def load_session(self, session_id: str) -> Dict[str, Any]:
-        """Load existing session"""
-        filepath = os.path.join(self.session_dir, f"{session_id}.json")
-        if not os.path.exists(filepath):
-            raise ValueError(f"Session {session_id} not found")
-        
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    
+
+    def _reserve_session_id(self, user_id: str) -> str:
+        """A new session id, suffixed (-2, -3, ...) if the user already started one this second"""
+        base_id = f"{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        session_id, attempt = base_id, 1
+        os.makedirs(os.path.dirname(self._session_path(base_id)), exist_ok=True)
+        while True:
+            try:
+                # Exclusive create, so concurrent workers never share an id
+                os.close(os.open(self._session_path(session_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return session_id
+            except FileExistsError:
+                attempt += 1
+                session_id = f"{base_id}-{attempt}"
+
+    @_timed("load")
+    def load_session(self, session_id: str) -> SessionRecord:
+        """Load existing session (metadata only; content blobs load on access)"""
+        return SessionRecord(self, session_id, self._load_metadata(session_id))
+
+    @_timed("update")
     def update_session(self, session_id: str, updates: Dict[str, Any]):
         """Update session data"""
-        session_data = self.load_session(session_id)
-        session_data.update(updates)
-        session_data["last_updated"] = datetime.now().isoformat()
-        self._save_session(session_id, session_data)
-    
+        metadata = self._load_metadata(session_id)
+        metadata.update(updates)
+        metadata["last_updated"] = datetime.now().isoformat()
+        self._save_session(session_id, metadata)
+
+    @_timed("list")
+    def list_sessions(self, user_id: str, include_archived: bool = False) -> List[Dict[str, Any]]:
+        """Return metadata records for all of a user's sessions"""
+        sessions = []
+        directory = user_dir(self.session_dir, user_id)
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if not filename.endswith(".json"):
+                    continue
+                session_id = filename[:-len(".json")]
+                if user_from_session_id(session_id) != user_id:
+                    continue
+                try:
+                    sessions.append(self._load_metadata(session_id))
+                except (OSError, ValueError) as e:
+                    print(f"Error reading session {session_id}: {e}")
+
+        if include_archived:
+            live_ids = {s.get("session_id") for s in sessions}
+            for record in self._iter_archived(user_id):
+                if record.get("session_id") in live_ids:
+                    continue
+                for field in BLOB_FIELDS:
+                    record.pop(field, None)
+                sessions.append(record)
+
+        return sessions
+
+    def iter_user_ids(self) -> Iterator[str]:
+        """Yield every user that has live sessions"""
+        for directory in iter_user_dirs(self.session_dir):
+            seen = set()
+            for filename in os.listdir(directory):
+                user_id = user_from_session_id(filename[:-len(".json")]) if filename.endswith(".json") else None
+                if user_id and user_id not in seen:
+                    seen.add(user_id)
+                    yield user_id
+
+    @_timed("archive")
+    def archive_session(self, session_id: str):
+        """Pack a live session into its user's archive and release its blobs"""
+        metadata = self._load_metadata(session_id)
+        if metadata.get("archived"):
+            return
+
+        record = SessionRecord(self, session_id, metadata).to_dict()
+        record["archived_at"] = datetime.now().isoformat()
+
+        user_id = metadata.get("user_id") or user_from_session_id(session_id)
+        archive_path = user_archive_path(self.session_dir, user_id)
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        with warnings.catch_warnings():
+            # A session restored by a later update and archived again is
+            # re-appended; readers always resolve to the newest entry
+            warnings.simplefilter("ignore", UserWarning)
+            with zipfile.ZipFile(archive_path, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(f"{session_id}.json", json.dumps(record))
+
+        blobs = metadata.get("blobs", {})
+        if isinstance(blobs, dict):
+            for digest in blobs.values():
+                self.blob_store.decref(digest)
+
+        for path in (self._session_path(session_id), self._flat_session_path(session_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        legacy_blob_dir = os.path.dirname(self._legacy_blob_path(session_id, "notes"))
+        if os.path.isdir(legacy_blob_dir):
+            shutil.rmtree(legacy_blob_dir)
+
+    def _session_path(self, session_id: str) -> str:
+        user_id = user_from_session_id(session_id)
+        if user_id is None:
+            return self._flat_session_path(session_id)
+        return os.path.join(user_dir(self.session_dir, user_id), f"{session_id}.json")
+
+    def _flat_session_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    def _legacy_blob_path(self, session_id: str, field: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.blobs", f"{field}.json")
+
+    def _load_metadata(self, session_id: str) -> Dict[str, Any]:
+        for filepath in (self._session_path(session_id), self._flat_session_path(session_id)):
+            if os.path.exists(filepath):
+                with open(filepath, 'r') as f:
+                    return json.load(f)
+
+        archived = self._load_archived(session_id)
+        if archived is None:
+            raise ValueError(f"Session {session_id} not found")
+        return archived
+
+    def _load_archived(self, session_id: str) -> Optional[Dict[str, Any]]:
+        user_id = user_from_session_id(session_id)
+        if user_id is None:
+            return None
+        archive_path = user_archive_path(self.session_dir, user_id)
+        if not os.path.exists(archive_path):
+            return None
+
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            try:
+                record = json.loads(archive.read(f"{session_id}.json"))
+            except KeyError:
+                return None
+        record["archived"] = True
+        return record
+
+    def _iter_archived(self, user_id: str) -> Iterator[Dict[str, Any]]:
+        archive_path = user_archive_path(self.session_dir, user_id)
+        if not os.path.exists(archive_path):
+            return
+        with zipfile.ZipFile(archive_path, 'r') as archive:
+            # Duplicate names resolve to the newest entry
+            for name in {info.filename for info in archive.infolist()}:
+                record = json.loads(archive.read(name))
+                if record.get("user_id", user_id) == user_id:
+                    record["archived"] = True
+                    yield record
+
+    def _migrate_flat_layout(self):
+        """Move sessions from the old flat directory into per-user shards (once)"""
+        marker = os.path.join(self.session_dir, self.LAYOUT_MARKER)
+        if os.path.exists(marker):
+            return
+
+        for filename in os.listdir(self.session_dir):
+            session_id = filename[:-len(".json")]
+            if not filename.endswith(".json") or not SESSION_ID_PATTERN.match(session_id):
+                continue
+            target = self._session_path(session_id)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.replace(self._flat_session_path(session_id), target)
+            except FileNotFoundError:
+                # Another worker migrated it first
+                continue
+
+        with open(marker, 'w') as f:
+            f.write(datetime.now().isoformat())
+
+    @staticmethod
+    def _blob_fields(metadata: Dict[str, Any]) -> List[str]:
+        return list(metadata.get("blobs", {}))
+
+    def _blob_refs(self, session_id: str, metadata: Dict[str, Any]) -> Dict[str, str]:
+        """Field -> content hash, migrating per-session blob files into the store"""
+        blobs = metadata.get("blobs", {})
+        if isinstance(blobs, dict):
+            return dict(blobs)
+
+        refs = {}
+        for field in blobs:
+            value = self._load_blob(session_id, metadata, field)
+            refs[field] = self._put_blob(field, value)
+        return refs
+
+    def _put_blob(self, field: str, value: Any) -> str:
+        if field == "study_plan":
+            value = StudyPlan.coerce(value).to_compact()
+        if field in JSON_BLOB_FIELDS or not isinstance(value, str):
+            value = json.dumps(value)
+        return self.blob_store.put(value)
+
+    def _load_blob(self, session_id: str, metadata: Dict[str, Any], field: str) -> Any:
+        blobs = metadata.get("blobs", {})
+        if isinstance(blobs, dict):
+            digest = blobs.get(field)
+            if not digest:
+                return None
+            content = self.blob_store.get(digest)
+            return json.loads(content) if field in JSON_BLOB_FIELDS else content
+
+        # Sessions written before the shared blob store kept per-session files
+        filepath = self._legacy_blob_path(session_id, field)
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
     def _save_session(self, session_id: str, data: Dict[str, Any]):
-        """Save session to disk"""
-        filepath = os.path.join(self.session_dir, f"{session_id}.json")
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-    
+        """Save session to disk, moving any inline content into the blob store"""
+        had_legacy_blobs = isinstance(data.get("blobs"), list)
+        blobs = self._blob_refs(session_id, data)
+
+        for field in BLOB_FIELDS:
+            if field not in data:
+                continue
+            value = data.pop(field)
+            if field == "study_plan":
+                # Parsed once here; stored in compact form
+                value = StudyPlan.coerce(value)
+                data["total_topics"] = len(value)
+            # Take the new reference before releasing the old one so
+            # unchanged content never drops to a zero refcount
+            digest = self._put_blob(field, value)
+            previous = blobs.get(field)
+            if previous:
+                self.blob_store.decref(previous)
+            blobs[field] = digest
+
+        data["blobs"] = blobs
+        # Writing an archived session restores it to the live store
+        data.pop("archived", None)
+        data.pop("archived_at", None)
+
+        filepath = self._session_path(session_id)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        self._write_json(filepath, data, indent=2)
+
+        flat_path = self._flat_session_path(session_id)
+        if flat_path != filepath and os.path.exists(flat_path):
+            os.remove(flat_path)
+        if had_legacy_blobs:
+            shutil.rmtree(os.path.dirname(self._legacy_blob_path(session_id, "notes")), ignore_errors=True)
+
+    @staticmethod
+    def _write_json(filepath: str, data: Any, indent: Optional[int] = None):
+        # Unique per writer so concurrent saves of one session never share a temp file
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp_path, filepath)
+
+    @_timed("mark_complete")
     def mark_topic_complete(self, session_id: str, topic: str):
         """Track completed topics"""
-        session_data = self.load_session(session_id)
+        session_data = self._load_metadata(session_id)
         if "progress" not in session_data:
             session_data["progress"] = {}
-        
+
         session_data["progress"][topic] = {
             "completed": True,
             "completed_at": datetime.now().isoformat()
         }
-        self._save_session(session_id, session_data)
\ No newline at end of file
+        self._save_session(session_id, session_data)
@@ -0,0 +1,48 @@
+import hashlib
+import os
+from typing import Dict, Tuple
+
+# Fingerprinted URLs change whenever the file does, so browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Pages and unversioned assets are revalidated so new fingerprints are picked up
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_fingerprints: Dict[str, Tuple[float, str]] = {}
+
+
+def _fingerprint(path: str) -> str:
+    """Short content hash of a static file, recomputed only when it changes"""
+    mtime = os.path.getmtime(path)
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _fingerprints[path] = (mtime, digest)
+    return digest
+
+
+def init_static_assets(app):
+    """Expose `static_url()` to templates and set cache headers on static files"""
+    from flask import request, url_for
+
+    def static_url(filename: str) -> str:
+        """URL for a static file with a content-hash version parameter"""
+        path = os.path.join(app.static_folder, filename)
+        return url_for("static", filename=filename, v=_fingerprint(path))
+
+    app.add_template_global(static_url)
+
+    @app.after_request
+    def set_cache_headers(response):
+        if request.endpoint == "static":
+            if request.args.get("v") and response.status_code in (200, 304):
+                response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            else:
+                response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        elif response.mimetype == "text/html":
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+    return app
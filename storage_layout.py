@@ -0,0 +1,49 @@
+import hashlib
+import os
+import re
+from typing import Iterator, Optional
+
+# Session ids are "<user_id>_<YYYYmmdd>_<HHMMSS>"
+SESSION_ID_PATTERN = re.compile(r"^(?P<user_id>.+)_\d{8}_\d{6}(?:-\d+)?$")
+
+
+def user_from_session_id(session_id: str) -> Optional[str]:
+    """Recover the owning user from a session id"""
+    match = SESSION_ID_PATTERN.match(session_id)
+    return match.group("user_id") if match else None
+
+
+def user_shard(user_id: str) -> str:
+    """Two-hex-digit shard so no directory holds more than ~1/256 of users"""
+    return hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:2]
+
+
+def safe_user_dirname(user_id: str) -> str:
+    """Filesystem-safe directory name for a user id"""
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", user_id)
+    return name or "_"
+
+
+def user_dir(root: str, user_id: str) -> str:
+    """Live data directory for a user: <root>/users/<shard>/<user>"""
+    return os.path.join(root, "users", user_shard(user_id), safe_user_dirname(user_id))
+
+
+def user_archive_path(root: str, user_id: str) -> str:
+    """Packed archive for a user: <root>/archive/<shard>/<user>.zip"""
+    return os.path.join(root, "archive", user_shard(user_id), f"{safe_user_dirname(user_id)}.zip")
+
+
+def iter_user_dirs(root: str) -> Iterator[str]:
+    """Yield every live per-user directory under root"""
+    users_root = os.path.join(root, "users")
+    if not os.path.isdir(users_root):
+        return
+    for shard in os.listdir(users_root):
+        shard_dir = os.path.join(users_root, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            path = os.path.join(shard_dir, name)
+            if os.path.isdir(path):
+                yield path
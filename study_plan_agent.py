@@ -1,20 +1,131 @@
-from gemini_client import ask_gemini
+import concurrent.futures
+import contextvars
+import os
+
+from gemini_client import ask_gemini, ask_gemini_stream
+from plan_parser import check_plan, parse_plan
+
+# Structured-output schema sent with every plan request (Gemini's OpenAPI subset)
+PLAN_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "day": {"type": "INTEGER"},
+            "time_slot": {"type": "STRING"},
+            "topic": {"type": "STRING"},
+            "description": {"type": "STRING"},
+            "activities": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "expected_outcome": {"type": "STRING"}
+        },
+        "required": ["day", "time_slot", "topic", "activities", "expected_outcome"]
+    }
+}
+
+# Rounds of re-requesting missing/invalid days before giving up on them
+MAX_REPAIR_ROUNDS = 2
+# Day ranges re-requested per round (each is one Gemini call, run in parallel)
+MAX_REPAIR_WORKERS = int(os.getenv("EDUBOT_PLAN_REPAIR_WORKERS", "4"))
+# Bad-day ranges this close together are re-requested as one range
+MAX_REPAIR_GAP = 2
 
 class StudyPlanAgent:
     def __init__(self, api_key):
         self.api_key = api_key
 
     def create_plan(self, syllabus, days, difficulty):
-        prompt = f"""
+        return ask_gemini(self._build_prompt(syllabus, days, difficulty),
+                          agent="StudyPlanAgent", response_schema=PLAN_RESPONSE_SCHEMA)
+
+    def create_plan_stream(self, syllabus, days, difficulty):
+        """Yield the plan response in chunks (feed them to plan_parser.StreamingPlanParser)"""
+        return ask_gemini_stream(self._build_prompt(syllabus, days, difficulty),
+                                 agent="StudyPlanAgent", response_schema=PLAN_RESPONSE_SCHEMA)
+
+    def complete_plan(self, syllabus, days, difficulty, sessions):
+        """Validate a parsed plan and re-request only the days that are missing or invalid
+        
+        Ranges of bad days are merged across small gaps into at most
+        MAX_REPAIR_WORKERS ranges, which are regenerated in parallel with the
+        valid days as context. Returns (sessions ordered by day, day ranges
+        that are still missing after MAX_REPAIR_ROUNDS).
+        """
+        try:
+            days = int(days)
+        except (TypeError, ValueError):
+            return sessions, []
+        sessions, missing = check_plan(sessions, days)
+        for _ in range(MAX_REPAIR_ROUNDS):
+            if not missing:
+                break
+            bad_days = {day for first_day, last_day in missing for day in range(first_day, last_day + 1)}
+            ranges = self._repair_ranges(missing)
+            print(f"  [StudyPlanAgent] Re-requesting days {', '.join(f'{a}-{b}' for a, b in ranges)}")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._create_day_range,
+                                    syllabus, days, difficulty, day_range,
+                                    self._neighbour_topics(sessions, day_range))
+                    for day_range in ranges
+                ]
+                for future in futures:
+                    try:
+                        # A merged range also covers valid days; keep the ones we had
+                        sessions.extend(session for session in future.result() if session["day"] in bad_days)
+                    except Exception as e:
+                        print(f"  [StudyPlanAgent] ✗ Retry failed: {e}")
+            sessions, missing = check_plan(sessions, days)
+        return sessions, missing
+
+    @staticmethod
+    def _repair_ranges(missing):
+        """Merge bad-day ranges split by at most MAX_REPAIR_GAP days, then the
+        closest ones until at most MAX_REPAIR_WORKERS remain"""
+        ranges = []
+        for first_day, last_day in missing:
+            if ranges and first_day - ranges[-1][1] - 1 <= MAX_REPAIR_GAP:
+                ranges[-1] = (ranges[-1][0], last_day)
+            else:
+                ranges.append((first_day, last_day))
+        while len(ranges) > max(MAX_REPAIR_WORKERS, 1):
+            index = min(range(len(ranges) - 1), key=lambda i: ranges[i + 1][0] - ranges[i][1])
+            ranges[index:index + 2] = [(ranges[index][0], ranges[index + 1][1])]
+        return ranges
+
+    @staticmethod
+    def _neighbour_topics(sessions, day_range):
+        """Topics of the days just before and after a range, to keep the progression"""
+        first_day, last_day = day_range
+        return [session["topic"] for session in sessions if session["day"] in (first_day - 1, last_day + 1)]
+
+    def _create_day_range(self, syllabus, days, difficulty, day_range, planned_topics):
+        prompt = self._build_prompt(syllabus, days, difficulty, day_range, planned_topics)
+        response = ask_gemini(prompt, agent="StudyPlanAgent", response_schema=PLAN_RESPONSE_SCHEMA)
+        first_day, last_day = day_range
+        return [session for session in parse_plan(response)
+                if isinstance(session.get("day"), int) and first_day <= session["day"] <= last_day]
+
+    @staticmethod
+    def _build_prompt(syllabus, days, difficulty, day_range=None, planned_topics=None):
+        scope = context = ""
+        task = "Create a detailed day-by-day study schedule."
+        if day_range is not None:
+            first_day, last_day = day_range
+            scope = f"\n- Days to generate: {first_day}-{last_day}"
+            task = (f"The other days are already planned. Create the schedule ONLY for days "
+                    f"{first_day} to {last_day} of this {days}-day plan, continuing the progression.")
+            if planned_topics:
+                context = f"\nTopics planned on the surrounding days: {'; '.join(planned_topics)}"
+        return f"""
 You are an academic planning agent that creates structured study schedules.
 
 Input:
 - Syllabus/Topics: {syllabus}
 - Total study days: {days}
-- Difficulty level: {difficulty}
+- Difficulty level: {difficulty}{scope}
 
 Task:
-Create a detailed day-by-day study schedule. Return ONLY valid JSON (no markdown, no code fences).
+{task} Return ONLY valid JSON (no markdown, no code fences).{context}
 
 JSON Structure:
 [
@@ -40,5 +151,4 @@ Rules:
 6. Return ONLY the JSON array, nothing else
 
 Generate the study plan now:
-"""
-        return ask_gemini(prompt)
\ No newline at end of file
+"""
\ No newline at end of file
@@ -0,0 +1,165 @@
+import threading
+import time
+import unittest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def _controller(**overrides):
+    settings = dict(slots=1, max_in_flight_per_user=2, rate_per_minute=6000, burst=100,
+                    queue_timeout=2, max_queued=4)
+    settings.update(overrides)
+    return AdmissionController(**settings)
+
+
+def _acquire_in_thread(controller, user_id, granted):
+    def run():
+        try:
+            controller.acquire(user_id)
+            granted.append(user_id)
+        except AdmissionRejected as rejected:
+            granted.append(rejected)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for_queued(controller, count):
+    deadline = time.monotonic() + 2
+    while controller.stats()["queued"] < count:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"expected {count} queued, got {controller.stats()}")
+        time.sleep(0.005)
+
+
+def _wait_for_granted(granted, count):
+    deadline = time.monotonic() + 2
+    while len(granted) < count:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"expected {count} grants, got {granted}")
+        time.sleep(0.005)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def test_acquire_and_release_free_slot(self):
+        controller = _controller(slots=2)
+        controller.acquire("alice")
+        self.assertEqual(controller.stats(), {"slots": 2, "free": 1, "queued": 0, "users_in_flight": 1})
+        controller.release("alice", 0.1)
+        self.assertEqual(controller.stats(), {"slots": 2, "free": 2, "queued": 0, "users_in_flight": 0})
+
+    def test_in_flight_limit_rejects_with_429(self):
+        controller = _controller(slots=4, max_in_flight_per_user=1)
+        controller.acquire("alice")
+        with self.assertRaises(AdmissionRejected) as caught:
+            controller.acquire("alice")
+        self.assertEqual((caught.exception.reason, caught.exception.status), ("in_flight", 429))
+        controller.acquire("bob")
+
+    def test_rate_limit_rejects_when_bucket_is_empty(self):
+        controller = _controller(slots=4, max_in_flight_per_user=10, rate_per_minute=1, burst=1)
+        controller.acquire("alice")
+        with self.assertRaises(AdmissionRejected) as caught:
+            controller.acquire("alice")
+        self.assertEqual(caught.exception.reason, "rate")
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+
+    def test_release_hands_slot_to_queued_waiter(self):
+        controller = _controller()
+        controller.acquire("alice")
+        granted = []
+        thread = _acquire_in_thread(controller, "bob", granted)
+        _wait_for_queued(controller, 1)
+        self.assertEqual(list(controller._turns), ["bob"])
+
+        controller.release("alice", 0.1)
+        thread.join(2)
+        self.assertEqual(granted, ["bob"])
+        self.assertEqual(controller.stats(), {"slots": 1, "free": 0, "queued": 0, "users_in_flight": 1})
+        self.assertEqual(list(controller._turns), [])
+        self.assertEqual(controller._queues, {})
+
+    def test_freed_slots_go_round_robin_between_users(self):
+        controller = _controller(max_in_flight_per_user=3)
+        controller.acquire("holder")
+        granted = []
+        threads = []
+        for user_id in ("alice", "alice", "bob"):
+            threads.append(_acquire_in_thread(controller, user_id, granted))
+            _wait_for_queued(controller, len(threads))
+        self.assertEqual(list(controller._turns), ["alice", "bob"])
+
+        controller.release("holder")
+        _wait_for_granted(granted, 1)
+        # alice had a turn, so she goes behind bob with her remaining waiter
+        self.assertEqual(list(controller._turns), ["bob", "alice"])
+        controller.release(granted[0])
+        _wait_for_granted(granted, 2)
+        controller.release(granted[1])
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(granted, ["alice", "bob", "alice"])
+        self.assertEqual(list(controller._turns), [])
+
+    def test_queue_full_rejects_with_503(self):
+        controller = _controller(max_queued=1)
+        controller.acquire("alice")
+        granted = []
+        thread = _acquire_in_thread(controller, "bob", granted)
+        _wait_for_queued(controller, 1)
+        with self.assertRaises(AdmissionRejected) as caught:
+            controller.acquire("carol")
+        self.assertEqual((caught.exception.reason, caught.exception.status), ("queue_full", 503))
+        controller.release("alice")
+        thread.join(2)
+
+    def test_queue_timeout_leaves_queue_and_clears_bookkeeping(self):
+        controller = _controller(queue_timeout=0.05)
+        controller.acquire("alice")
+        with self.assertRaises(AdmissionRejected) as caught:
+            controller.acquire("bob")
+        self.assertEqual((caught.exception.reason, caught.exception.status), ("queue_timeout", 503))
+        self.assertEqual(controller.stats(), {"slots": 1, "free": 0, "queued": 0, "users_in_flight": 1})
+        self.assertEqual(list(controller._turns), [])
+        self.assertEqual(controller._queues, {})
+
+        # The slot is simply freed, not handed to the waiter that gave up
+        controller.release("alice")
+        self.assertEqual(controller.stats()["free"], 1)
+
+    def test_acquire_extra_stays_within_user_limit(self):
+        controller = _controller(slots=4, max_in_flight_per_user=3)
+        controller.acquire("alice")
+        self.assertEqual(controller.acquire_extra("alice", 7), 2)
+        self.assertEqual(controller.stats(), {"slots": 4, "free": 1, "queued": 0, "users_in_flight": 1})
+        with self.assertRaises(AdmissionRejected):
+            controller.acquire("alice")
+        for _ in range(3):
+            controller.release("alice")
+        self.assertEqual(controller.stats(), {"slots": 4, "free": 4, "queued": 0, "users_in_flight": 0})
+
+    def test_acquire_extra_does_not_jump_the_queue(self):
+        controller = _controller(slots=2, max_in_flight_per_user=3)
+        controller.acquire("alice")
+        controller.acquire("bob")
+        granted = []
+        thread = _acquire_in_thread(controller, "carol", granted)
+        _wait_for_queued(controller, 1)
+        controller.release("bob")
+        thread.join(2)
+        self.assertEqual(controller.acquire_extra("alice", 2), 0)
+        controller.release("carol")
+        self.assertEqual(controller.acquire_extra("alice", 2), 1)
+
+    def test_admitted_releases_on_error(self):
+        controller = _controller()
+        with self.assertRaises(ValueError):
+            with controller.admitted("alice"):
+                raise ValueError("generation failed")
+        self.assertEqual(controller.stats(), {"slots": 1, "free": 1, "queued": 0, "users_in_flight": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from datetime import time
+
+from exporters import parse_time_slot
+
+
+class ParseTimeSlotTest(unittest.TestCase):
+
+    def test_twelve_hour_range(self):
+        self.assertEqual(parse_time_slot("9:00 AM - 10:30 AM"), (time(9, 0), time(10, 30)))
+
+    def test_twenty_four_hour_range(self):
+        self.assertEqual(parse_time_slot("14:00-15:30"), (time(14, 0), time(15, 30)))
+
+    def test_text_before_the_start_clock_is_ignored(self):
+        self.assertEqual(parse_time_slot("Session 1: 9:00 AM - 10:30 AM"), (time(9, 0), time(10, 30)))
+
+    def test_text_after_the_end_clock_is_ignored(self):
+        self.assertEqual(parse_time_slot("9:00 AM - 10:30 AM (with a 10 min break)"), (time(9, 0), time(10, 30)))
+
+    def test_one_meridiem_applies_to_both_sides(self):
+        self.assertEqual(parse_time_slot("9:00 - 11:00 AM"), (time(9, 0), time(11, 0)))
+        self.assertEqual(parse_time_slot("2:00 PM - 3:30"), (time(14, 0), time(15, 30)))
+
+    def test_start_is_morning_when_end_would_come_first(self):
+        self.assertEqual(parse_time_slot("11:30 - 1:00 PM"), (time(11, 30), time(13, 0)))
+
+    def test_end_is_afternoon_when_it_would_come_first(self):
+        self.assertEqual(parse_time_slot("11 AM - 1"), (time(11, 0), time(13, 0)))
+
+    def test_other_separators(self):
+        self.assertEqual(parse_time_slot("9:00 AM – 10:30 AM"), (time(9, 0), time(10, 30)))
+        self.assertEqual(parse_time_slot("9am to 11am"), (time(9, 0), time(11, 0)))
+
+    def test_unreadable_slots(self):
+        for slot in ("Morning", "9:00 AM", "10:00 AM - 9:00 AM", "25:00 - 26:00", None):
+            self.assertIsNone(parse_time_slot(slot), slot)
+
+
+if __name__ == "__main__":
+    unittest.main()
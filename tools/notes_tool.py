@@ -1,43 +1,192 @@
 import os
 import json
+import re
+import zipfile
 from datetime import datetime
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
+
+from blob_store import BlobStore
+from storage_layout import iter_user_dirs, user_archive_path, user_dir
+
+# Keeps filenames well under filesystem limits even for long pasted syllabi
+MAX_TOPIC_SLUG = 60
+
+
+def _topic_slug(topic: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", topic.replace(' ', '_'))[:MAX_TOPIC_SLUG]
+
+
+def _matches_topic(filename: str, topic: str) -> bool:
+    # Older files embedded the full topic with only spaces replaced
+    return _topic_slug(topic) in filename or topic.replace(' ', '_') in filename
+
 
 class NotesTool:
-    """Tool for managing and saving study notes"""
-    
-    def __init__(self, notes_dir="saved_notes"):
+    """Tool for managing and saving study notes
+
+    Notes are stored per user under ``<notes_dir>/users/<shard>/<user>/``;
+    notes retired by the retention job live in ``<notes_dir>/archive/``.
+    """
+
+    LAYOUT_MARKER = ".layout-sharded"
+    LEGACY_ARCHIVE = "legacy.zip"
+
+    def __init__(self, notes_dir="saved_notes", blob_store: Optional[BlobStore] = None):
         self.notes_dir = notes_dir
+        self.blob_store = blob_store or BlobStore()
         os.makedirs(notes_dir, exist_ok=True)
-    
+        self._has_flat_notes = self._migrate_flat_layout()
+
     def save_notes(self, topic: str, content: str, user_id: str) -> str:
         """Save notes to file"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{user_id}_{topic.replace(' ', '_')}_{timestamp}.txt"
-        filepath = os.path.join(self.notes_dir, filename)
-        
+        filename = f"{user_id}_{_topic_slug(topic)}_{timestamp}.json"
+        directory = user_dir(self.notes_dir, user_id)
+        os.makedirs(directory, exist_ok=True)
+        filepath = os.path.join(directory, filename)
+
+        # The file only references the content; identical notes share one blob
+        record = {
+            "topic": topic,
+            "user_id": user_id,
+            "created_at": datetime.now().isoformat(),
+            "content_hash": self.blob_store.put(content)
+        }
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"Topic: {topic}\n")
-            f.write(f"Created: {datetime.now().isoformat()}\n")
-            f.write("="*50 + "\n\n")
-            f.write(content)
-        
+            json.dump(record, f)
+
         return filepath
-    
-    def load_notes(self, user_id: str, topic: str = None) -> List[Dict[str, str]]:
+
+    def load_notes(self, user_id: str, topic: str = None, include_archived: bool = False) -> List[Dict[str, str]]:
         """Load saved notes for a user"""
         notes = []
-        for filename in os.listdir(self.notes_dir):
-            if filename.startswith(user_id):
-                if topic and topic.replace(' ', '_') not in filename:
+        directories = [user_dir(self.notes_dir, user_id)]
+        if self._has_flat_notes:
+            directories.append(self.notes_dir)
+
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if filename.startswith(user_id):
+                    if topic and not _matches_topic(filename, topic):
+                        continue
+
+                    filepath = os.path.join(directory, filename)
+                    notes.append({
+                        "filename": filename,
+                        "content": self._read_notes_file(filepath)
+                    })
+
+        if include_archived:
+            notes.extend(self._load_archived_notes(user_id, topic))
+
+        return notes
+
+    def archive_notes(self, older_than: datetime) -> int:
+        """Pack notes created before `older_than` into per-user archives"""
+        archived = 0
+        for directory in iter_user_dirs(self.notes_dir):
+            for filename in os.listdir(directory):
+                filepath = os.path.join(directory, filename)
+                if not filename.endswith(".json"):
                     continue
-                
-                filepath = os.path.join(self.notes_dir, filename)
                 with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                    record = json.load(f)
+                if datetime.fromisoformat(record["created_at"]) >= older_than:
+                    continue
+
+                archive_path = user_archive_path(self.notes_dir, record["user_id"])
+                self._append_to_archive(archive_path, filename, self._read_notes_file(filepath))
+                self.blob_store.decref(record["content_hash"])
+                os.remove(filepath)
+                archived += 1
+
+        if self._has_flat_notes:
+            # Old plain-text notes do not record their owner reliably
+            legacy_archive = os.path.join(self.notes_dir, "archive", self.LEGACY_ARCHIVE)
+            for filename, filepath in self._iter_flat_notes():
+                if datetime.fromtimestamp(os.path.getmtime(filepath)) >= older_than:
+                    continue
+                self._append_to_archive(legacy_archive, filename, self._read_notes_file(filepath))
+                os.remove(filepath)
+                archived += 1
+            self._has_flat_notes = self._mark_layout_if_clean()
+
+        return archived
+
+    def _read_notes_file(self, filepath: str) -> str:
+        """Read a notes file in the same text layout for both storage formats"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            if not filepath.endswith(".json"):
+                return f.read()
+            record = json.load(f)
+
+        return (
+            f"Topic: {record['topic']}\n"
+            f"Created: {record['created_at']}\n"
+            + "="*50 + "\n\n"
+            + self.blob_store.get(record["content_hash"])
+        )
+
+    def _load_archived_notes(self, user_id: str, topic: Optional[str]) -> List[Dict[str, str]]:
+        notes = []
+        archive_paths = [
+            user_archive_path(self.notes_dir, user_id),
+            os.path.join(self.notes_dir, "archive", self.LEGACY_ARCHIVE)
+        ]
+        for archive_path in archive_paths:
+            if not os.path.exists(archive_path):
+                continue
+            with zipfile.ZipFile(archive_path, 'r') as archive:
+                for name in archive.namelist():
+                    if not name.startswith(user_id):
+                        continue
+                    if topic and not _matches_topic(name, topic):
+                        continue
                     notes.append({
-                        "filename": filename,
-                        "content": content
+                        "filename": name,
+                        "content": archive.read(name).decode("utf-8"),
+                        "archived": True
                     })
-        
-        return notes
\ No newline at end of file
+        return notes
+
+    @staticmethod
+    def _append_to_archive(archive_path: str, name: str, content: str):
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        with zipfile.ZipFile(archive_path, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(name, content)
+
+    def _iter_flat_notes(self) -> Iterator:
+        for filename in os.listdir(self.notes_dir):
+            filepath = os.path.join(self.notes_dir, filename)
+            if os.path.isfile(filepath) and filename.endswith((".txt", ".json")):
+                yield filename, filepath
+
+    def _migrate_flat_layout(self) -> bool:
+        """Move flat note records into per-user shards; True if flat notes remain"""
+        if os.path.exists(os.path.join(self.notes_dir, self.LAYOUT_MARKER)):
+            return False
+
+        for filename, filepath in list(self._iter_flat_notes()):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    user_id = json.load(f)["user_id"]
+                target_dir = user_dir(self.notes_dir, user_id)
+                os.makedirs(target_dir, exist_ok=True)
+                os.replace(filepath, os.path.join(target_dir, filename))
+            except FileNotFoundError:
+                # Another worker migrated it first
+                continue
+
+        return self._mark_layout_if_clean()
+
+    def _mark_layout_if_clean(self) -> bool:
+        """Record that no flat notes remain, so loads skip the flat directory"""
+        if any(True for _ in self._iter_flat_notes()):
+            return True
+        with open(os.path.join(self.notes_dir, self.LAYOUT_MARKER), 'w') as f:
+            f.write(datetime.now().isoformat())
+        return False
@@ -1,13 +1,257 @@
-import requests
-from typing import List, Dict
+import concurrent.futures
+import ipaddress
+import os
+import re
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+# Markdown links [text](url) and bare URLs
+_LINK = re.compile(r"\[[^\]]*\]\((https?://[^)\s]+)\)|(?<![(\[])(https?://[^\s)<>\]]+)")
+# Some servers reject HEAD; these answers are retried with GET
+_HEAD_UNSUPPORTED = {403, 405, 501}
+MAX_REDIRECTS = 5
+
+
+def extract_links(markdown: str) -> List[str]:
+    """Distinct http(s) links of a markdown document, in order of appearance"""
+    links = []
+    seen = set()
+    for match in _LINK.finditer(markdown or ""):
+        url = (match.group(1) or match.group(2)).rstrip(".,;:")
+        if url not in seen:
+            seen.add(url)
+            links.append(url)
+    return links
+
+
+class _BlockedURL(Exception):
+    """A link (or one of its redirects) points at a non-public address"""
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if getattr(ip, "ipv4_mapped", None):
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_multicast
+                or ip.is_reserved or ip.is_unspecified)
+
+
+class LinkVerifier:
+    """Checks many links at once over pooled keep-alive connections
+
+    Links are checked concurrently, at most `per_host` at a time per host:
+    further links to a busy host wait in a per-host queue (not on a pool
+    thread), so one slow site cannot take every worker. Results are cached for
+    `ttl` seconds (`failure_ttl` for broken links, which are often transient),
+    up to `max_cached` links.
+
+    The links come from generated content, so only public addresses are
+    fetched, and redirects are followed by hand and checked hop by hop.
+    `allow_private` (EDUBOT_LINK_CHECK_ALLOW_PRIVATE=1) lifts that for local
+    test servers.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, per_host: Optional[int] = None,
+                 timeout: Optional[float] = None, ttl: Optional[float] = None,
+                 failure_ttl: Optional[float] = None, max_cached: Optional[int] = None,
+                 allow_private: Optional[bool] = None):
+        self.max_workers = max_workers or int(os.getenv("EDUBOT_LINK_CHECK_WORKERS", "16"))
+        self.per_host = per_host or int(os.getenv("EDUBOT_LINK_CHECK_PER_HOST", "4"))
+        self.timeout = timeout or float(os.getenv("EDUBOT_LINK_CHECK_TIMEOUT", "5"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("EDUBOT_LINK_CACHE_TTL", "86400"))
+        self.failure_ttl = failure_ttl if failure_ttl is not None else min(self.ttl, 900)
+        self.max_cached = max_cached or int(os.getenv("EDUBOT_LINK_CACHE_SIZE", "10000"))
+        self.allow_private = (allow_private if allow_private is not None
+                              else os.getenv("EDUBOT_LINK_CHECK_ALLOW_PRIVATE") == "1")
+
+        # requests is imported here, not at module level, to keep web start-up fast
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "EduBot-LinkCheck/1.0"
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="link-check")
+        self._cache: Dict[str, Dict[str, object]] = {}
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        # Checks running per host, and links waiting for one of its slots;
+        # both are dropped as soon as a host goes idle
+        self._host_active: Dict[str, int] = {}
+        self._host_waiting: Dict[str, Deque[str]] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, url: str) -> Optional[Dict[str, object]]:
+        """The cached result for a link if it is still fresh"""
+        with self._lock:
+            result = self._cache.get(url)
+        if result is None or not self._fresh(result, time.time()):
+            return None
+        return result
+
+    def verify(self, url: str) -> Dict[str, object]:
+        """Check one link (or return its cached result)"""
+        result = self.cached(url)
+        if result is not None:
+            return result
+        return self._submit(url).result()
+
+    def verify_many(self, urls: Iterable[str]) -> Dict[str, Dict[str, object]]:
+        """Check links concurrently; blocks until all are done"""
+        futures = {url: self._submit(url) for url in dict.fromkeys(urls)}
+        return {url: future.result() for url, future in futures.items()}
+
+    def verify_in_background(self, urls: Iterable[str],
+                             callback: Optional[Callable[[Dict[str, Dict[str, object]]], None]] = None):
+        """Check uncached links off the caller's thread; `callback` gets all results"""
+        urls = list(dict.fromkeys(urls))
+        if not any(self.cached(url) is None for url in urls):
+            if callback:
+                callback({url: self.cached(url) for url in urls})
+            return None
+        futures = [self._submit(url) for url in urls]
+        if callback:
+            def finished(_):
+                if all(future.done() for future in futures):
+                    callback({url: future.result() for url, future in zip(urls, futures)})
+            for future in futures:
+                future.add_done_callback(finished)
+        return futures
+
+    def _submit(self, url: str) -> concurrent.futures.Future:
+        """Queue a check, joining one already in flight for the same link"""
+        cached = self.cached(url)
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None:
+                return future
+            future = concurrent.futures.Future()
+            if cached is not None:
+                future.set_result(cached)
+                return future
+            self._pending[url] = future
+            host = urlsplit(url).netloc.lower()
+            if self._host_active.get(host, 0) < self.per_host:
+                self._host_active[host] = self._host_active.get(host, 0) + 1
+                self._executor.submit(self._run, url, host)
+            else:
+                self._host_waiting.setdefault(host, deque()).append(url)
+            return future
+
+    def _run(self, url: str, host: str):
+        """Check one link on a pool thread, then hand the host's slot to its next link"""
+        try:
+            result = self._check(url)
+        except Exception as e:
+            result = {"ok": False, "status": None, "error": type(e).__name__, "checked_at": time.time()}
+        with self._lock:
+            self._store(url, result)
+            future = self._pending.pop(url)
+            waiting = self._host_waiting.get(host)
+            if waiting:
+                self._executor.submit(self._run, waiting.popleft(), host)
+                if not waiting:
+                    del self._host_waiting[host]
+            else:
+                self._host_active[host] -= 1
+                if not self._host_active[host]:
+                    del self._host_active[host]
+        future.set_result(result)
+
+    def _fresh(self, result: Dict[str, object], now: float) -> bool:
+        ttl = self.ttl if result["ok"] else self.failure_ttl
+        return now - result["checked_at"] < ttl
+
+    def _store(self, url: str, result: Dict[str, object]):
+        """Cache a result (caller holds the lock); oldest checks go first when full"""
+        self._cache.pop(url, None)
+        self._cache[url] = result
+        if len(self._cache) <= self.max_cached:
+            return
+        now = time.time()
+        for stale in [key for key, value in self._cache.items() if not self._fresh(value, now)]:
+            del self._cache[stale]
+        # Insertion order is check order, so the first keys are the oldest
+        while len(self._cache) > self.max_cached:
+            del self._cache[next(iter(self._cache))]
+
+    def _ensure_allowed(self, url: str):
+        """Raise _BlockedURL unless `url` is http(s) on a public address"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise _BlockedURL(url)
+        if self.allow_private:
+            return
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+        if not addresses or not all(_is_public_address(address) for address in addresses):
+            raise _BlockedURL(url)
+
+    def _status(self, method: str, url: str) -> int:
+        """Final status of a request, following (and vetting) up to MAX_REDIRECTS redirects"""
+        for _ in range(MAX_REDIRECTS + 1):
+            self._ensure_allowed(url)
+            # GET only needs the status line; don't download the body
+            with self.session.request(method, url, timeout=self.timeout, allow_redirects=False,
+                                      stream=method == "GET") as response:
+                location = response.headers.get("Location")
+                if not response.is_redirect or not location:
+                    return response.status_code
+            url = urljoin(url, location)
+        raise _BlockedURL(url)
+
+    def _check(self, url: str) -> Dict[str, object]:
+        import requests
+        status = None
+        error = None
+        try:
+            status = self._status("HEAD", url)
+            if status in _HEAD_UNSUPPORTED:
+                status = self._status("GET", url)
+        except _BlockedURL:
+            error = "BlockedURL"
+        except (requests.RequestException, OSError, ValueError) as e:
+            error = type(e).__name__
+        return {
+            "ok": status is not None and status < 400,
+            "status": status,
+            "error": error,
+            "checked_at": time.time()
+        }
+
+
+_verifier: Optional[LinkVerifier] = None
+_verifier_lock = threading.Lock()
+
+
+def link_check_enabled() -> bool:
+    """Background link checking can be turned off (EDUBOT_LINK_CHECK=0), e.g. offline"""
+    return os.getenv("EDUBOT_LINK_CHECK", "1") != "0"
+
+
+def get_link_verifier() -> LinkVerifier:
+    """Process-wide verifier, so the connection pool and cache are shared"""
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = LinkVerifier()
+        return _verifier
+
 
 class SearchTool:
     """Custom tool for searching educational resources"""
-    
-    def __init__(self):
+
+    def __init__(self, verifier: Optional[LinkVerifier] = None):
         self.name = "web_search"
         self.description = "Search for educational resources online"
-    
+        self.verifier = verifier or get_link_verifier()
+
     def search_educational_content(self, query: str, num_results: int = 3) -> List[Dict[str, str]]:
         """
         Search for educational content (simulated for now)
@@ -22,11 +266,25 @@ class SearchTool:
             }
             for i in range(num_results)
         ]
-    
+
     def verify_url(self, url: str) -> bool:
         """Verify if a URL is accessible"""
-        try:
-            response = requests.head(url, timeout=5)
-            return response.status_code == 200
-        except:
-            return False
\ No newline at end of file
+        return bool(self.verifier.verify(url)["ok"])
+
+    def verify_urls(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """Verify many URLs concurrently"""
+        return {url: bool(result["ok"]) for url, result in self.verifier.verify_many(urls).items()}
+
+    def link_status(self, resources_markdown: str) -> Dict[str, Optional[bool]]:
+        """Known status of every link in a resources document (None = not checked yet)"""
+        status = {}
+        for url in extract_links(resources_markdown):
+            result = self.verifier.cached(url)
+            status[url] = bool(result["ok"]) if result is not None else None
+        return status
+
+    def verify_resources_in_background(self, resources_markdown: str):
+        """Start checking a resources document's links without waiting for them"""
+        if not link_check_enabled():
+            return None
+        return self.verifier.verify_in_background(extract_links(resources_markdown))
@@ -0,0 +1,156 @@
+"""Deep-dive notes for single plan topics, cached per topic and prefetched
+
+Topic notes depend only on the course syllabus and the topic, so one cache
+entry serves every student of a course. Entries are small JSON records under
+``<cache_dir>/<shard>/<key>.json`` pointing at a blob in the shared store.
+Concurrent requests for the same topic (a student and a prefetch, say)
+share a single generation.
+"""
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from blob_store import BlobStore
+from generation_cache import normalize_syllabus
+from observability.metrics import TOPIC_NOTES
+from plan_model import StudyPlan
+
+# Number of upcoming plan days whose topics are prefetched
+PREFETCH_DAYS = 1
+# Prefetches waiting for a worker; more are skipped, not queued
+MAX_QUEUED_PREFETCHES = int(os.getenv("EDUBOT_PREFETCH_MAX_QUEUED", "50"))
+
+_prefetch_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _prefetch_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Small background pool shared by all requests (EDUBOT_PREFETCH_WORKERS)"""
+    global _prefetch_pool
+    with _pool_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=int(os.getenv("EDUBOT_PREFETCH_WORKERS", "2")),
+                thread_name_prefix="topic-prefetch"
+            )
+        return _prefetch_pool
+
+
+def upcoming_topics(plan: StudyPlan, progress: Dict[str, Any], days: int = PREFETCH_DAYS) -> List[str]:
+    """Uncompleted topics of the next `days` plan days that still have open topics"""
+    topics = []
+    open_days = 0
+    for _, sessions in plan.by_day():
+        pending = [session.topic for session in sessions if session.topic not in progress]
+        if not pending:
+            continue
+        topics.extend(pending)
+        open_days += 1
+        if open_days >= days:
+            break
+    return topics
+
+
+class TopicNotesCache:
+    """Per-topic notes cache with in-flight deduplication"""
+
+    # One generation per key at a time, across every cache instance in the process
+    _inflight: Dict[str, concurrent.futures.Future] = {}
+    _inflight_lock = threading.Lock()
+    # Keys submitted to the prefetch pool and not yet finished
+    _queued: Set[str] = set()
+
+    def __init__(self, cache_dir: Optional[str] = None, blob_store: Optional[BlobStore] = None):
+        self.cache_dir = cache_dir or os.getenv("EDUBOT_TOPIC_NOTES_DIR", "topic_notes")
+        self.blob_store = blob_store or BlobStore()
+
+    def get(self, syllabus: str, topic: str) -> Optional[str]:
+        try:
+            with open(self._entry_path(self._key(syllabus, topic)), 'r', encoding='utf-8') as f:
+                return self.blob_store.get(json.load(f)["content_hash"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, syllabus: str, topic: str, content: str):
+        path = self._entry_path(self._key(syllabus, topic))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "syllabus": syllabus,
+                "topic": topic,
+                "created_at": datetime.now().isoformat(),
+                "content_hash": self.blob_store.put(content)
+            }, f)
+        os.replace(tmp_path, path)
+
+    def get_or_generate(self, syllabus: str, topic: str, generate: Callable[[], str]) -> Tuple[str, bool]:
+        """(notes, served_from_cache); generates at most once per topic at a time"""
+        content = self.get(syllabus, topic)
+        if content is not None:
+            TOPIC_NOTES.labels("hit").inc()
+            return content, True
+
+        key = self._key(syllabus, topic)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not owner:
+            TOPIC_NOTES.labels("joined").inc()
+            return future.result(), True
+
+        TOPIC_NOTES.labels("miss").inc()
+        try:
+            content = generate()
+            self.put(syllabus, topic, content)
+            future.set_result(content)
+            return content, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def prefetch(self, syllabus: str, topics: Iterable[str], generate: Callable[[str], str]) -> int:
+        """Generate uncached topics in the background; returns how many were queued"""
+        queued = 0
+        for topic in topics:
+            key = self._key(syllabus, topic)
+            if os.path.exists(self._entry_path(key)):
+                continue
+            with self._inflight_lock:
+                if key in self._inflight or key in self._queued or len(self._queued) >= MAX_QUEUED_PREFETCHES:
+                    continue
+                self._queued.add(key)
+            # Copy the context so the request id and usage scope follow the work
+            _prefetch_executor().submit(contextvars.copy_context().run, self._prefetch_one,
+                                        syllabus, topic, key, generate)
+            queued += 1
+        if queued:
+            TOPIC_NOTES.labels("prefetch").inc(queued)
+        return queued
+
+    def _prefetch_one(self, syllabus: str, topic: str, key: str, generate: Callable[[str], str]):
+        try:
+            self.get_or_generate(syllabus, topic, lambda: generate(topic))
+        except Exception as e:
+            print(f"Error prefetching notes for {topic[:50]}: {e}")
+        finally:
+            with self._inflight_lock:
+                self._queued.discard(key)
+
+    @staticmethod
+    def _key(syllabus: str, topic: str) -> str:
+        raw = json.dumps([normalize_syllabus(syllabus or ""), " ".join(topic.split()).lower()])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
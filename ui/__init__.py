@@ -1,9 +1,19 @@
 # ui/__init__.py
-from .cli_interface import CLIInterface
-from .formatters import StudyPlanFormatter
+# Submodules load rich, so they are only imported when one of these is used
+_EXPORTS = {
+    'CLIInterface': 'cli_interface',
+    'StudyPlanFormatter': 'formatters',
+}
 
 __all__ = ['CLIInterface', 'StudyPlanFormatter']
 
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+
 """
 
 What This Achieves
@@ -1,10 +1,27 @@
+from typing import Optional
+
 from rich.console import Console
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import (
+    BarColumn, MofNCompleteColumn, Progress, ProgressColumn, SpinnerColumn, TextColumn,
+    TimeElapsedColumn, TimeRemainingColumn
+)
 from rich.table import Table
+from rich.text import Text
 from rich.markdown import Markdown
+from exporters import iter_markdown
+from plan_model import StudyPlan
 from ui.formatters import StudyPlanFormatter
 
+class ThroughputColumn(ProgressColumn):
+    """Completed items per minute"""
+
+    def render(self, task) -> Text:
+        if not task.speed:
+            return Text("-- /min", style="progress.data.speed")
+        return Text(f"{task.speed * 60:.1f}/min", style="progress.data.speed")
+
+
 class CLIInterface:
     def __init__(self):
         self.console = Console()
@@ -39,12 +56,38 @@ Your AI-powered study companion that:
         ) as progress:
             progress.add_task(description=f"Processing {task_name}...", total=None)
     
-    def display_study_plan(self, plan_text: str):
+    def batch_progress(self) -> Progress:
+        """Progress bar for batch runs: count, throughput, elapsed time and ETA"""
+        return Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            ThroughputColumn(),
+            TimeElapsedColumn(),
+            TextColumn("ETA"),
+            TimeRemainingColumn(),
+            console=self.console,
+        )
+    
+    def display_batch_summary(self, summary: dict, skipped: int, out_dir: str):
+        table = Table(title="📦 Batch Summary", show_header=False)
+        table.add_column("Metric", style="cyan")
+        table.add_column("Value", style="green")
+        table.add_row("Generated", str(summary.get("succeeded", 0)))
+        table.add_row("Failed", str(summary.get("failed", 0)))
+        table.add_row("Skipped (already done)", str(skipped))
+        table.add_row("Distinct plans", str(summary.get("distinct_plans", 0)))
+        table.add_row("Duration", f"{summary.get('duration', 0):.1f}s")
+        table.add_row("Output", out_dir)
+        self.console.print(table)
+    
+    def display_study_plan(self, plan_text: str, plan: Optional[StudyPlan] = None):
         """Display study plan in beautiful schedule format"""
         self.console.print("\n")
         
-        # Parse the plan
-        plan_data = self.formatter.parse_study_plan(plan_text)
+        # Parse the plan unless the caller already has it
+        plan_data = plan if plan is not None else StudyPlan.from_text(plan_text)
         
         if not plan_data:
             # Fallback to raw display if parsing fails
@@ -77,10 +120,9 @@ Your AI-powered study companion that:
         ).lower() in ['yes', 'y']
         
         if export:
-            markdown_content = self.formatter.format_study_plan_markdown(plan_data)
             filename = "study_plan_export.md"
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
+                f.writelines(iter_markdown(plan_data))
             self.console.print(f"[green]✓ Plan exported to {filename}[/green]")
     
     def display_notes(self, notes_text: str):
@@ -1,62 +1,49 @@
-import json
-from typing import Dict, List, Any
-from rich.table import Table
-from rich.panel import Panel
-from rich.console import Console
-from rich.markdown import Markdown
+import re
+from typing import TYPE_CHECKING, Dict, List, Any, Union
+
+from exporters import iter_markdown
+from plan_model import PlanSession, StudyPlan
+from plan_parser import parse_plan
+
+# Parsing and markdown export are plain Python; rich is only imported by the
+# methods that render to a terminal
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.table import Table
 
 class StudyPlanFormatter:
     """Formats study plan data into readable output"""
     
     @staticmethod
     def clean_json_output(text: str) -> str:
-        """Remove markdown code fences from JSON"""
-        if text.startswith("```"):
-            text = text.strip("`")
-            # Remove language labels
-            for lang in ["json", "JSON"]:
-                text = text.replace(lang, "", 1)
+        """Remove markdown code fences (and a leading language label) from JSON"""
+        text = text.strip()
+        text = re.sub(r"^```[A-Za-z]*\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
         return text.strip()
     
     @staticmethod
     def parse_study_plan(plan_text: str) -> List[Dict[str, Any]]:
-        """Parse study plan from text to JSON"""
-        try:
-            clean_text = StudyPlanFormatter.clean_json_output(plan_text)
-            plan_data = json.loads(clean_text)
-            
-            # Handle if it's wrapped in an object
-            if isinstance(plan_data, dict) and "plan" in plan_data:
-                plan_data = plan_data["plan"]
-            
-            return plan_data if isinstance(plan_data, list) else [plan_data]
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {e}")
-            return []
+        """Parse study plan from text to JSON (see plan_parser.parse_plan)"""
+        return parse_plan(plan_text)
     
     @staticmethod
-    def format_as_schedule(plan_data: List[Dict[str, Any]], console: Console) -> None:
+    def format_as_schedule(plan_data: Union[StudyPlan, List[Dict[str, Any]]], console: "Console") -> None:
         """Format study plan as a daily schedule"""
         
-        if not plan_data:
+        plan = StudyPlan.coerce(plan_data)
+        if not plan:
             console.print("[red]No valid study plan data to display[/red]")
             return
         
-        # Group by day
-        days = {}
-        for session in plan_data:
-            day = session.get("day", 1)
-            if day not in days:
-                days[day] = []
-            days[day].append(session)
-        
         # Display each day
-        for day_num in sorted(days.keys()):
-            StudyPlanFormatter._display_day(day_num, days[day_num], console)
+        for day_num, sessions in plan.by_day():
+            StudyPlanFormatter._display_day(day_num, sessions, console)
     
     @staticmethod
-    def _display_day(day_num: int, sessions: List[Dict], console: Console):
+    def _display_day(day_num: int, sessions: List[PlanSession], console: "Console"):
         """Display a single day's schedule"""
+        from rich.panel import Panel
         
         # Create day header
         day_title = f"📅 Day {day_num} Schedule"
@@ -64,11 +51,11 @@ class StudyPlanFormatter:
         console.print("─" * 80)
         
         for idx, session in enumerate(sessions, 1):
-            time_slot = session.get("time_slot", "N/A")
-            topic = session.get("topic", "Untitled Topic")
-            description = session.get("description", "")
-            activities = session.get("activities", [])
-            outcome = session.get("expected_outcome", "")
+            time_slot = session.time_slot
+            topic = session.topic
+            description = session.description
+            activities = session.activities
+            outcome = session.expected_outcome
             
             # Create session panel
             session_content = []
@@ -103,8 +90,9 @@ class StudyPlanFormatter:
             ))
     
     @staticmethod
-    def format_as_table(plan_data: List[Dict[str, Any]]) -> Table:
+    def format_as_table(plan_data: Union[StudyPlan, List[Dict[str, Any]]]) -> "Table":
         """Format study plan as a compact table"""
+        from rich.table import Table
         
         table = Table(title="📅 Study Schedule Overview", show_header=True, header_style="bold cyan")
         table.add_column("Day", style="cyan", width=6)
@@ -112,10 +100,10 @@ class StudyPlanFormatter:
         table.add_column("Topic", style="green", width=35)
         table.add_column("Duration", style="magenta", width=10)
         
-        for session in plan_data:
-            day = str(session.get("day", "?"))
-            time_slot = session.get("time_slot", "N/A")
-            topic = session.get("topic", "Untitled")
+        for session in StudyPlan.coerce(plan_data):
+            day = str(session.day)
+            time_slot = session.time_slot
+            topic = session.topic
             
             # Calculate duration from time slot
             duration = StudyPlanFormatter._calculate_duration(time_slot)
@@ -141,42 +129,6 @@ class StudyPlanFormatter:
             return "N/A"
     
     @staticmethod
-    def format_study_plan_markdown(plan_data: List[Dict[str, Any]]) -> str:
-        """Format as markdown for export"""
-        
-        markdown = "# 📚 Your Study Plan\n\n"
-        
-        days = {}
-        for session in plan_data:
-            day = session.get("day", 1)
-            if day not in days:
-                days[day] = []
-            days[day].append(session)
-        
-        for day_num in sorted(days.keys()):
-            markdown += f"## Day {day_num}\n\n"
-            
-            for session in days[day_num]:
-                time_slot = session.get("time_slot", "N/A")
-                topic = session.get("topic", "Untitled")
-                description = session.get("description", "")
-                activities = session.get("activities", [])
-                outcome = session.get("expected_outcome", "")
-                
-                markdown += f"### {time_slot} - {topic}\n\n"
-                
-                if description:
-                    markdown += f"*{description}*\n\n"
-                
-                if activities:
-                    markdown += "**Activities:**\n"
-                    for activity in activities:
-                        markdown += f"- {activity}\n"
-                    markdown += "\n"
-                
-                if outcome:
-                    markdown += f"**Expected Outcome:** {outcome}\n\n"
-                
-                markdown += "---\n\n"
-        
-        return markdown
\ No newline at end of file
+    def format_study_plan_markdown(plan_data: Union[StudyPlan, List[Dict[str, Any]]]) -> str:
+        """Format as markdown for export (see exporters.iter_markdown to stream it)"""
+        return "".join(iter_markdown(StudyPlan.coerce(plan_data)))
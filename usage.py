@@ -0,0 +1,229 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional
+
+from observability.metrics import LLM_COST, LLM_TOKENS
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Days of per-user daily totals kept in the usage file
+KEEP_DAYS = 31
+FLUSH_INTERVAL = 2.0
+
+_scope_var: contextvars.ContextVar = contextvars.ContextVar("usage_scope", default=None)
+_file_lock = threading.Lock()
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count (~4 characters per token) when the API gives none"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def token_cost(prompt_tokens: int, response_tokens: int) -> float:
+    """USD cost, priced per million tokens (EDUBOT_PRICE_*_PER_MTOK)"""
+    input_price = float(os.getenv("EDUBOT_PRICE_INPUT_PER_MTOK", "0.30"))
+    output_price = float(os.getenv("EDUBOT_PRICE_OUTPUT_PER_MTOK", "2.50"))
+    return (prompt_tokens * input_price + response_tokens * output_price) / 1_000_000
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _add(totals: Dict[str, Any], calls: int, prompt_tokens: int, response_tokens: int, cost: float):
+    totals["calls"] = totals.get("calls", 0) + calls
+    totals["prompt_tokens"] = totals.get("prompt_tokens", 0) + prompt_tokens
+    totals["response_tokens"] = totals.get("response_tokens", 0) + response_tokens
+    totals["cost"] = round(totals.get("cost", 0.0) + cost, 8)
+
+
+def _merge(target: Dict[str, Any], delta: Dict[str, Any]):
+    """Add every totals dict in `delta` into `target` (same nesting)"""
+    if "calls" in delta:
+        _add(target, delta["calls"], delta["prompt_tokens"], delta["response_tokens"], delta["cost"])
+        return
+    for key, value in delta.items():
+        _merge(target.setdefault(key, {}), value)
+
+
+def _total_tokens(totals: Dict[str, Any]) -> int:
+    return totals.get("prompt_tokens", 0) + totals.get("response_tokens", 0)
+
+
+class UsageScope:
+    """Who the LLM calls on this context are made for, plus their running totals"""
+
+    def __init__(self, user_id: str, session_id: Optional[str] = None):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.totals: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add(self, agent: str, prompt_tokens: int, response_tokens: int, cost: float):
+        with self._lock:
+            _add(self.totals, 1, prompt_tokens, response_tokens, cost)
+            _add(self.totals.setdefault("agents", {}).setdefault(agent, {}), 1, prompt_tokens, response_tokens, cost)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.totals))
+
+
+@contextmanager
+def usage_scope(user_id: str, session_id: Optional[str] = None) -> Iterator[UsageScope]:
+    """Attribute LLM calls made in this block (and contexts copied from it) to a user/session"""
+    scope = UsageScope(user_id, session_id)
+    token = _scope_var.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope_var.reset(token)
+
+
+class UsageTracker:
+    """Token and cost totals per agent and per user, shared through a JSON file
+
+    Calls are aggregated in memory and merged into the usage file at most every
+    FLUSH_INTERVAL seconds under a file lock, so several gunicorn workers can
+    share it. Per-session totals are stored on the session itself.
+    """
+
+    def __init__(self, usage_file: Optional[str] = None):
+        self.usage_file = usage_file or os.getenv("EDUBOT_USAGE_FILE", "sessions/usage.json")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Any] = {}
+        self._last_flush = 0.0
+        self._persisted: Dict[str, Any] = {}
+        self._persisted_at = 0.0
+
+    def record(self, agent: str, prompt_tokens: int, response_tokens: int):
+        """Add one LLM call to the agent, user and session totals"""
+        cost = token_cost(prompt_tokens, response_tokens)
+        scope = _scope_var.get()
+        user_id = scope.user_id if scope else "unknown"
+
+        LLM_TOKENS.labels(agent, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(agent, "response").inc(response_tokens)
+        LLM_COST.labels(agent).inc(cost)
+        if scope is not None:
+            scope.add(agent, prompt_tokens, response_tokens, cost)
+
+        with self._lock:
+            _add(self._pending.setdefault("agents", {}).setdefault(agent, {}),
+                 1, prompt_tokens, response_tokens, cost)
+            user = self._pending.setdefault("users", {}).setdefault(user_id, {})
+            _add(user.setdefault("total", {}), 1, prompt_tokens, response_tokens, cost)
+            _add(user.setdefault("days", {}).setdefault(_today(), {}), 1, prompt_tokens, response_tokens, cost)
+        self.flush()
+
+    def flush(self, force: bool = False):
+        """Merge pending totals into the usage file (throttled)"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending or (not force and now - self._last_flush < FLUSH_INTERVAL):
+                return
+            pending, self._pending = self._pending, {}
+            self._last_flush = now
+
+        os.makedirs(os.path.dirname(self.usage_file) or ".", exist_ok=True)
+        with self._locked_file():
+            data = self._read()
+            _merge(data, pending)
+            self._prune(data)
+            tmp_path = f"{self.usage_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.usage_file)
+
+        with self._lock:
+            self._persisted, self._persisted_at = data, time.monotonic()
+
+    @contextmanager
+    def _locked_file(self) -> Iterator[None]:
+        """Serialize usage file merges across threads and gunicorn workers"""
+        with _file_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.usage_file}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.usage_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _prune(data: Dict[str, Any]):
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=KEEP_DAYS)).strftime("%Y-%m-%d")
+        for user in data.get("users", {}).values():
+            days = user.get("days", {})
+            for day in [day for day in days if day < cutoff]:
+                del days[day]
+
+    def _user_totals(self, user_id: str) -> Dict[str, Any]:
+        """The user's all-time and today's totals, persisted plus this process's unflushed calls
+
+        Only this user's entries are merged; the rest of the usage file is left alone.
+        """
+        with self._lock:
+            stale = time.monotonic() - self._persisted_at > FLUSH_INTERVAL
+        if stale:
+            data = self._read()
+            with self._lock:
+                self._persisted, self._persisted_at = data, time.monotonic()
+        today = _today()
+        merged: Dict[str, Any] = {"total": {}, "today": {}}
+        with self._lock:
+            for source in (self._persisted, self._pending):
+                user = source.get("users", {}).get(user_id)
+                if user:
+                    _merge(merged, {"total": user.get("total", {}), "today": user.get("days", {}).get(today, {})})
+        return merged
+
+    def user_usage(self, user_id: str) -> Dict[str, Any]:
+        user = self._user_totals(user_id)
+        budget = daily_token_budget()
+        used = _total_tokens(user["today"])
+        return {
+            "user_id": user_id,
+            "today": user["today"],
+            "total": user["total"],
+            "daily_token_budget": budget or None,
+            "remaining_tokens": max(budget - used, 0) if budget else None
+        }
+
+    def check_budget(self, user_id: str) -> Optional[int]:
+        """Seconds until the user's budget resets if it is used up, else None"""
+        budget = daily_token_budget()
+        if not budget:
+            return None
+        if _total_tokens(self._user_totals(user_id)["today"]) < budget:
+            return None
+        now = datetime.now(timezone.utc)
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return int((midnight - now).total_seconds()) + 1
+
+
+def daily_token_budget() -> int:
+    """Per-user tokens per UTC day (EDUBOT_USER_DAILY_TOKENS, 0 = unlimited)"""
+    return int(os.getenv("EDUBOT_USER_DAILY_TOKENS", "0"))
+
+
+usage_tracker = UsageTracker()
+atexit.register(usage_tracker.flush, True)
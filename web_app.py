@@ -1,32 +1,77 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, g, render_template, request, jsonify, session, stream_with_context
+import hmac
+import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from datetime import datetime
-import json
-import markdown2
-import glob
 
 load_dotenv()
 
-from gemini_client import init_gemini
+from gemini_client import init_gemini, llm_backend
 from orchestrator import Orchestrator
-from ui.formatters import StudyPlanFormatter
+from session_manager import SessionManager
+from plan_model import StudyPlan
+from exporters import EXPORT_FORMATS, iter_export
+from compression import init_compression
+from static_assets import init_static_assets
+from usage import usage_tracker
+from admission import AdmissionController, AdmissionRejected
+from observability.logger import new_request_id
+from observability.profiler import PROFILE_HEADER, should_profile, start_profile
+from observability.tracer import get_tracer
+from observability.metrics import (
+    BUDGET_REJECTED, ERRORS, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, registry
+)
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "your-secret-key-here")
+init_static_assets(app)
+init_compression(app)
 
 # Initialize Gemini
 api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
+if not api_key and llm_backend() != "fake":
     raise ValueError("GOOGLE_API_KEY not found in environment variables.")
 init_gemini(api_key)
 
+# Cap concurrent generations per worker so some threads always remain free
+# for short endpoints (see gunicorn.conf.py), and share them fairly between
+# users (per-user limits and rate, round-robin queue; see admission.py)
+admission = AdmissionController.from_env(threads=int(os.getenv("GUNICORN_THREADS", "32")))
+BATCH_MAX_ITEMS = int(os.getenv("EDUBOT_BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("EDUBOT_BATCH_CONCURRENCY", "8"))
+
+def admission_rejected_response(rejected):
+    """429 (user over limit) or 503 (server busy) with a Retry-After"""
+    response = jsonify({'error': str(rejected), 'reason': rejected.reason})
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response, rejected.status
+
+def check_budget(user_id):
+    """Raise AdmissionRejected (429) once the user's daily token budget is used up"""
+    retry_after = usage_tracker.check_budget(user_id)
+    if retry_after is not None:
+        BUDGET_REJECTED.inc()
+        raise AdmissionRejected('budget', retry_after, 'Daily token budget used up, please try again tomorrow')
+
+@contextmanager
+def generation_guard(user_id):
+    """Budget check and admission for one generation"""
+    check_budget(user_id)
+    with admission.admitted(user_id):
+        yield
+
 def clean_and_format_markdown(text):
     """Clean and convert text to HTML with markdown"""
     if text.startswith("```"):
         text = text.strip("`")
         text = text.replace("json", "", 1).replace("markdown", "", 1).strip()
     
+    # Imported on first use so workers (and health checks) come up faster
+    import markdown2
     html = markdown2.markdown(text, extras=[
         "fenced-code-blocks",
         "tables",
@@ -38,6 +83,94 @@ def clean_and_format_markdown(text):
     
     return html
 
+def _count_topics(session_data):
+    """Number of plan sessions, read from metadata when available"""
+    if 'total_topics' in session_data:
+        return session_data['total_topics']
+    
+    # Legacy sessions stored the plan inline without a topic count
+    return len(StudyPlan.coerce(session_data.get('study_plan')))
+
+def _route_label():
+    """Low-cardinality route name (the URL rule, not the concrete path)"""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+    HTTP_IN_FLIGHT.labels(_route_label()).inc()
+    if should_profile(request.headers.get(PROFILE_HEADER)):
+        g.profile = start_profile(f"{request.method} {_route_label()}", g.request_id)
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = _route_label()
+        elapsed = time.perf_counter() - start
+        HTTP_IN_FLIGHT.labels(route).dec()
+        HTTP_LATENCY.labels(route, request.method).observe(elapsed)
+        HTTP_REQUESTS.labels(route, request.method, response.status_code).inc()
+        if response.status_code >= 500:
+            ERRORS.labels("web").inc()
+        get_tracer().record({
+            "agent": "http",
+            "function": f"{request.method} {route}",
+            "request_id": g.get('request_id'),
+            "status": "failed" if response.status_code >= 500 else "success",
+            "status_code": response.status_code,
+            "start_time": time.time() - elapsed,
+            "duration": elapsed
+        })
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    if g.get('profile') is not None:
+        response.headers['X-Profile-File'] = os.path.basename(g.profile.path)
+    registry.flush()
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    # Teardown runs after every after_request hook, even when the view raised
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.stop()
+
+@app.route('/healthz')
+def healthz():
+    """Liveness check for the platform: touches no storage, agents or templates"""
+    return jsonify({'status': 'ok'})
+
+def debug_authorized():
+    """/metrics and /debug/traces need `Authorization: Bearer <EDUBOT_DEBUG_TOKEN>`;
+    they are off while no token is configured"""
+    token = os.getenv("EDUBOT_DEBUG_TOKEN")
+    supplied = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics, aggregated across all gunicorn workers"""
+    if not debug_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/debug/traces')
+def debug_traces():
+    """Slowest retained traces and per-agent aggregates for this worker"""
+    if not debug_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    tracer = get_tracer()
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'pid': os.getpid(),
+        'sample_rate': tracer.sample_rate,
+        'slow_threshold': tracer.slow_threshold,
+        'aggregates': tracer.get_aggregates(),
+        'slowest': tracer.get_slowest(limit, agent=request.args.get('agent'))
+    })
+
 @app.route('/')
 def index():
     """Home page"""
@@ -53,14 +186,17 @@ def generate_plan():
         difficulty = data.get('difficulty')
         user_id = data.get('user_id', 'web_user')
         
+        orchestrator = Orchestrator(api_key, user_id=user_id)
+        # Days and difficulty may be left out by users with history
+        days, difficulty = orchestrator.personalize(days, difficulty)
         if not all([syllabus, days, difficulty]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        orchestrator = Orchestrator(api_key, user_id=user_id)
-        result = orchestrator.process(syllabus, days, difficulty)
-        
-        formatter = StudyPlanFormatter()
-        plan_data = formatter.parse_study_plan(result["study_plan"])
+        try:
+            with generation_guard(user_id):
+                result = orchestrator.process(syllabus, days, difficulty)
+        except AdmissionRejected as rejected:
+            return admission_rejected_response(rejected)
         
         notes_html = clean_and_format_markdown(result["notes"])
         resources_html = clean_and_format_markdown(result["resources"])
@@ -68,16 +204,75 @@ def generate_plan():
         return jsonify({
             'success': True,
             'session_id': result['session_id'],
-            'study_plan': plan_data,
+            'study_plan': result['plan'].to_dicts(),
             'notes': notes_html,
             'resources': resources_html,
             'notes_file': result['notes_file'],
+            'usage': result['usage'],
             'trace_summary': result['trace_summary']
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Generate plans for a whole class or catalog, streamed back as NDJSON
+    
+    Body: {"items": [{"syllabus", "days", "difficulty", "user_id"?, "id"?}, ...],
+    "owner_id"?, "include_content"?}. Items sharing a syllabus share its
+    generations; one JSON line is sent per item as it finishes, then a summary.
+    """
+    data = request.json or {}
+    items = data.get('items')
+    owner_id = data.get('owner_id', 'web_user')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} items per batch'}), 400
+    
+    # A batch is charged one generation slot per parallel worker, so it counts
+    # against the owner's in-flight limit like that many /generate calls
+    try:
+        check_budget(owner_id)
+        admission.acquire(owner_id)
+    except AdmissionRejected as rejected:
+        return admission_rejected_response(rejected)
+    slots = 1 + admission.acquire_extra(owner_id, BATCH_CONCURRENCY - 1)
+    
+    start = time.monotonic()
+    released = threading.Lock()
+    
+    def release_slot():
+        # Called from the stream's end and from the response's close; only the first counts
+        if released.acquire(blocking=False):
+            admission.release(owner_id, time.monotonic() - start)
+            for _ in range(slots - 1):
+                admission.release(owner_id)
+    
+    try:
+        orchestrator = Orchestrator(api_key, user_id=owner_id)
+        include_content = bool(data.get('include_content'))
+        
+        def stream_results():
+            try:
+                for result in orchestrator.process_batch(items, max_workers=slots,
+                                                          include_content=include_content):
+                    yield json.dumps(result) + "\n"
+            except Exception as e:
+                yield json.dumps({'error': str(e)}) + "\n"
+            finally:
+                release_slot()
+        
+        response = Response(stream_with_context(stream_results()), content_type='application/x-ndjson')
+        # A response closed before the stream starts never runs its finally
+        response.call_on_close(release_slot)
+    except Exception:
+        release_slot()
+        raise
+    return response
+
 @app.route('/progress/<session_id>', methods=['POST'])
 def mark_progress(session_id):
     """Mark topic as complete"""
@@ -101,11 +296,7 @@ def mark_progress(session_id):
         # Get updated session to return stats
         updated_session = orchestrator.session_manager.load_session(session_id)
         progress = updated_session.get('progress', {})
-        
-        # Parse study plan to get total topics
-        formatter = StudyPlanFormatter()
-        plan_data = formatter.parse_study_plan(updated_session.get('study_plan', '[]'))
-        total_topics = len(plan_data)
+        total_topics = _count_topics(updated_session)
         completed_count = len(progress)
         completion_percentage = round((completed_count / total_topics) * 100) if total_topics > 0 else 0
         
@@ -122,18 +313,51 @@ def mark_progress(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/notes/<session_id>/<path:topic>', methods=['GET'])
+def get_topic_notes(session_id, topic):
+    """Deep-dive notes for one topic of a session's plan (generated on first request)"""
+    try:
+        user_id = request.args.get('user_id', 'web_user')
+        orchestrator = Orchestrator(api_key, user_id=user_id)
+        # Only a cache miss generates, so only a miss is budgeted and admitted
+        result = orchestrator.get_topic_notes(session_id, topic,
+                                              guard=lambda: generation_guard(user_id))
+        if result is None:
+            return jsonify({'error': f'Topic not found in session plan: {topic}'}), 404
+        notes, cached = result
+        
+        # Warm the notes the student is likely to open next
+        orchestrator.prefetch_topic_notes(session_id)
+        
+        return jsonify({
+            'success': True,
+            'topic': topic,
+            'notes': clean_and_format_markdown(notes),
+            'cached': cached
+        })
+    
+    except AdmissionRejected as rejected:
+        return admission_rejected_response(rejected)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/session/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get session data"""
     try:
         user_id = request.args.get('user_id', 'web_user')
         orchestrator = Orchestrator(api_key, user_id=user_id)
-        session_data = orchestrator.session_manager.load_session(session_id)
+        session_data = orchestrator.session_manager.load_session(session_id).to_dict()
         
         # Format notes and resources if they exist
         if session_data.get('notes'):
             session_data['notes'] = clean_and_format_markdown(session_data['notes'])
         if session_data.get('resources'):
+            # Known link status (None = still being checked); never waits on the network
+            session_data['link_status'] = orchestrator.search_tool.link_status(session_data['resources'])
+            orchestrator.search_tool.verify_resources_in_background(session_data['resources'])
             session_data['resources'] = clean_and_format_markdown(session_data['resources'])
         
         return jsonify({
@@ -144,63 +368,58 @@ def get_session(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/session/<session_id>/export/<export_format>', methods=['GET'])
+def export_session(session_id, export_format):
+    """Download the session's plan as Markdown, iCalendar or CSV (streamed)"""
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    start = request.args.get('start')
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+    except ValueError:
+        return jsonify({'error': 'start must be a YYYY-MM-DD date'}), 400
+    
+    try:
+        plan = SessionManager().load_session(session_id).plan
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    
+    # Chunks are generated while the response is sent; the document is never built whole
+    response = Response(iter_export(plan, export_format, start_date, uid_prefix=session_id),
+                        content_type=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{session_id}_plan.{export_format}"'
+    return response
+
 @app.route('/sessions/list/<user_id>', methods=['GET'])
 def list_user_sessions(user_id):
     """List all sessions for a user"""
     try:
-        sessions_dir = "sessions"
         user_sessions = []
         
-        # Find all session files for this user
-        pattern = os.path.join(sessions_dir, f"{user_id}_*.json")
-        session_files = glob.glob(pattern)
-        
-        for filepath in session_files:
-            try:
-                with open(filepath, 'r') as f:
-                    session_data = json.load(f)
-                    
-                    # Parse study plan to get accurate topic count
-                    study_plan = session_data.get('study_plan', [])
-                    
-                    # If study_plan is a string (JSON), parse it
-                    if isinstance(study_plan, str):
-                        try:
-                            formatter = StudyPlanFormatter()
-                            study_plan = formatter.parse_study_plan(study_plan)
-                        except:
-                            study_plan = []
-                    
-                    # Ensure it's a list
-                    if not isinstance(study_plan, list):
-                        study_plan = []
-                    
-                    total_topics = len(study_plan)
-                    
-                    # Extract key info
-                    session_info = {
-                        'session_id': session_data.get('session_id'),
-                        'created_at': session_data.get('created_at'),
-                        'last_updated': session_data.get('last_updated', session_data.get('created_at')),
-                        'syllabus': session_data.get('syllabus', 'N/A'),
-                        'days': session_data.get('days', 'N/A'),
-                        'difficulty': session_data.get('difficulty', 'N/A'),
-                        'progress': session_data.get('progress', {}),
-                        'total_topics': total_topics
-                    }
-                    
-                    # Calculate completion stats
-                    completed_count = len(session_info['progress'])
-                    session_info['completed_count'] = completed_count
-                    session_info['completion_percentage'] = (
-                        round((completed_count / session_info['total_topics']) * 100) 
-                        if session_info['total_topics'] > 0 else 0
-                    )
-                    
-                    user_sessions.append(session_info)
-            except Exception as e:
-                print(f"Error reading session file {filepath}: {e}")
-                continue
+        # Only the small metadata records are read; content blobs stay on disk
+        for session_data in SessionManager().list_sessions(user_id):
+            # Extract key info
+            session_info = {
+                'session_id': session_data.get('session_id'),
+                'created_at': session_data.get('created_at'),
+                'last_updated': session_data.get('last_updated', session_data.get('created_at')),
+                'syllabus': session_data.get('syllabus', 'N/A'),
+                'days': session_data.get('days', 'N/A'),
+                'difficulty': session_data.get('difficulty', 'N/A'),
+                'progress': session_data.get('progress', {}),
+                'total_topics': _count_topics(session_data)
+            }
+            
+            # Calculate completion stats
+            completed_count = len(session_info['progress'])
+            session_info['completed_count'] = completed_count
+            session_info['completion_percentage'] = (
+                round((completed_count / session_info['total_topics']) * 100) 
+                if session_info['total_topics'] > 0 else 0
+            )
+            
+            user_sessions.append(session_info)
         
         # Sort by last updated (most recent first)
         user_sessions.sort(key=lambda x: x.get('last_updated', ''), reverse=True)
@@ -214,6 +433,28 @@ def list_user_sessions(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/profile/<user_id>', methods=['GET'])
+def get_profile(user_id):
+    """The user's learning profile (difficulty mix, topics, completion velocity)"""
+    try:
+        orchestrator = Orchestrator(api_key, user_id=user_id)
+        return jsonify({
+            'success': True,
+            'profile': orchestrator.memory_bank.get_user_profile(user_id).summary()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/usage/<user_id>', methods=['GET'])
+def get_user_usage(user_id):
+    """Token usage, cost and remaining daily budget for a user"""
+    try:
+        return jsonify({'success': True, 'usage': usage_tracker.user_usage(user_id)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))